@@ -1,11 +1,13 @@
 # frontend/app.py
 
 import streamlit as st
-from langchain_core.messages import HumanMessage,AIMessage
+from langchain_core.messages import HumanMessage
 import os
 import uuid
 import json
 from untracked_threads import save_thread_id
+from image_store import get_image_store, stored_hash
+from thread_store import DEFAULT_USER_ID, adopt_threads, user_threads
 
 
 if not os.getenv('GEMINI_API_KEY'):
@@ -25,7 +27,10 @@ if not os.getenv('GEMINI_API_KEY'):
 
 
 else:
-    from graph_database import react_graph , retrieve_all_threads
+    from graph_database import retrieve_all_threads
+    from graph_factory import get_graph, history_entries
+    # Compiled once per API key and reused by every rerun (graph_factory.py).
+    react_graph = get_graph(api_key=os.getenv('GEMINI_API_KEY'))
     #********************* utility functions *********************
     def get_thread_id():
         """Generate a unique thread ID for the conversation."""
@@ -45,10 +50,31 @@ else:
         add_thread(thread_id)
         st.session_state['image_name'] = ""
         st.session_state['image_path'] = ""
+        st.session_state['pending_images'] = []
         st.rerun()
 
     def load_conversation(thread_id):
-        return react_graph.get_state(config = {'configurable': {'thread_id': thread_id}}).values['messages']
+        """The thread's messages and images as chat-history entries (image references are checkpointed)."""
+        return history_entries(react_graph.get_state(config = {'configurable': {'thread_id': thread_id, 'user_id': st.session_state['user_id']}}).values)
+
+    def render_image(entry, position):
+        """A small thumbnail on every rerun; the full-size image is only sent when asked for."""
+        image_hash = entry.get('hash') or stored_hash(entry.get('content'))
+        if image_hash is None:
+            # Uploads from before the image store are plain paths.
+            if os.path.exists(entry.get('content', "")):
+                st.image(entry['content'], caption="Uploaded Image")
+            return
+        thumbnail = get_image_store().thumbnail(image_hash)
+        if thumbnail is None:
+            st.caption("This image is no longer stored.")
+            return
+        st.image(thumbnail, caption=entry.get('name') or "Uploaded Image")
+        if st.toggle("Full size", key=f"full_image_{position}_{image_hash[:16]}"):
+            stored = get_image_store().get(image_hash)
+            if stored is not None:
+                get_image_store().touch(image_hash)
+                st.image(stored.path)
 
     #********************* Session State *********************
     if 'message_history' not in st.session_state:
@@ -56,8 +82,16 @@ else:
     if 'image_name' not in st.session_state:
         st.session_state['image_name'] = ""
         st.session_state['image_path'] = ""
+    if 'pending_images' not in st.session_state:
+        # Uploads not yet sent with a message; they are checkpointed with the next turn.
+        st.session_state['pending_images'] = []
+    if 'user_id' not in st.session_state:
+        st.session_state['user_id'] = DEFAULT_USER_ID
     if 'chat_threads' not in st.session_state:
-        st.session_state['chat_threads'] = retrieve_all_threads()
+        if st.session_state['user_id'] == DEFAULT_USER_ID:
+            # Threads from before conversations had owners belong to the default student.
+            adopt_threads(retrieve_all_threads(), DEFAULT_USER_ID)
+        st.session_state['chat_threads'] = user_threads(st.session_state['user_id'])
         st.session_state['thread_id'] = st.session_state['chat_threads'][-1] if st.session_state['chat_threads'] else get_thread_id()
     # if 'chat_name' not in st.session_state:
     #     st.session_state['chat_name'] = {}
@@ -66,14 +100,13 @@ else:
     add_thread(st.session_state['thread_id'])
 
 
-    CONFIG = {'configurable': {'thread_id': st.session_state['thread_id']}}
+    # user_id routes the thread's checkpoints to its owner's shard (checkpoint_store.py).
+    CONFIG = {'configurable': {'thread_id': st.session_state['thread_id'], 'user_id': st.session_state['user_id']}}
     # loading the conversation history
-    for message in st.session_state['message_history']:
+    for position, message in enumerate(st.session_state['message_history']):
         if message['role'] == 'image':
             # Display image
-            image_path = message['content']
-            if os.path.exists(image_path):
-                st.image(image_path, caption="Uploaded Image")
+            render_image(message, position)
         else:
             with st.chat_message(message['role']):
                 # st.text(message['content'])
@@ -83,6 +116,15 @@ else:
 
     with st.sidebar:
         st.title("Ai Tutor")
+        user_id = st.text_input("Student ID", value=st.session_state['user_id']).strip()
+        if user_id and user_id != st.session_state['user_id']:
+            # Switch to the new student's own conversations.
+            st.session_state['user_id'] = user_id
+            st.session_state['chat_threads'] = user_threads(user_id)
+            st.session_state['message_history'] = []
+            st.session_state['pending_images'] = []
+            st.session_state['thread_id'] = st.session_state['chat_threads'][-1] if st.session_state['chat_threads'] else get_thread_id()
+            st.rerun()
         # api = st.text_input("API Key", type="password", placeholder="Enter your GEMINI API key")
         # if api.startswith('"') and api.endswith('"'):
         #     api = api[1:-1]
@@ -102,13 +144,20 @@ else:
         if uploaded_file:
             if uploaded_file.name != st.session_state['image_name']:
                 st.image(uploaded_file)
-                st.info(f"File `{uploaded_file.name}` uploaded successfully!")
-                image_path = os.path.join("images", uploaded_file.name)
-                with open(image_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                st.session_state['image_name'] = uploaded_file.name
-                st.session_state['image_path'] = image_path
-                st.session_state['message_history'].append({'role': 'image', 'content': image_path})
+                # Stored under the hash of its bytes: identical uploads share one file (image_store.py).
+                try:
+                    stored = get_image_store().put(uploaded_file.getvalue(), st.session_state['user_id'],
+                                                   st.session_state['thread_id'], uploaded_file.name)
+                except ValueError as e:
+                    st.error(f"Could not read `{uploaded_file.name}`: {e}")
+                else:
+                    st.info(f"File `{uploaded_file.name}` uploaded successfully!")
+                    st.session_state['image_name'] = uploaded_file.name
+                    st.session_state['image_path'] = stored.path
+                    entry = {'role': 'image', 'content': stored.path, 'hash': stored.hash, 'name': uploaded_file.name}
+                    st.session_state['message_history'].append(entry)
+                    turn = sum(1 for m in st.session_state['message_history'] if m['role'] == 'user')
+                    st.session_state['pending_images'].append({'hash': stored.hash, 'name': uploaded_file.name, 'turn': turn})
         if st.button('New Chat'):
             reset_chat()
         st.sidebar.header('Conversations')
@@ -116,15 +165,8 @@ else:
             # if st.sidebar.button(st.session_state['chat_name'][thread_id] , key=str(thread_id)):
             if st.sidebar.button(str(thread_id)):
                 st.session_state['thread_id'] = thread_id
-                messages = load_conversation(thread_id)
-
-                temp_messages =[]
-                for message in messages:
-                    if isinstance(message, HumanMessage):
-                        temp_messages.append({'role': 'user', 'content': message.content})
-                    elif isinstance(message, AIMessage):
-                        temp_messages.append({'role': 'assistant', 'content': message.content})
-                st.session_state['message_history'] = temp_messages
+                st.session_state['message_history'] = load_conversation(thread_id)
+                st.session_state['pending_images'] = []
 
 
     # if not os.getenv('GEMINI_API_KEY'):
@@ -133,7 +175,7 @@ else:
     
     user_input = st.chat_input('Type here')
     if user_input:
-        save_thread_id(st.session_state['thread_id'])
+        save_thread_id(st.session_state['thread_id'], st.session_state['user_id'])
         # first add the message to message_history
         st.session_state['message_history'].append({'role': 'user', 'content': user_input})
         with st.chat_message('user'):
@@ -143,10 +185,12 @@ else:
         with st.chat_message('assistant'):
             ai_message = st.write_stream(
                 message_chunk[0].content for message_chunk in react_graph.stream(
-                    {"messages": [HumanMessage(content=f"user_input: {user_input}")], "image_path": st.session_state['image_path']},
+                    {"messages": [HumanMessage(content=f"user_input: {user_input}")], "image_path": st.session_state['image_path'],
+                     "images": st.session_state['pending_images']},
                     config=CONFIG,
                     stream_mode='messages'
                 ) if message_chunk[1].get('langgraph_node') == 'assistant'
             )
         
-        st.session_state['message_history'].append({'role': 'assistant', 'content': ai_message})
\ No newline at end of file
+        st.session_state['message_history'].append({'role': 'assistant', 'content': ai_message})
+        st.session_state['pending_images'] = []
\ No newline at end of file
@@ -0,0 +1,208 @@
+# answer_cache.py
+
+"""
+Opt-in semantic cache of tutor answers (AI_TUTOR_ANSWER_CACHE=1).
+
+The opening question of a thread is embedded locally and looked up in a
+locality-sensitive-hashing index of past question/answer pairs. Above the
+similarity threshold the stored answer is returned instead of calling the LLM.
+Questions that come with an image only match entries for the same image bytes.
+
+Entries are persisted in `answer_cache.db`, tagged with their course/topic so a
+topic can be invalidated, and evicted least-recently-used beyond MAX_ENTRIES or
+after TTL_DAYS.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embeddings import get_encoder
+from image_store import file_hash
+
+# --- Configuration Block ---
+ANSWER_CACHE_ENABLED = os.getenv("AI_TUTOR_ANSWER_CACHE", "0") == "1"
+ANSWER_CACHE_DB_FILE = "answer_cache.db"
+SIMILARITY_THRESHOLD = float(os.getenv("AI_TUTOR_ANSWER_CACHE_THRESHOLD", "0.92"))
+MAX_ENTRIES = 5000
+TTL_DAYS = 30
+LSH_TABLES = 8
+LSH_BITS = 12
+
+
+def image_fingerprint(image_path: Optional[str]) -> str:
+    """sha256 of the image bytes (the image store's key), or '' when no image is attached."""
+    if not image_path or not os.path.exists(image_path):
+        return ""
+    return file_hash(image_path)
+
+
+# --- Approximate Nearest Neighbour Index ---
+
+class LSHIndex:
+    """Random-hyperplane LSH for cosine similarity over unit vectors."""
+
+    def __init__(self, dim: int, n_tables: int = LSH_TABLES, n_bits: int = LSH_BITS, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables * n_bits, dim)).astype(np.float32)
+        self.n_tables, self.n_bits = n_tables, n_bits
+        self.weights = 1 << np.arange(n_bits)
+        self.tables: List[Dict[int, set]] = [defaultdict(set) for _ in range(n_tables)]
+        self.vectors: Dict[int, np.ndarray] = {}
+
+    def _keys(self, vector: np.ndarray) -> List[int]:
+        bits = (self.planes @ vector > 0).reshape(self.n_tables, self.n_bits)
+        return [int(k) for k in bits @ self.weights]
+
+    def add(self, item_id: int, vector: np.ndarray):
+        self.vectors[item_id] = vector
+        for table, key in zip(self.tables, self._keys(vector)):
+            table[key].add(item_id)
+
+    def remove(self, item_id: int):
+        vector = self.vectors.pop(item_id, None)
+        if vector is None:
+            return
+        for table, key in zip(self.tables, self._keys(vector)):
+            table[key].discard(item_id)
+
+    def query(self, vector: np.ndarray, k: int = 5) -> List[Tuple[int, float]]:
+        candidates = set()
+        for table, key in zip(self.tables, self._keys(vector)):
+            candidates |= table.get(key, set())
+        if not candidates:
+            return []
+        ids = list(candidates)
+        similarities = np.stack([self.vectors[i] for i in ids]) @ vector
+        order = np.argsort(-similarities)[:k]
+        return [(ids[i], float(similarities[i])) for i in order]
+
+
+# --- Cache ---
+
+class AnswerCache:
+    def __init__(self, db_path: str = ANSWER_CACHE_DB_FILE, threshold: float = SIMILARITY_THRESHOLD,
+                 max_entries: int = MAX_ENTRIES, ttl_days: float = TTL_DAYS, encoder=None):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_days * 86400
+        self.encoder = encoder or get_encoder()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+        self._index: Optional[LSHIndex] = None
+        self._images: Dict[int, str] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cached_answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                image_hash TEXT NOT NULL DEFAULT '',
+                course TEXT,
+                topic TEXT,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                last_hit_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cached_answers_topic ON cached_answers (topic)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cached_answers_last_hit ON cached_answers (last_hit_at)")
+        self._conn.commit()
+
+    def _load_index(self) -> LSHIndex:
+        if self._index is None:
+            self._index = LSHIndex(self.encoder.dim)
+            for item_id, image_hash, blob in self._conn.execute("SELECT id, image_hash, vector FROM cached_answers"):
+                self._index.add(item_id, np.frombuffer(blob, dtype=np.float32))
+                self._images[item_id] = image_hash
+        return self._index
+
+    def _drop(self, ids: List[int]):
+        for item_id in ids:
+            self._index.remove(item_id)
+            self._images.pop(item_id, None)
+        self._conn.executemany("DELETE FROM cached_answers WHERE id = ?", [(i,) for i in ids])
+
+    def lookup(self, question: str, image_hash: str = "") -> Optional[str]:
+        """Returns the cached answer for a near-identical question, or None."""
+        vector = self.encoder.encode([question])[0]
+        with self._lock:
+            index = self._load_index()
+            self.stats["lookups"] += 1
+            for item_id, similarity in index.query(vector):
+                if similarity < self.threshold:
+                    break
+                if self._images.get(item_id) != image_hash:
+                    continue
+                row = self._conn.execute("SELECT answer, created_at FROM cached_answers WHERE id = ?", (item_id,)).fetchone()
+                if row is None:
+                    continue
+                if time.time() - row[1] > self.ttl_seconds:
+                    self._drop([item_id])
+                    self._conn.commit()
+                    self.stats["evictions"] += 1
+                    continue
+                self._conn.execute(
+                    "UPDATE cached_answers SET hits = hits + 1, last_hit_at = ? WHERE id = ?", (time.time(), item_id)
+                )
+                self._conn.commit()
+                self.stats["hits"] += 1
+                return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, question: str, answer: str, image_hash: str = "", course: Optional[str] = None,
+              topic: Optional[str] = None):
+        vector = self.encoder.encode([question])[0]
+        now = time.time()
+        with self._lock:
+            index = self._load_index()
+            cursor = self._conn.execute("""
+                INSERT INTO cached_answers (question, answer, image_hash, course, topic, vector, created_at, last_hit_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (question, answer, image_hash, course, topic, vector.tobytes(), now, now))
+            index.add(cursor.lastrowid, vector)
+            self._images[cursor.lastrowid] = image_hash
+            self.stats["stores"] += 1
+
+            overflow = len(index.vectors) - self.max_entries
+            if overflow > 0:
+                stale = [r[0] for r in self._conn.execute(
+                    "SELECT id FROM cached_answers ORDER BY last_hit_at LIMIT ?", (overflow,)
+                )]
+                self._drop(stale)
+                self.stats["evictions"] += len(stale)
+            self._conn.commit()
+
+    def invalidate_topic(self, topic: str) -> int:
+        """Drops every cached answer tagged with the topic, e.g. after its material changes."""
+        with self._lock:
+            self._load_index()
+            ids = [r[0] for r in self._conn.execute("SELECT id FROM cached_answers WHERE topic = ?", (topic,))]
+            self._drop(ids)
+            self._conn.commit()
+            self.stats["invalidations"] += len(ids)
+            return len(ids)
+
+    def hit_rate(self) -> float:
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+
+_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """The process-wide cache, or None when the cache is disabled."""
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = AnswerCache()
+    return _cache
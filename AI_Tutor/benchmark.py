@@ -0,0 +1,473 @@
+# benchmark.py
+
+"""
+Offline replay benchmarks for the tracker, recommender, dashboard and chat graph.
+
+Gemini is replaced by the deterministic stubs in `stub_llm.py`, and synthetic
+databases are generated into a scratch directory, so runs are repeatable and
+cost nothing. Results are written as JSON and can be compared against a
+previous run to spot regressions.
+
+Usage:
+    python benchmark.py --users 500 --threads 50 --output bench_results/today.json
+    python benchmark.py --compare bench_results/baseline.json --output bench_results/today.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from llm_scheduler import scheduler
+from stub_llm import LatencyModel, TokenModel, install_stubs
+import synthetic_data
+
+BENCHMARKS = ["load_progress", "baseline_recommend", "cf_recommend", "dashboard_load", "react_graph_turn",
+              "run_progress_tracker", "bulk_progress_write", "sharded_progress_write", "quiz_serve", "leaderboard", "contest_load",
+              "image_thumbnails"]
+
+
+# --- Measurement Helpers ---
+
+def summarize(samples: List[float], items_per_sample: int = 1) -> Dict[str, float]:
+    """Summarizes wall-clock samples (seconds) into latency percentiles and throughput."""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "throughput_per_s": (len(ordered) * items_per_sample) / total if total else float("inf"),
+    }
+
+
+def timed(fn: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@contextlib.contextmanager
+def quiet():
+    """The app modules print freely; keep that noise out of the timings and the report."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --- Benchmarks ---
+
+def bench_recommender(args, results: Dict):
+    from recommender import load_progress, baseline_recommend, cf_recommend
+
+    with quiet():
+        results["load_progress"] = summarize(timed(load_progress, args.repeat))
+        all_progress_df = load_progress()
+        sample_users = synthetic_data.user_ids(args.users)[:args.sample_users]
+
+        baseline_samples, cf_samples = [], []
+        for user_id in sample_users:
+            start = time.perf_counter()
+            baseline_recs = baseline_recommend(user_id, all_progress_df, top_k=10)
+            baseline_samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            cf_recommend(user_id, all_progress_df, baseline_recs, top_k=5)
+            cf_samples.append(time.perf_counter() - start)
+
+    results["baseline_recommend"] = summarize(baseline_samples)
+    results["cf_recommend"] = summarize(cf_samples)
+
+
+def bench_dashboard(args, results: Dict):
+    from streamlit.testing.v1 import AppTest
+
+    page = os.path.join(APP_DIR, "pages", "Dashboard.py")
+
+    def load():
+        app = AppTest.from_file(page, default_timeout=60)
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"Dashboard raised: {app.exception[0].message}")
+
+    with quiet():
+        results["dashboard_load"] = summarize(timed(load, args.repeat))
+
+
+def bench_react_graph(args, results: Dict):
+    from langchain_core.messages import HumanMessage
+    from graph_database import react_graph
+
+    turn_samples, first_token_samples = [], []
+    with quiet():
+        for i in range(args.chat_turns):
+            config = {"configurable": {"thread_id": f"bench-{uuid.UUID(int=i)}"}}
+            topic = synthetic_data.ALL_TOPICS[i % len(synthetic_data.ALL_TOPICS)][1]
+            inputs = {"messages": [HumanMessage(content=f"user_input: explain {topic} {i}")], "image_path": "No image uploaded"}
+
+            start = time.perf_counter()
+            first_token = None
+            for chunk, metadata in react_graph.stream(inputs, config=config, stream_mode="messages"):
+                if first_token is None and metadata.get("langgraph_node") == "assistant" and chunk.content:
+                    first_token = time.perf_counter() - start
+            turn_samples.append(time.perf_counter() - start)
+            first_token_samples.append(first_token if first_token is not None else turn_samples[-1])
+
+    results["react_graph_turn"] = summarize(turn_samples)
+    results["react_graph_first_token"] = summarize(first_token_samples)
+
+
+def bench_progress_tracker(args, results: Dict):
+    from progress_tracker import run_progress_tracker
+
+    with quiet():
+        start = time.perf_counter()
+        run_progress_tracker(synthetic_data.user_ids(1)[0])
+        elapsed = time.perf_counter() - start
+
+    results["run_progress_tracker"] = summarize([elapsed], items_per_sample=args.threads)
+    results["run_progress_tracker"]["threads"] = args.threads
+
+
+def bench_progress_writes(args, results: Dict):
+    import random
+    from progress_store import bulk_update_student_progress
+
+    rng = random.Random(args.seed)
+    updates = [
+        (user_id, course, topic, rng.uniform(0, 100))
+        for user_id in synthetic_data.user_ids(args.users)
+        for course, topic in rng.sample(synthetic_data.ALL_TOPICS, 2)
+    ]
+    with quiet():
+        start = time.perf_counter()
+        bulk_update_student_progress(updates)
+        elapsed = time.perf_counter() - start
+    results["bulk_progress_write"] = summarize([elapsed], items_per_sample=len(updates))
+    results["bulk_progress_write"]["rows"] = len(updates)
+
+
+def bench_quiz(args, results: Dict):
+    """Quizzes served from a pre-warmed bank, against generating each one with the (stub) LLM."""
+    from quiz_bank import COURSE_OF, get_quiz_bank
+
+    bank = get_quiz_bank()
+    topics = list(COURSE_OF)
+    with quiet():
+        start = time.perf_counter()
+        bank.prewarm(args.quiz_per_topic)
+        prewarm_seconds = time.perf_counter() - start
+
+        serve_samples, generate_samples = [], []
+        for i, user_id in enumerate(synthetic_data.user_ids(args.users)[:args.sample_users]):
+            topic = topics[i % len(topics)]
+            start = time.perf_counter()
+            bank.serve(user_id, COURSE_OF[topic], topic, 5)
+            serve_samples.append(time.perf_counter() - start)
+        for i in range(args.repeat):
+            topic = topics[i % len(topics)]
+            start = time.perf_counter()
+            bank.generate(COURSE_OF[topic], topic, 5)
+            generate_samples.append(time.perf_counter() - start)
+
+    results["quiz_serve"] = summarize(serve_samples)
+    results["quiz_generate"] = summarize(generate_samples)
+    results["quiz_prewarm"] = summarize([prewarm_seconds], items_per_sample=bank.count())
+    results["quiz_prewarm"]["items"] = bank.count()
+
+
+def bench_leaderboard(args, results: Dict):
+    """Rank, top-N and neighbour lookups on the global board (built by the synthetic loader)."""
+    from leaderboard import GLOBAL_BOARD, get_leaderboard
+
+    board = get_leaderboard()
+    sample_users = synthetic_data.user_ids(args.users)[:args.sample_users]
+    results["leaderboard_rank"] = summarize([timed(lambda: board.rank(GLOBAL_BOARD, u), 1)[0] for u in sample_users])
+    results["leaderboard_top"] = summarize(timed(lambda: board.top(GLOBAL_BOARD, 10), args.repeat))
+    results["leaderboard_around"] = summarize([timed(lambda: board.around(GLOBAL_BOARD, u), 1)[0] for u in sample_users])
+
+
+def bench_contest_load(args, results: Dict):
+    """
+    Load test for contest_engine.py: N contestants, one thread each, start
+    together, think for up to --contest-think seconds and submit. N doubles
+    from 100 up to --contestants; each level reports submit latency and the
+    sustained submissions per second, so the point where p95 grows past the
+    think time is where one process stops keeping up.
+    """
+    import random
+    import threading
+    from contest_engine import ContestEngine
+    from quiz_bank import COURSE_OF, get_quiz_bank
+
+    topic = next(iter(COURSE_OF))
+    level = 100
+    while True:
+        level = min(level, args.contestants)
+        engine = ContestEngine(f"contest_{level}.db", get_quiz_bank())
+        with quiet():
+            contest = engine.open_contest(COURSE_OF[topic], topic)
+        barrier = threading.Barrier(level)
+        latencies: List[float] = []
+
+        def contestant(i: int):
+            rng = random.Random(args.seed + i)
+            user_id = f"contestant_{i}"
+            barrier.wait()
+            engine.start(contest.id, user_id)
+            time.sleep(rng.uniform(0, args.contest_think))
+            choices = {item.id: rng.randrange(len(item.options)) for item in contest.items}
+            start = time.perf_counter()
+            engine.submit(contest.id, user_id, choices)
+            latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=contestant, args=(i,)) for i in range(level)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        name = f"contest_submit[{level}]"
+        results[name] = summarize(latencies)
+        results[name]["throughput_per_s"] = level / elapsed
+        results[name]["commits"] = engine._writer.batches
+        results[name]["standings_ok"] = engine.contestants(contest.id) == level
+        if level >= args.contestants:
+            break
+        level *= 2
+
+
+def bench_image_thumbnails(args, results: Dict):
+    """
+    Chat-history images: making each thumbnail once, then looking it up on a
+    rerun, with the bytes a history of --images photos sends at full size and as thumbnails.
+    """
+    import io
+    import random
+    from PIL import Image
+    from image_store import get_image_store
+
+    store = get_image_store()
+    rng = random.Random(args.seed)
+    images = []
+    for i in range(args.images):
+        img = Image.effect_noise((1600, 1200), 40 + rng.random() * 40).convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=90)
+        images.append(store.put(buffer.getvalue(), f"bench_{i}", f"bench-thread-{i}"))
+    cold = [timed(lambda: store.thumbnail(image.hash), 1)[0] for image in images]
+    warm = [timed(lambda: store.thumbnail(image.hash), 1)[0] for image in images]
+    results["image_thumbnail_cold"] = summarize(cold)
+    results["image_thumbnail_warm"] = summarize(warm)
+    results["image_thumbnail_warm"]["bytes_full"] = sum(image.bytes for image in images)
+    results["image_thumbnail_warm"]["bytes_thumbnails"] = sum(os.path.getsize(store.thumbnail(image.hash)) for image in images)
+
+
+def bench_sharded_writes(args, results: Dict):
+    """
+    Concurrent writers making one small transaction each (as tracking workers
+    do per flush), against a single file and against --shards shard files.
+    """
+    import random
+    import sharding
+    from concurrent.futures import ThreadPoolExecutor
+    from progress_store import bulk_update_student_progress, setup_database
+
+    users = synthetic_data.user_ids(args.users)
+    per_writer = 100
+    home = os.getcwd()
+    for count in sorted({1, args.shards}):
+        os.makedirs(f"shards{count}", exist_ok=True)
+        os.chdir(f"shards{count}")
+        sharding.DEFAULT_SHARD_COUNT = count
+        try:
+            with quiet():
+                setup_database()
+
+            def writer(seed: int):
+                rng = random.Random(seed)
+                for _ in range(per_writer):
+                    course, topic = rng.choice(synthetic_data.ALL_TOPICS)
+                    bulk_update_student_progress([(rng.choice(users), course, topic, rng.uniform(0, 100))])
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.writers) as pool:
+                list(pool.map(writer, range(args.writers)))
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(home)
+        name = f"sharded_progress_write[{count}]"
+        results[name] = summarize([elapsed], items_per_sample=args.writers * per_writer)
+        results[name]["writers"] = args.writers
+
+
+# --- Comparison ---
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Returns report lines; regressions are p50 latencies slower than baseline by more than `threshold`."""
+    lines = []
+    for name, stats in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("p50_ms"):
+            continue
+        ratio = stats["p50_ms"] / old["p50_ms"]
+        flag = "REGRESSION" if ratio > 1 + threshold else ("improved" if ratio < 1 - threshold else "ok")
+        lines.append(f"{name:28s} p50 {old['p50_ms']:10.2f} -> {stats['p50_ms']:10.2f} ms  x{ratio:5.2f}  {flag}")
+    return lines
+
+
+# --- Entry Point ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="Synthetic users in progress_data.db")
+    parser.add_argument("--topics-per-user", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=20, help="Synthetic chat threads queued for tracking")
+    parser.add_argument("--turns", type=int, default=3, help="Question/answer pairs per synthetic thread")
+    parser.add_argument("--chat-turns", type=int, default=20, help="react_graph turns to replay")
+    parser.add_argument("--sample-users", type=int, default=20, help="Users to run the recommenders for")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions for single-call benchmarks")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stub LLM base latency per call")
+    parser.add_argument("--per-token-ms", type=float, default=0.0, help="Stub LLM latency per output token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Fractional latency noise")
+    parser.add_argument("--tokens", type=int, default=120, help="Mean stub response size in tokens")
+    parser.add_argument("--tool-call-rate", type=float, default=0.5)
+    parser.add_argument("--rpm", type=float, default=0, help="Per-model rate limit for the scheduler (0 = unlimited)")
+    parser.add_argument("--shards", type=int, default=4, help="Shard count compared with one file in sharded_progress_write")
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent writers in sharded_progress_write")
+    parser.add_argument("--quiz-per-topic", type=int, default=20, help="Items pre-warmed per topic in quiz_serve")
+    parser.add_argument("--contestants", type=int, default=1600, help="Largest concurrent contestant count in contest_load")
+    parser.add_argument("--contest-think", type=float, default=2.0, help="Max seconds a contestant waits before submitting")
+    parser.add_argument("--images", type=int, default=20, help="Uploaded photos in image_thumbnails")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Comma-separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--workdir", help="Where to build the synthetic databases (default: a temp dir)")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative p50 slowdown treated as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    selected = {name.strip() for name in args.only.split(",") if name.strip()}
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    install_stubs(
+        latency=LatencyModel(args.latency_ms, args.per_token_ms, args.jitter),
+        tokens=TokenModel(args.tokens),
+        tool_call_rate=args.tool_call_rate,
+    )
+    if args.rpm:
+        scheduler.configure_all(args.rpm)
+    else:
+        scheduler.disable_rate_limits()
+    os.environ.setdefault("GEMINI_API_KEY", "stub-key")
+    os.environ.setdefault("GOOGLE_API_KEY", "stub-key")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="aitutor-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    shutil.copy(os.path.join(APP_DIR, "agent_prompt.txt"), workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+
+    results: Dict[str, Dict] = {}
+    try:
+        start = time.perf_counter()
+        synthetic_data.generate_progress_db("progress_data.db", args.users, args.topics_per_user, args.seed)
+        # The tracker benchmark runs for one student, who owns every thread.
+        owners = synthetic_data.generate_chat_history_db(
+            "chat_history.db", args.threads, args.turns, args.seed, users=synthetic_data.user_ids(1),
+        )
+        synthetic_data.write_untracked_threads("progress_data.db", owners)
+        setup_seconds = time.perf_counter() - start
+
+        if selected & {"load_progress", "baseline_recommend", "cf_recommend"}:
+            bench_recommender(args, results)
+        if "dashboard_load" in selected:
+            bench_dashboard(args, results)
+        if "react_graph_turn" in selected:
+            bench_react_graph(args, results)
+        # Last: it drains the untracked-thread backlog and rewrites progress rows.
+        if "run_progress_tracker" in selected:
+            bench_progress_tracker(args, results)
+        if "bulk_progress_write" in selected:
+            bench_progress_writes(args, results)
+        if "sharded_progress_write" in selected:
+            bench_sharded_writes(args, results)
+        if "quiz_serve" in selected:
+            bench_quiz(args, results)
+        if "leaderboard" in selected:
+            bench_leaderboard(args, results)
+        if "contest_load" in selected:
+            bench_contest_load(args, results)
+        if "image_thumbnails" in selected:
+            bench_image_thumbnails(args, results)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "setup_seconds": setup_seconds,
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir", "keep_workdir")},
+        },
+        "results": results,
+    }
+
+    for name, stats in results.items():
+        print(f"{name:28s} n={stats['n']:<5d} p50={stats['p50_ms']:10.2f} ms  p95={stats['p95_ms']:10.2f} ms  {stats['throughput_per_s']:10.2f}/s")
+
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        lines = compare(report, baseline, args.threshold)
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# checkpoint_store.py
+
+"""
+Chat checkpoints, sharded by thread owner like the progress database.
+
+With one shard `open_checkpointer` returns a plain SqliteSaver on
+`chat_history.db`. With more, `ShardedSqliteSaver` keeps one SqliteSaver per
+shard file and routes each thread to its owner's shard: the owner comes from
+`user_id` in the config when the caller passes it, otherwise from the thread
+catalog (thread_store). Threads without an owner belong to DEFAULT_USER_ID,
+as they do everywhere else.
+"""
+
+import sqlite3
+from itertools import chain, islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from progress_store import PROGRESS_DB_FILE
+from sharding import physical_shard, shard_count, shard_paths
+from thread_store import DEFAULT_USER_ID, thread_owner
+
+# --- Configuration Block ---
+CHAT_HISTORY_DB_FILE = "chat_history.db"
+
+
+def checkpoint_paths(db_path: str = CHAT_HISTORY_DB_FILE, catalog_path: str = PROGRESS_DB_FILE) -> List[str]:
+    """Checkpoint shard files; the shard count is the progress catalog's."""
+    return shard_paths(db_path, shard_count(catalog_path))
+
+
+class ShardedSqliteSaver(BaseCheckpointSaver):
+    """Checkpoint saver over one SqliteSaver per shard file, routed by thread owner."""
+
+    def __init__(self, paths: Sequence[str], catalog_path: str = PROGRESS_DB_FILE):
+        self.savers = [SqliteSaver(sqlite3.connect(path, check_same_thread=False)) for path in paths]
+        super().__init__(serde=self.savers[0].serde)
+        self.catalog_path = catalog_path
+        self._owners: Dict[str, str] = {}
+
+    def _shard_for(self, thread_id: str, user_id: Optional[str] = None) -> SqliteSaver:
+        thread_id = str(thread_id)
+        owner = user_id or self._owners.get(thread_id)
+        if owner is None:
+            owner = thread_owner(thread_id, self.catalog_path)
+            if owner is not None:
+                # Owners never change, so lookups are cached; misses are not (the thread may register later).
+                self._owners[thread_id] = owner
+        return self.savers[physical_shard(owner or DEFAULT_USER_ID, len(self.savers))]
+
+    def _saver(self, config: RunnableConfig) -> SqliteSaver:
+        configurable = config["configurable"]
+        return self._shard_for(configurable["thread_id"], configurable.get("user_id"))
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._saver(config).get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """One thread's checkpoints from its shard, or (config=None) every shard's in turn."""
+        if config is not None:
+            return self._saver(config).list(config, filter=filter, before=before, limit=limit)
+        listed = chain.from_iterable(
+            saver.list(None, filter=filter, before=before, limit=limit) for saver in self.savers
+        )
+        return islice(listed, limit) if limit is not None else listed
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        return self._saver(config).put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str = "") -> None:
+        self._saver(config).put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._shard_for(thread_id).delete_thread(thread_id)
+
+    def get_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return self._saver(config).get_delta_channel_history(config=config, channels=channels)
+
+    def get_next_version(self, current, channel):
+        return self.savers[0].get_next_version(current, channel)
+
+
+def open_checkpointer(db_path: str = CHAT_HISTORY_DB_FILE, catalog_path: str = PROGRESS_DB_FILE) -> BaseCheckpointSaver:
+    paths = checkpoint_paths(db_path, catalog_path)
+    if len(paths) == 1:
+        return SqliteSaver(sqlite3.connect(paths[0], check_same_thread=False))
+    return ShardedSqliteSaver(paths, catalog_path)
@@ -0,0 +1,388 @@
+# contest_engine.py
+
+"""
+Timed contests over quiz-bank problem sets.
+
+A contest is a fixed set of quiz-bank items on one topic, open for a window
+of time; each contestant gets `duration` seconds from when they start.
+Submissions are graded in memory against the contest's answer key under a
+per-entry lock, so an entry is graded exactly once (the database enforces the
+same across processes). All writes go through one writer thread that commits
+them in batches: a submitting thread waits at most FLUSH_INTERVAL for its
+batch, so many concurrent contestants share each commit. Live standings are
+kept in memory, sorted as submissions arrive, and re-read from the database
+every STANDINGS_REFRESH seconds to include submissions from other processes
+(Streamlit sessions, the service). Start times are cached, and read from the
+database when this process has not seen the attempt.
+
+Results are stored compactly, one row per entry: the chosen options as one
+byte each and the correct answers as a bitmask. Entries are indexed by
+(contest, score) for standings and by (user, contest) for history.
+"""
+
+import bisect
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from quiz_bank import QuizBank, QuizItem, get_quiz_bank
+from topic_meta import TOPIC_META
+
+# --- Configuration Block ---
+CONTEST_DB_FILE = "contest.db"
+DEFAULT_QUESTIONS = 10
+DEFAULT_DURATION = 600      # Seconds each contestant has from their start.
+CONTEST_WINDOW = 3600       # Seconds a contest accepts new contestants.
+GRACE_SECONDS = 5           # Slack after a contestant's deadline for requests in flight.
+FLUSH_INTERVAL = 0.02       # Longest a write waits for others to join its batch.
+MAX_BATCH = 500             # Writes per transaction.
+NO_ANSWER = 255             # Stored option byte for an unanswered question.
+ENTRY_LOCKS = 64            # Lock stripes for grading.
+STANDINGS_REFRESH = 1.0     # Seconds between re-reads of standings, for submissions from other processes.
+
+
+class ContestError(Exception):
+    """Raised for requests a contest cannot accept (not started, time is up, already submitted)."""
+
+
+@dataclass
+class Contest:
+    id: int
+    course: str
+    topic: str
+    items: List[QuizItem]
+    duration: float
+    starts_at: float
+    ends_at: float
+
+    def deadline(self, started_at: float) -> float:
+        return min(started_at + self.duration, self.ends_at)
+
+
+@dataclass
+class ContestResult:
+    contest_id: int
+    user_id: str
+    score: int
+    total: int
+    elapsed: float
+    rank: int
+    correct: List[bool]
+
+
+class _BatchWriter(threading.Thread):
+    """Single writer that commits queued statements in batched transactions (group commit)."""
+
+    def __init__(self, db_path: str):
+        super().__init__(daemon=True, name="contest-writer")
+        self.db_path = db_path
+        self.queue: "queue.Queue" = queue.Queue()
+        self.batches = 0
+        self.start()
+
+    def enqueue(self, sql: str, params: Sequence) -> Dict:
+        """Queues one statement; writes commit in the order they were queued."""
+        op = {"sql": sql, "params": params, "done": threading.Event()}
+        self.queue.put(op)
+        return op
+
+    @staticmethod
+    def wait(op: Dict) -> int:
+        """Waits for a queued statement's batch to commit. Returns its rowcount."""
+        op["done"].wait()
+        if "error" in op:
+            raise op["error"]
+        return op["rowcount"]
+
+    def write(self, sql: str, params: Sequence) -> int:
+        return self.wait(self.enqueue(sql, params))
+
+    def run(self):
+        conn = None
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                if conn is None:
+                    conn = sqlite3.connect(self.db_path, timeout=30)
+                    conn.execute("PRAGMA synchronous = NORMAL")
+                try:
+                    with conn:
+                        for op in batch:
+                            op["rowcount"] = conn.execute(op["sql"], op["params"]).rowcount
+                except Exception:
+                    # The batch was rolled back; run its statements one by one so one bad write only fails its own caller.
+                    for op in batch:
+                        try:
+                            with conn:
+                                op["rowcount"] = conn.execute(op["sql"], op["params"]).rowcount
+                        except Exception as e:
+                            op["error"] = e
+                self.batches += 1
+            except Exception as e:
+                # No connection: fail this batch and try again with the next one.
+                conn = None
+                for op in batch:
+                    op.setdefault("error", e)
+            finally:
+                for op in batch:
+                    op["done"].set()
+
+
+class ContestEngine:
+    def __init__(self, db_path: str = CONTEST_DB_FILE, bank: Optional[QuizBank] = None):
+        self.db_path = db_path
+        self.bank = bank
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS contests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                item_ids TEXT NOT NULL,
+                duration REAL NOT NULL,
+                starts_at REAL NOT NULL,
+                ends_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_contests_topic_end ON contests (topic, ends_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS contest_entries (
+                contest_id INTEGER NOT NULL,
+                user_id TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                submitted_at REAL,
+                score INTEGER,
+                elapsed REAL,
+                answers BLOB,
+                correct_mask INTEGER,
+                PRIMARY KEY (contest_id, user_id)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_contest_entries_standings ON contest_entries (contest_id, score DESC, elapsed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_contest_entries_user ON contest_entries (user_id, contest_id)")
+        self._conn.commit()
+        self._writer = _BatchWriter(db_path)
+        self._entry_locks = [threading.Lock() for _ in range(ENTRY_LOCKS)]
+        self._contests: Dict[int, Contest] = {}
+        self._started: Dict[Tuple[int, str], float] = {}
+        self._graded: Set[Tuple[int, str]] = set()
+        self._standings: Dict[int, List[Tuple[int, float, str]]] = {}  # Sorted (-score, elapsed, user_id).
+        self._standings_read: Dict[int, float] = {}  # Monotonic time standings were last read from the database.
+
+    # --- Contests ---
+
+    def open_contest(self, course: str, topic: str, n_questions: int = DEFAULT_QUESTIONS,
+                     duration: float = DEFAULT_DURATION) -> Contest:
+        """The topic's contest that is still accepting contestants, or a new one drawn from the quiz pool."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM contests WHERE topic = ? AND ends_at > ? ORDER BY ends_at DESC LIMIT 1", (topic, now)
+            ).fetchone()
+        if row:
+            return self.get_contest(row["id"])
+        bank = self.bank or get_quiz_bank()
+        difficulty = TOPIC_META.get(topic, {}).get("difficulty", 3)
+        items = bank.sample(topic, n_questions, difficulty)
+        if len(items) < n_questions:
+            bank.generate(course, topic, n_questions - len(items), difficulty)
+            items = bank.sample(topic, n_questions, difficulty)
+        if not items:
+            raise ContestError(f"No quiz items are available for {topic}.")
+        with self._lock, self._conn:
+            contest_id = self._conn.execute(
+                "INSERT INTO contests (course, topic, item_ids, duration, starts_at, ends_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (course, topic, json.dumps([item.id for item in items]), duration, now, now + CONTEST_WINDOW),
+            ).lastrowid
+        return self.get_contest(contest_id)
+
+    def get_contest(self, contest_id: int) -> Contest:
+        """Loads a contest with its answer key on first use in this process."""
+        contest = self._contests.get(contest_id)
+        if contest is not None:
+            return contest
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM contests WHERE id = ?", (contest_id,)).fetchone()
+        if row is None:
+            raise ContestError(f"Contest {contest_id} does not exist.")
+        item_ids = json.loads(row["item_ids"])
+        items = (self.bank or get_quiz_bank()).get_items(item_ids)
+        contest = Contest(row["id"], row["course"], row["topic"], [items[i] for i in item_ids if i in items],
+                          row["duration"], row["starts_at"], row["ends_at"])
+        return self._contests.setdefault(contest_id, contest)
+
+    def _current_standings(self, contest_id: int) -> List[Tuple[int, float, str]]:
+        """
+        The contest's sorted standings, re-read from the database (by
+        idx_contest_entries_standings) when older than STANDINGS_REFRESH. Call with self._lock held.
+        """
+        read_at = self._standings_read.get(contest_id)
+        if read_at is not None and time.monotonic() - read_at < STANDINGS_REFRESH:
+            return self._standings[contest_id]
+        rows = self._conn.execute(
+            "SELECT score, elapsed, user_id FROM contest_entries WHERE contest_id = ? AND submitted_at IS NOT NULL",
+            (contest_id,),
+        ).fetchall()
+        self._standings[contest_id] = sorted((-row["score"], row["elapsed"], row["user_id"]) for row in rows)
+        self._standings_read[contest_id] = time.monotonic()
+        return self._standings[contest_id]
+
+    # --- Contestants ---
+
+    def _entry_lock(self, contest_id: int, user_id: str) -> threading.Lock:
+        return self._entry_locks[zlib.crc32(f"{contest_id}:{user_id}".encode("utf-8")) % ENTRY_LOCKS]
+
+    def _started_at(self, key: Tuple[int, str]) -> Optional[float]:
+        """
+        When the attempt started, read from the database if this process has
+        not seen it (it may have started in another one). Call with the entry lock held.
+        """
+        started_at = self._started.get(key)
+        if started_at is not None:
+            return started_at
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT started_at, submitted_at FROM contest_entries WHERE contest_id = ? AND user_id = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        if row["submitted_at"] is not None:
+            self._graded.add(key)
+        self._started[key] = row["started_at"]
+        return row["started_at"]
+
+    def start(self, contest_id: int, user_id: str) -> float:
+        """Starts (or resumes) a contestant's attempt. Returns their deadline."""
+        contest = self.get_contest(contest_id)
+        key = (contest_id, user_id)
+        op = None
+        with self._entry_lock(contest_id, user_id):
+            started_at = self._started_at(key)
+            if started_at is None:
+                started_at = time.time()
+                if started_at >= contest.ends_at:
+                    raise ContestError("This contest has closed.")
+                self._started[key] = started_at
+                # Queued under the lock: the writer is FIFO, so the entry exists before any submission updates it.
+                op = self._writer.enqueue(
+                    "INSERT OR IGNORE INTO contest_entries (contest_id, user_id, started_at) VALUES (?, ?, ?)",
+                    (contest_id, user_id, started_at),
+                )
+        if op is not None:
+            try:
+                inserted = self._writer.wait(op)
+            except Exception:
+                with self._entry_lock(contest_id, user_id):
+                    self._started.pop(key, None)
+                raise
+            if not inserted:
+                # Another process started this attempt first; its start time is the stored one.
+                with self._entry_lock(contest_id, user_id):
+                    self._started.pop(key, None)
+                    started_at = self._started_at(key)
+        return contest.deadline(started_at)
+
+    def submit(self, contest_id: int, user_id: str, choices: Dict[int, Optional[int]]) -> ContestResult:
+        """
+        Grades {item_id: option index} and records the result once its batch
+        has committed. Raises ContestError if an answer is not one of its
+        question's options, or the attempt was not started, is past its
+        deadline or was already submitted.
+
+        Time Complexity: O(q + n) for q questions and n contestants (a list insert), plus a share of one commit.
+        """
+        contest = self.get_contest(contest_id)
+        chosen = [choices.get(item.id) for item in contest.items]
+        for c, item in zip(chosen, contest.items):
+            if c is not None and not (isinstance(c, int) and 0 <= c < len(item.options)):
+                raise ContestError(f"{c!r} is not an option of question {item.id}.")
+        correct = [c == item.answer for c, item in zip(chosen, contest.items)]
+        score = sum(correct)
+        answers = bytes(NO_ANSWER if c is None else c for c in chosen)
+        mask = sum(1 << i for i, ok in enumerate(correct) if ok)
+        key = (contest_id, user_id)
+        now = time.time()
+        # The lock covers the checks and queueing the write; the entry counts as graded once the write is queued.
+        with self._entry_lock(contest_id, user_id):
+            started_at = self._started_at(key)
+            if key in self._graded:
+                raise ContestError("This contest has already been submitted.")
+            if started_at is None:
+                raise ContestError("Start the contest before submitting.")
+            if now > contest.deadline(started_at) + GRACE_SECONDS:
+                raise ContestError("Time is up for this contest.")
+            elapsed = now - started_at
+            op = self._writer.enqueue("""
+                UPDATE contest_entries SET submitted_at = ?, score = ?, elapsed = ?, answers = ?, correct_mask = ?
+                WHERE contest_id = ? AND user_id = ? AND submitted_at IS NULL
+            """, (now, score, elapsed, answers, mask, contest_id, user_id))
+            self._graded.add(key)
+        try:
+            rowcount = self._writer.wait(op)
+        except Exception:
+            self._graded.discard(key)
+            raise
+        if not rowcount:
+            # Another process got there first.
+            raise ContestError("This contest has already been submitted.")
+        entry = (-score, elapsed, user_id)
+        with self._lock:
+            standings = self._current_standings(contest_id)
+            i = bisect.bisect_left(standings, entry)
+            if i == len(standings) or standings[i] != entry:  # A re-read may already include it.
+                standings.insert(i, entry)
+            rank = bisect.bisect_left(standings, (-score,)) + 1
+        return ContestResult(contest_id, user_id, score, len(contest.items), elapsed, rank, correct)
+
+    # --- Results ---
+
+    def standings(self, contest_id: int, n: int = 10) -> List[Dict]:
+        """Live top `n`: by score, then time taken. Contestants with equal scores share a rank."""
+        self.get_contest(contest_id)
+        with self._lock:
+            standings = self._current_standings(contest_id)
+            top = standings[:n]
+            ranks = [bisect.bisect_left(standings, (neg_score,)) + 1 for neg_score, _, _ in top]
+        return [{"rank": rank, "user_id": user_id, "score": -neg_score, "elapsed": elapsed}
+                for rank, (neg_score, elapsed, user_id) in zip(ranks, top)]
+
+    def contestants(self, contest_id: int) -> int:
+        self.get_contest(contest_id)
+        with self._lock:
+            return len(self._current_standings(contest_id))
+
+    def history(self, user_id: str, limit: int = 20) -> List[Dict]:
+        """A student's submitted contests, newest first (idx_contest_entries_user)."""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT e.contest_id, c.course, c.topic, e.score, e.elapsed, e.submitted_at, e.answers, e.correct_mask,
+                       json_array_length(c.item_ids) AS total
+                FROM contest_entries AS e JOIN contests AS c ON c.id = e.contest_id
+                WHERE e.user_id = ? AND e.submitted_at IS NOT NULL
+                ORDER BY e.contest_id DESC LIMIT ?
+            """, (user_id, limit)).fetchall()
+        return [{
+            **{k: row[k] for k in ("contest_id", "course", "topic", "score", "total", "elapsed", "submitted_at")},
+            "answers": [None if b == NO_ANSWER else b for b in row["answers"]],
+            "correct": [bool(row["correct_mask"] >> i & 1) for i in range(row["total"])],
+        } for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_contest_engine(db_path: str = CONTEST_DB_FILE) -> ContestEngine:
+    return ContestEngine(db_path)
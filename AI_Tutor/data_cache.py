@@ -0,0 +1,79 @@
+# data_cache.py
+
+"""
+Caching for the Streamlit pages, keyed on a cheap data-version stamp.
+
+Streamlit re-runs a page script on every widget interaction. Query results
+cached here are reused until the database actually changes: `data_version`
+reads SQLite's `PRAGMA data_version` from one long-lived connection per
+database file (catalog and shards). The pragma changes whenever any other connection (the tracking
+worker, the chat page, a bulk load) commits, so a rerun that finds the same
+stamp skips the database and recomputation entirely.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Tuple
+
+import pandas as pd
+import streamlit as st
+
+from progress_store import PROGRESS_DB_FILE, get_progress_reader
+from recommender import load_progress
+from sharding import shard_count, shard_paths
+
+
+@st.cache_resource(show_spinner=False)
+def _version_watcher(db_path: str, inode: int) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """One never-writing connection per database file; a replaced file gets a new one."""
+    return sqlite3.connect(db_path, check_same_thread=False), threading.Lock()
+
+
+def _file_version(db_path: str) -> Tuple[int, int]:
+    path = os.path.abspath(db_path)
+    if not os.path.exists(path):
+        return 0, 0
+    inode = os.stat(path).st_ino
+    conn, lock = _version_watcher(path, inode)
+    with lock:
+        return inode, conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def data_version(db_path: str = PROGRESS_DB_FILE) -> Tuple[int, ...]:
+    """
+    (inode, PRAGMA data_version) for `db_path`, and for each of its shards when
+    the database is sharded; (0, 0) while a file does not exist.
+    Changes after any commit from another connection or when a file is replaced.
+
+    Time Complexity: O(S) for S shard files, no table access.
+    """
+    count = shard_count(db_path)
+    paths = [db_path] + (shard_paths(db_path, count) if count > 1 else [])
+    return tuple(part for path in paths for part in _file_version(path))
+
+
+# --- Cached Queries ---
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _progress_frame(db_path: str, version: Tuple[int, int]) -> pd.DataFrame:
+    return load_progress(db_path)
+
+
+def cached_progress(db_path: str = PROGRESS_DB_FILE) -> pd.DataFrame:
+    """recommender.load_progress, re-read only when the database has changed."""
+    return _progress_frame(db_path, data_version(db_path))
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _query_frame(db_path: str, version: Tuple[int, int], query: str, params: tuple) -> pd.DataFrame:
+    conn = get_progress_reader(db_path)
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def cached_query(query: str, params: tuple = (), db_path: str = PROGRESS_DB_FILE) -> pd.DataFrame:
+    """Runs a read-only query, re-using the result until the database changes."""
+    return _query_frame(db_path, data_version(db_path), query, tuple(params))
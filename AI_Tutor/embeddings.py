@@ -0,0 +1,88 @@
+# embeddings.py
+
+"""
+CPU-only text embeddings for local classification and answer lookup.
+
+Two encoders share one interface (`encode(texts) -> (n, dim) float32 array of
+unit vectors`):
+- HashedNgramEncoder: hashed word and character n-grams. No model files, a few
+  microseconds per text.
+- TransformerEncoder: a small sentence-transformer loaded from a local path with
+  `transformers` (mean-pooled). Used when AI_TUTOR_EMBEDDING_MODEL_PATH is set.
+"""
+
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+# --- Configuration Block ---
+EMBEDDING_MODEL_PATH = os.getenv("AI_TUTOR_EMBEDDING_MODEL_PATH", "")
+HASHED_DIM = 2 ** 14
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashedNgramEncoder:
+    """Bag of hashed word unigrams/bigrams and character 4-grams, log-scaled and L2-normalized."""
+
+    def __init__(self, dim: int = HASHED_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        features = words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f" {word} "
+            features.extend(padded[i:i + 4] for i in range(max(1, len(padded) - 3)))
+        return features
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                matrix[row, zlib.crc32(feature.encode("utf-8")) % self.dim] += 1.0
+        np.log1p(matrix, out=matrix)
+        return _normalize(matrix)
+
+
+class TransformerEncoder:
+    """Mean-pooled sentence embeddings from a local `transformers` checkpoint, on CPU."""
+
+    def __init__(self, model_path: str, max_length: int = 256):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        self.model = AutoModel.from_pretrained(model_path, local_files_only=True).eval()
+        self.max_length = max_length
+        self.dim = self.model.config.hidden_size
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with self._torch.no_grad():
+            batch = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+            hidden = self.model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return _normalize(pooled.numpy())
+
+
+@lru_cache(maxsize=1)
+def get_encoder():
+    """The process-wide encoder: the local transformer if configured, hashed n-grams otherwise."""
+    if EMBEDDING_MODEL_PATH:
+        try:
+            return TransformerEncoder(EMBEDDING_MODEL_PATH)
+        except (ImportError, OSError) as e:
+            print(f"Could not load embedding model from {EMBEDDING_MODEL_PATH} ({e}); using hashed n-grams.")
+    return HashedNgramEncoder()
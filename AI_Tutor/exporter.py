@@ -0,0 +1,295 @@
+# exporter.py
+
+"""
+Streaming export of student progress, mastery history and chat transcripts.
+
+Rows are read from SQLite in chunks of CHUNK_ROWS with a cursor and written
+out chunk by chunk, so memory stays bounded however large the tables get.
+Formats: csv, jsonl, parquet (parquet needs pyarrow).
+
+Usage:
+    python exporter.py progress progress.csv
+    python exporter.py history history.parquet --user-id student456 --since 2025-01-01
+    python exporter.py transcripts transcripts.jsonl --course "Machine Learning"
+"""
+
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoint_store import CHAT_HISTORY_DB_FILE, checkpoint_paths
+from progress_store import PROGRESS_DB_FILE, get_progress_reader
+
+# --- Configuration Block ---
+CHUNK_ROWS = 5000
+SPOOL_BYTES = 8 * 1024 * 1024  # Downloads larger than this are spooled to disk.
+FORMATS = ["csv", "jsonl", "parquet"]
+DATASETS = ["progress", "history", "transcripts"]
+
+COLUMNS: Dict[str, List[str]] = {
+    "progress": ["user_id", "course", "topic", "mastery_level"],
+    "history": ["user_id", "course", "topic", "old_level", "new_level", "thread_id", "recorded_at"],
+    "transcripts": ["thread_id", "user_id", "course", "topic", "updated_at", "turn", "role", "content"],
+}
+
+
+def _timestamp(day: Optional[str], end_of_day: bool = False) -> Optional[float]:
+    """'YYYY-MM-DD' (UTC) to a unix timestamp; the end of the day when `end_of_day`."""
+    if not day:
+        return None
+    start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    return start + 86400 if end_of_day else start
+
+
+def _where(filters: Dict) -> tuple:
+    clauses = [f"{column} {op} ?" for (column, op), value in filters.items() if value is not None]
+    params = [value for value in filters.values() if value is not None]
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _fetch_chunks(conn: sqlite3.Connection, query: str, params: List, columns: List[str]) -> Iterator[List[Dict]]:
+    cursor = conn.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(CHUNK_ROWS)
+        if not rows:
+            return
+        yield [dict(zip(columns, row)) for row in rows]
+
+
+# --- Readers ---
+
+def iter_progress(conn: sqlite3.Connection, user_id: Optional[str] = None, course: Optional[str] = None) -> Iterator[List[Dict]]:
+    """student_progress has no timestamps, so date filters do not apply."""
+    where, params = _where({("user_id", "="): user_id, ("course", "="): course})
+    columns = COLUMNS["progress"]
+    return _fetch_chunks(conn, f"SELECT {', '.join(columns)} FROM student_progress{where} ORDER BY user_id, course, topic",
+                         params, columns)
+
+
+def iter_history(conn: sqlite3.Connection, user_id: Optional[str] = None, course: Optional[str] = None,
+                 since: Optional[str] = None, until: Optional[str] = None) -> Iterator[List[Dict]]:
+    where, params = _where({
+        ("user_id", "="): user_id, ("course", "="): course,
+        ("recorded_at", ">="): _timestamp(since), ("recorded_at", "<"): _timestamp(until, end_of_day=True),
+    })
+    columns = COLUMNS["history"]
+    return _fetch_chunks(conn, f"SELECT {', '.join(columns)} FROM mastery_events{where} ORDER BY id", params, columns)
+
+
+def _message_role(message) -> Optional[str]:
+    if isinstance(message, HumanMessage):
+        return "user"
+    if isinstance(message, AIMessage):
+        return "assistant"
+    if isinstance(message, ToolMessage):
+        return "tool"
+    return None
+
+
+def _latest_checkpoints(chat_db_path: str) -> Iterator[tuple]:
+    """(heads, saver) per CHUNK_ROWS threads of one checkpoint file; heads are (thread_id, latest checkpoint_id)."""
+    chat_conn = sqlite3.connect(chat_db_path, check_same_thread=False)
+    saver = SqliteSaver(chat_conn)
+    try:
+        latest = chat_conn.execute(
+            "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints WHERE checkpoint_ns = '' GROUP BY thread_id ORDER BY thread_id"
+        )
+        while True:
+            heads = latest.fetchmany(CHUNK_ROWS)
+            if not heads:
+                return
+            yield heads, saver
+    finally:
+        chat_conn.close()
+
+
+def _thread_labels(conn: sqlite3.Connection, thread_ids: List[str]) -> Dict[str, tuple]:
+    """{thread_id: (owner, course, topic)} for one chunk of threads; untracked threads have no course or topic."""
+    ids = json.dumps(thread_ids)
+    labels = {
+        row[0]: (row[1], row[2], row[3])
+        for row in conn.execute(
+            "SELECT thread_id, user_id, course, topic FROM thread_topics WHERE thread_id IN (SELECT value FROM json_each(?))",
+            (ids,))
+    }
+    for thread_id, owner in conn.execute(
+            "SELECT thread_id, user_id FROM threads WHERE thread_id IN (SELECT value FROM json_each(?))", (ids,)):
+        labels.setdefault(thread_id, (owner, None, None))
+    return labels
+
+
+def iter_transcripts(conn: sqlite3.Connection, user_id: Optional[str] = None, course: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None,
+                     chat_db_path: str = CHAT_HISTORY_DB_FILE, catalog_path: str = PROGRESS_DB_FILE) -> Iterator[List[Dict]]:
+    """
+    One row per message of each thread's latest checkpoint, shard by shard. The
+    user comes from the thread's owner, course and topic from thread_topics (set
+    when a thread is tracked); with a course filter, untracked threads are
+    skipped. Dates filter on the checkpoint time.
+    """
+    start, end = _timestamp(since), _timestamp(until, end_of_day=True)
+    chunk = []
+    for path in checkpoint_paths(chat_db_path, catalog_path):
+        for heads, saver in _latest_checkpoints(path):
+            # Labels are looked up per chunk of threads, so memory stays bounded.
+            labels = _thread_labels(conn, [thread_id for thread_id, _ in heads])
+            for thread_id, checkpoint_id in heads:
+                owner, thread_course, topic = labels.get(thread_id, (None, None, None))
+                if (user_id and owner != user_id) or (course and thread_course != course):
+                    continue
+                saved = saver.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": checkpoint_id}})
+                if saved is None:
+                    continue
+                updated_at = datetime.fromisoformat(saved.checkpoint["ts"]).timestamp()
+                if (start and updated_at < start) or (end and updated_at >= end):
+                    continue
+                for turn, message in enumerate(saved.checkpoint["channel_values"].get("messages", [])):
+                    role = _message_role(message)
+                    if role is None:
+                        continue
+                    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+                    chunk.append({
+                        "thread_id": thread_id, "user_id": owner, "course": thread_course, "topic": topic,
+                        "updated_at": updated_at, "turn": turn, "role": role, "content": content,
+                    })
+                if len(chunk) >= CHUNK_ROWS:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+READERS = {"progress": iter_progress, "history": iter_history, "transcripts": iter_transcripts}
+
+
+# --- Writers ---
+
+def _write_csv(chunks: Iterator[List[Dict]], out, columns: List[str]) -> int:
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = csv.DictWriter(text, fieldnames=columns)
+    writer.writeheader()
+    rows = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        rows += len(chunk)
+    text.detach()
+    return rows
+
+
+def _write_jsonl(chunks: Iterator[List[Dict]], out, columns: List[str]) -> int:
+    rows = 0
+    for chunk in chunks:
+        out.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk).encode("utf-8"))
+        rows += len(chunk)
+    return rows
+
+
+def _require_pyarrow():
+    if importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+
+
+def _write_parquet(chunks: Iterator[List[Dict]], out, columns: List[str]) -> int:
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer, rows = None, 0
+    for chunk in chunks:
+        table = pa.Table.from_pylist(chunk)
+        if writer is None:
+            writer = pq.ParquetWriter(out, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        rows += len(chunk)
+    if writer is None:
+        # Nothing matched: still write a valid file with string columns.
+        writer = pq.ParquetWriter(out, pa.schema([(c, pa.string()) for c in columns]))
+    writer.close()
+    return rows
+
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+# --- Public API ---
+
+def export(dataset: str, out, fmt: str = "csv", db_path: str = PROGRESS_DB_FILE, **filters) -> int:
+    """
+    Streams `dataset` ("progress", "history" or "transcripts") to the binary
+    file object `out` in `fmt`. Filters: user_id, course, since, until
+    (YYYY-MM-DD, inclusive), plus chat_db_path for transcripts. Returns rows written.
+
+    Memory: O(CHUNK_ROWS) rows, independent of table size.
+    """
+    if dataset not in READERS:
+        raise ValueError(f"Unknown dataset '{dataset}', expected one of {DATASETS}")
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    if fmt == "parquet":
+        _require_pyarrow()  # Before anything is read or written.
+    if dataset == "transcripts":
+        filters.setdefault("catalog_path", db_path)
+    conn = get_progress_reader(db_path)
+    try:
+        return WRITERS[fmt](READERS[dataset](conn, **filters), out, COLUMNS[dataset])
+    finally:
+        conn.close()
+
+
+def export_to_file(dataset: str, path: str, fmt: Optional[str] = None, **kwargs) -> int:
+    """Exports to `path`; the format defaults to the file extension."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    try:
+        with open(path, "wb") as out:
+            return export(dataset, out, fmt, **kwargs)
+    except Exception:
+        # Don't leave a truncated export behind.
+        os.remove(path)
+        raise
+
+
+def export_for_download(dataset: str, fmt: str = "csv", **kwargs):
+    """
+    Exports into a spooled temporary file (in memory up to SPOOL_BYTES, then on
+    disk) rewound for reading, for st.download_button.
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    export(dataset, out, fmt, **kwargs)
+    out.seek(0)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=DATASETS)
+    parser.add_argument("output", help="Output file; '-' for stdout")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the output file extension")
+    parser.add_argument("--db", default=PROGRESS_DB_FILE, help="Progress database")
+    parser.add_argument("--chat-db", default=CHAT_HISTORY_DB_FILE, help="Chat history database (transcripts)")
+    parser.add_argument("--user-id")
+    parser.add_argument("--course")
+    parser.add_argument("--since", help="First day to include, YYYY-MM-DD (history, transcripts)")
+    parser.add_argument("--until", help="Last day to include, YYYY-MM-DD (history, transcripts)")
+    args = parser.parse_args()
+
+    filters = {"user_id": args.user_id, "course": args.course}
+    if args.dataset != "progress":
+        filters.update(since=args.since, until=args.until)
+    if args.dataset == "transcripts":
+        filters["chat_db_path"] = args.chat_db
+
+    if args.output == "-":
+        count = export(args.dataset, sys.stdout.buffer, args.format or "csv", db_path=args.db, **filters)
+    else:
+        count = export_to_file(args.dataset, args.output, args.format, db_path=args.db, **filters)
+    print(f"Exported {count} {args.dataset} rows.", file=sys.stderr)
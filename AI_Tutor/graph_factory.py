@@ -0,0 +1,294 @@
+# graph_factory.py
+
+"""
+One place that builds the tutoring graph.
+
+`get_graph(api_key, checkpointer)` compiles the assistant/tools graph once per
+(API key, checkpointer) and returns the same compiled graph afterwards, so a
+Streamlit rerun or a new request costs a dictionary lookup, and an in-memory
+checkpointer (and with it the conversation) lives as long as the process.
+`checkpointer` is "sqlite" (the shared chat history from checkpoint_store.py),
+"memory" (one InMemorySaver per key) or a saver instance.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import Annotated, Any, Dict, Hashable, List, Optional, Tuple, Union
+
+import pytesseract
+from dotenv import load_dotenv
+from google import genai
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.prebuilt import ToolNode, tools_condition
+from PIL import Image
+
+from answer_cache import get_answer_cache, image_fingerprint
+from checkpoint_store import open_checkpointer
+from image_store import get_image_store, stored_hash
+from llm_scheduler import scheduler
+from model_router import get_llm, model_for
+from quiz_bank import format_quiz, quiz_for_content
+from quiz_grading import NARRATIVE_ENABLED, feedback_prompt, grade_text, request_narrative
+from thread_store import DEFAULT_USER_ID
+from topic_classifier import EmbeddingTopicClassifier
+from usage_ledger import get_usage_ledger, usage_context
+
+load_dotenv()
+
+# --- Configuration Block ---
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT_FILE = "agent_prompt.txt"  # Read from the working directory, falling back to the app directory.
+MAX_GRAPHS = 32  # Compiled graphs kept, one per (API key, checkpointer); the least recently used are dropped.
+
+_graphs: Dict[Tuple[Optional[str], Hashable], Any] = {}  # In least recently used order.
+_graphs_lock = threading.Lock()
+
+
+def add_images(left: Optional[List[Dict]], right: Optional[List[Dict]]) -> List[Dict]:
+    """Reducer for State.images: appends new image references, once each."""
+    merged = list(left or [])
+    seen = {(ref["hash"], ref.get("turn")) for ref in merged}
+    for ref in right or []:
+        if (ref["hash"], ref.get("turn")) not in seen:
+            seen.add((ref["hash"], ref.get("turn")))
+            merged.append(ref)
+    return merged
+
+
+class State(MessagesState):
+    image_path: str = "No image uploaded"
+    # Images shown in the thread, as image-store references: {"hash", "name", "turn"}, where `turn`
+    # is the number of user messages before the image. Checkpointed, so a reloaded thread keeps them.
+    images: Annotated[List[Dict], add_images]
+
+
+def history_entries(values: Dict) -> List[Dict]:
+    """
+    A checkpointed thread as chat-history entries: {'role': 'user' | 'assistant', 'content'}
+    and {'role': 'image', 'hash', 'name'}, each image placed before the user message that followed it.
+    """
+    images = sorted(values.get('images') or [], key=lambda ref: ref.get("turn", 0))
+    entries, turn, i = [], 0, 0
+    for message in values.get('messages', []):
+        if isinstance(message, HumanMessage):
+            while i < len(images) and images[i].get("turn", 0) <= turn:
+                entries.append({'role': 'image', 'hash': images[i]["hash"], 'name': images[i].get("name")})
+                i += 1
+            entries.append({'role': 'user', 'content': message.content})
+            turn += 1
+        elif isinstance(message, AIMessage) and message.content:
+            entries.append({'role': 'assistant', 'content': message.content})
+    entries.extend({'role': 'image', 'hash': ref["hash"], 'name': ref.get("name")} for ref in images[i:])
+    return entries
+
+
+@lru_cache(maxsize=None)
+def genai_client(api_key: Optional[str] = None) -> genai.Client:
+    return genai.Client(api_key=api_key or os.getenv('GEMINI_API_KEY'))
+
+
+@lru_cache(maxsize=None)
+def topic_tagger() -> EmbeddingTopicClassifier:
+    """Tags cached answers by topic and picks the quiz bank topic for generate_quiz."""
+    return EmbeddingTopicClassifier()
+
+
+@lru_cache(maxsize=None)
+def get_checkpointer() -> BaseCheckpointSaver:
+    """Checkpoints in chat_history.db, or split across shard files by thread owner (see checkpoint_store.py)."""
+    return open_checkpointer()
+
+
+def system_prompt() -> str:
+    path = PROMPT_FILE if os.path.exists(PROMPT_FILE) else os.path.join(APP_DIR, PROMPT_FILE)
+    with open(path, 'r') as f:
+        return f.read()
+
+
+# --- Tools ---
+
+def build_tools(api_key: Optional[str] = None) -> List:
+    """
+    The tutor's tools, calling Gemini with `api_key` (default: the environment's).
+    Their LLM calls are accounted to the tool, and use cheaper models once the student is over budget.
+    """
+
+    @tool
+    @usage_context(tool="explain_text")
+    def explain_text(input_or_image_text: str) -> str:
+        """
+        Uses Google Gemini to explain the obatined text from user input and given image in simple terms.
+        """
+        print("explaining the concept")
+        prompt = f"Explain the following concept step-by-step in simple language: {input_or_image_text}"
+        response = scheduler.invoke(get_llm("explanation", api_key, get_usage_ledger().over_budget()), prompt)
+        return response.content
+
+    @tool
+    @usage_context(tool="generate_feedback")
+    def generate_feedback(user_name: str, questions: str, answers: str, config: RunnableConfig) -> str:
+        """
+        Grades the student's quiz answers and gives feedback. Pass the quiz exactly as generated (with its [Q..] ids)
+        and the student's answers, in question order or as "Q12: B". Updates the student's progress.
+        """
+        print("generating feedback")
+        configurable = config.get("configurable", {})
+        # Quiz-bank questions are graded locally and instantly; the LLM narrative is optional and written in the background.
+        result = grade_text(configurable.get("user_id", DEFAULT_USER_ID), questions, answers, configurable.get("thread_id"))
+        if result is not None:
+            if NARRATIVE_ENABLED:
+                request_narrative(result, user_name, questions, answers, api_key=api_key)
+            return result.to_text()
+
+        # Questions from elsewhere have no answer key, so Gemini grades them.
+        llm = get_llm("feedback", api_key, get_usage_ledger().over_budget())
+        response = scheduler.invoke(llm, feedback_prompt(user_name, questions, answers))
+        return response.content
+
+    @tool
+    @usage_context(tool="generate_quiz")
+    def generate_quiz(input_or_image_text: str, config: RunnableConfig, num_questions: int = 5) -> str:
+        """
+        Generates multiple-choice quiz questions about the topic_text. Questions on catalog topics come
+        from the pre-generated quiz bank; Google Gemini writes new ones only when the bank runs out.
+        """
+        print("generating quiz")
+        user_id = config.get("configurable", {}).get("user_id", DEFAULT_USER_ID)
+        items = quiz_for_content(input_or_image_text, num_questions, user_id, topic_tagger(), api_key)
+        questions = format_quiz(items)
+        print("question:" , questions)
+        print("QUIZ END \n\n")
+        return questions
+
+    @tool
+    @usage_context(tool="extract_text_from_image")
+    def extract_text_from_image(image_path: str) -> str:
+        ''' extract text from image given the image_path'''
+        print("reading image")
+        print(image_path)
+        # Only images in the store are opened: the path comes from the model, which a user's message can steer.
+        image_hash = stored_hash(image_path)
+        stored = get_image_store().get(image_hash) if image_hash else None
+        if stored is None:
+            return "No uploaded image was found at that path."
+        img = Image.open(stored.path)
+        # Descriptions are cached by image content, so re-uploads and other threads reuse them.
+        store, vision_model = get_image_store(), model_for("vision")
+        cached = store.get_extraction(image_hash, vision_model)
+        if cached is not None:
+            return cached
+
+        try:
+            response = scheduler.run(
+                vision_model,
+                lambda: genai_client(api_key).models.generate_content(
+                    model=vision_model,
+                    contents=[img, "Describe this image in detail"]
+                ),
+                coalesce_key=image_hash,
+            )
+            store.set_extraction(image_hash, vision_model, response.text)
+            return response.text
+        except Exception as e:
+            print(f"Error generating content: {e}")
+            print("Now using OCR as fallback.")
+            response = pytesseract.image_to_string(img)
+            return response.strip()
+
+    return [explain_text, generate_quiz, generate_feedback, extract_text_from_image]
+
+
+# --- Graph ---
+
+def opening_question(state: State):
+    """The thread's first user question, or None once the conversation has context the cache can't see."""
+    human_messages = [m for m in state["messages"] if isinstance(m, HumanMessage)]
+    if len(human_messages) != 1:
+        return None
+    return str(human_messages[0].content).removeprefix("user_input:").strip()
+
+
+def build_graph(checkpointer: BaseCheckpointSaver, api_key: Optional[str] = None):
+    """Compiles a new assistant/tools graph. Prefer `get_graph`, which reuses compiled graphs."""
+    tools = build_tools(api_key)
+    llm_with_tools = get_llm("tutoring", api_key).bind_tools(tools)
+    degraded_llm_with_tools = get_llm("tutoring", api_key, degraded=True).bind_tools(tools)
+    ledger = get_usage_ledger()
+    prompt = system_prompt()
+    # Semantic answer cache (opt-in, see answer_cache.py); entries are tagged by topic for invalidation.
+    answer_cache = get_answer_cache()
+
+    # Node
+    # LLM calls are accounted to the configurable user_id/thread_id and the node (see usage_ledger.py).
+    def assistant(state: State):
+        sys_msg = SystemMessage(content=prompt.format(image_path=state['image_path']))
+        question = opening_question(state) if answer_cache else None
+        image_hash = image_fingerprint(state['image_path']) if question else ""
+        if question and isinstance(state["messages"][-1], HumanMessage):
+            cached = answer_cache.lookup(question, image_hash)
+            if cached is not None:
+                return {"messages": [AIMessage(content=cached)], "image_path": state["image_path"]}
+
+        # Over budget: any cached answer to the latest question, otherwise the cheaper model.
+        over_budget = ledger.over_budget()
+        if over_budget and answer_cache and not question and isinstance(state["messages"][-1], HumanMessage):
+            latest = str(state["messages"][-1].content).removeprefix("user_input:").strip()
+            cached = answer_cache.lookup(latest, image_fingerprint(state['image_path']))
+            if cached is not None:
+                return {"messages": [AIMessage(content=cached)], "image_path": state["image_path"]}
+
+        llm = degraded_llm_with_tools if over_budget else llm_with_tools
+        response = scheduler.invoke(llm, [sys_msg] + state["messages"])
+        if question and not response.tool_calls and isinstance(response.content, str) and response.content:
+            tag = topic_tagger().classify([{"content": question}])
+            course, topic = tag[:2] if tag else (None, None)
+            answer_cache.store(question, response.content, image_hash, course, topic)
+        return {"messages": [response], "image_path": state["image_path"]}
+
+    builder = StateGraph(State)
+
+    # Define nodes: these do the work
+    builder.add_node("assistant", assistant)
+    builder.add_node("tools", ToolNode(tools))
+
+    # Define edges: these determine how the control flow moves
+    builder.add_edge(START, "assistant")
+    builder.add_conditional_edges(
+        "assistant",
+        tools_condition,
+    )
+    builder.add_edge("tools", "assistant")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def get_graph(api_key: Optional[str] = None, checkpointer: Union[str, BaseCheckpointSaver] = "sqlite"):
+    """
+    The compiled graph for (`api_key`, `checkpointer`), built on first use.
+    A saver instance is part of the key itself (not its id, which Python
+    reuses after it is collected); at most MAX_GRAPHS graphs are kept.
+
+    Time Complexity: O(1) after the first call for a key.
+    """
+    key = (api_key, checkpointer)
+    with _graphs_lock:
+        graph = _graphs.pop(key, None)
+        if graph is None:
+            if checkpointer == "sqlite":
+                saver = get_checkpointer()
+            elif checkpointer == "memory":
+                saver = InMemorySaver()
+            elif isinstance(checkpointer, BaseCheckpointSaver):
+                saver = checkpointer
+            else:
+                raise ValueError(f"Unknown checkpointer '{checkpointer}'. Use 'sqlite', 'memory' or a saver instance.")
+            graph = build_graph(saver, api_key)
+        _graphs[key] = graph  # Most recently used last.
+        while len(_graphs) > MAX_GRAPHS:
+            _graphs.pop(next(iter(_graphs)))
+        return graph
@@ -0,0 +1,332 @@
+# image_store.py
+
+"""
+Content-addressed store for uploaded images.
+
+An upload is named by the sha256 of its bytes (`images/store/ab/abcd....png`),
+so identical uploads are written once, whoever sends them and whatever the
+file is called. `image_store.db` indexes each image's size, format and
+dimensions, which users and threads it was uploaded to, and when it was last
+used. When the store grows past MAX_STORE_MB, the least recently used images
+are evicted together with everything derived from them.
+
+The hash is the key for everything derived from an image: text extracted by
+the vision model is cached in `image_extractions`, and derived files such as
+thumbnails live at `derived_path(hash, ...)`. The answer cache's image
+fingerprint is the same sha256.
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, features
+
+from thread_store import DEFAULT_USER_ID
+
+# --- Configuration Block ---
+IMAGE_STORE_DIR = os.path.join("images", "store")
+DERIVED_DIR = os.path.join("images", "derived")
+IMAGE_INDEX_DB_FILE = "image_store.db"
+MAX_STORE_MB = float(os.getenv("AI_TUTOR_IMAGE_STORE_MB", "500"))
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif", "BMP": "bmp"}
+THUMBNAIL_SIDE = 320        # Longest side of chat-history thumbnails, in pixels.
+THUMBNAIL_QUALITY = 75
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+
+
+@dataclass
+class StoredImage:
+    hash: str
+    path: str
+    format: str
+    width: int
+    height: int
+    bytes: int
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def stored_hash(path: Optional[str]) -> Optional[str]:
+    """The hash of an image inside the store, read from its name; None for any other path."""
+    if not path:
+        return None
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(stem) == 64 and os.path.basename(os.path.dirname(path)) == stem[:2] and set(stem) <= set("0123456789abcdef"):
+        return stem
+    return None
+
+
+class ImageStore:
+    def __init__(self, root: str = IMAGE_STORE_DIR, db_path: str = IMAGE_INDEX_DB_FILE,
+                 derived_root: str = DERIVED_DIR, max_bytes: float = MAX_STORE_MB * 1024 * 1024):
+        self.root = root
+        self.derived_root = derived_root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        os.makedirs(derived_root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._thumbnails: Dict[Tuple[str, int], str] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                hash TEXT PRIMARY KEY,
+                format TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_images_last_used ON images (last_used_at)")
+        # Who uploaded each image, and where; one row per (image, user, thread).
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_refs (
+                hash TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL DEFAULT '',
+                filename TEXT,
+                uploaded_at REAL NOT NULL,
+                PRIMARY KEY (hash, user_id, thread_id)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_image_refs_user ON image_refs (user_id, uploaded_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_image_refs_thread ON image_refs (thread_id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_extractions (
+                hash TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (hash, kind)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    # --- Layout ---
+
+    def path_for(self, image_hash: str, format: str) -> str:
+        return os.path.join(self.root, image_hash[:2], f"{image_hash}.{FORMAT_EXTENSIONS.get(format, 'img')}")
+
+    def derived_path(self, image_hash: str, suffix: str) -> str:
+        """Where a file derived from an image (e.g. suffix '256.webp') lives; evicted with the image."""
+        return os.path.join(self.derived_root, image_hash[:2], f"{image_hash}-{suffix}")
+
+    # --- Writes ---
+
+    def put(self, data: bytes, user_id: str, thread_id: Optional[str] = None,
+            filename: Optional[str] = None) -> StoredImage:
+        """
+        Stores an upload, writing the file only if these bytes are new, and
+        records who uploaded it to which thread. Raises ValueError for data
+        that is not an image.
+
+        Time Complexity: O(size) to hash; decoding and writing only for new content.
+        """
+        image_hash = content_hash(data)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM images WHERE hash = ?", (image_hash,)).fetchone()
+        if row is None or not os.path.exists(self.path_for(image_hash, row["format"])):
+            try:
+                with Image.open(io.BytesIO(data)) as img:
+                    format, (width, height) = img.format or "PNG", img.size
+            except Exception as e:
+                raise ValueError(f"Not a readable image: {e}")
+            path = self.path_for(image_hash, format)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        else:
+            format, width, height = row["format"], row["width"], row["height"]
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO images (hash, format, width, height, bytes, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(hash) DO UPDATE SET last_used_at = excluded.last_used_at
+            """, (image_hash, format, width, height, len(data), now, now))
+            self._conn.execute("""
+                INSERT INTO image_refs (hash, user_id, thread_id, filename, uploaded_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(hash, user_id, thread_id) DO UPDATE SET uploaded_at = excluded.uploaded_at
+            """, (image_hash, user_id, str(thread_id or ""), filename, now))
+        self.enforce_retention(keep=image_hash)
+        return StoredImage(image_hash, self.path_for(image_hash, format), format, width, height, len(data))
+
+    def touch(self, image_hash: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE images SET last_used_at = ? WHERE hash = ?", (time.time(), image_hash))
+
+    def enforce_retention(self, max_bytes: Optional[float] = None, keep: Optional[str] = None) -> int:
+        """
+        Evicts least recently used images (with their derived files, refs and
+        extractions) until the store fits in `max_bytes`. Returns the number evicted.
+
+        Time Complexity: O(n) for the size total, then O(log n) per eviction via idx_images_last_used.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM images").fetchone()[0]
+            if total <= limit:
+                return 0
+            victims = []
+            cursor = self._conn.execute("SELECT hash, format, bytes FROM images ORDER BY last_used_at")
+            for row in cursor:
+                if total <= limit:
+                    break
+                if row["hash"] == keep:
+                    continue
+                victims.append(row)
+                total -= row["bytes"]
+            cursor.close()
+            with self._conn:
+                for table in ("images", "image_refs", "image_extractions"):
+                    self._conn.executemany(f"DELETE FROM {table} WHERE hash = ?", [(v["hash"],) for v in victims])
+        for victim in victims:
+            for key in [key for key in self._thumbnails if key[0] == victim["hash"]]:
+                self._thumbnails.pop(key, None)
+            for path in [self.path_for(victim["hash"], victim["format"])] + glob.glob(self.derived_path(victim["hash"], "*")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        if victims:
+            print(f"Image store: evicted {len(victims)} images to stay under {limit / 1024 / 1024:.0f} MB.")
+        return len(victims)
+
+    # --- Reads ---
+
+    def get(self, image_hash: str) -> Optional[StoredImage]:
+        """The stored image, or None if it was never stored or has been evicted."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM images WHERE hash = ?", (image_hash,)).fetchone()
+        if row is None:
+            return None
+        path = self.path_for(image_hash, row["format"])
+        if not os.path.exists(path):
+            return None
+        return StoredImage(image_hash, path, row["format"], row["width"], row["height"], row["bytes"])
+
+    def user_image(self, image_hash: str, user_id: str) -> Optional[StoredImage]:
+        """The stored image if `user_id` uploaded it; None otherwise (callers can't reach other students' images)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM image_refs WHERE hash = ? AND user_id = ? LIMIT 1", (image_hash, user_id)
+            ).fetchone()
+        return self.get(image_hash) if row else None
+
+    def thumbnail(self, image_hash: str, max_side: int = THUMBNAIL_SIDE) -> Optional[str]:
+        """
+        Path of a copy downscaled to `max_side`, in WebP (JPEG where Pillow
+        lacks WebP), made on first request and kept next to the image's other
+        derived files. Small images are returned as they are; None once evicted.
+
+        Time Complexity: O(1) once made (an in-process lookup); one decode and encode the first time.
+        """
+        key = (image_hash, max_side)
+        path = self._thumbnails.get(key)
+        if path is not None and os.path.exists(path):
+            return path
+        stored = self.get(image_hash)
+        if stored is None:
+            return None
+        if max(stored.width, stored.height) <= max_side:
+            path = stored.path
+        else:
+            path = self.derived_path(image_hash, f"{max_side}.{FORMAT_EXTENSIONS[THUMBNAIL_FORMAT]}")
+            if not os.path.exists(path):
+                with Image.open(stored.path) as img:
+                    img.thumbnail((max_side, max_side))
+                    if img.mode not in ("RGB", "L", "RGBA"):
+                        img = img.convert("RGBA")
+                    if THUMBNAIL_FORMAT == "JPEG" and img.mode == "RGBA":
+                        img = img.convert("RGB")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    img.save(tmp, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+                    os.replace(tmp, path)
+        self._thumbnails[key] = path
+        return path
+
+    def thread_images(self, thread_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, user_id, filename, uploaded_at FROM image_refs WHERE thread_id = ? ORDER BY uploaded_at",
+                (str(thread_id),),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            images, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM images").fetchone()
+            uploads = self._conn.execute("SELECT COUNT(*) FROM image_refs").fetchone()[0]
+        return {"images": images, "bytes": total, "uploads": uploads, "limit_bytes": self.max_bytes}
+
+    # --- Extraction Cache ---
+
+    def get_extraction(self, image_hash: str, kind: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM image_extractions WHERE hash = ? AND kind = ?", (image_hash, kind)
+            ).fetchone()
+        return row["text"] if row else None
+
+    def set_extraction(self, image_hash: str, kind: str, text: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_extractions (hash, kind, text, created_at) VALUES (?, ?, ?, ?)",
+                (image_hash, kind, text, time.time()),
+            )
+
+
+@lru_cache(maxsize=None)
+def get_image_store() -> ImageStore:
+    return ImageStore()
+
+
+def file_hash(path: str) -> str:
+    """sha256 of an image file; free for files in the store, whose name is their hash."""
+    image_hash = stored_hash(path)
+    if image_hash:
+        return image_hash
+    with open(path, "rb") as f:
+        return content_hash(f.read())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or prune the uploaded image store.")
+    parser.add_argument("--prune-mb", type=float, help="Evict least recently used images down to this size")
+    parser.add_argument("--import-dir", help="Add loose image files (e.g. old uploads in images/) to the store")
+    parser.add_argument("--user-id", default=DEFAULT_USER_ID, help="Owner recorded for imported images")
+    args = parser.parse_args()
+
+    store = get_image_store()
+    if args.import_dir:
+        imported = 0
+        for name in sorted(os.listdir(args.import_dir)):
+            path = os.path.join(args.import_dir, name)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    try:
+                        store.put(f.read(), args.user_id, filename=name)
+                        imported += 1
+                    except ValueError:
+                        pass
+        print(f"Imported {imported} images from {args.import_dir}.")
+    if args.prune_mb is not None:
+        store.enforce_retention(args.prune_mb * 1024 * 1024)
+    print(store.stats())
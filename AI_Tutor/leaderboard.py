@@ -0,0 +1,461 @@
+# leaderboard.py
+
+"""
+Incrementally maintained leaderboards for the Community page.
+
+Boards:
+    global              sum of a student's mastery over every topic
+    course:<course>     sum of mastery over the course's topics
+    week:<YYYY-Www>     mastery points gained in that ISO week (time window)
+
+Scores live in `leaderboard.db` (every student in one file, whatever the
+progress shard count) and are adjusted by the deltas of each progress write,
+after it commits. Deltas are summed in memory and applied by a background
+flusher every FLUSH_SECONDS (sooner past FLUSH_ROWS pending scores), so
+progress writers on different shards never queue on the leaderboard file;
+reads in the same process flush first, other processes see scores up to
+FLUSH_SECONDS late. Only catalog topics (TOPIC_META) score. Each board also
+keeps a Fenwick tree over score buckets, stored as rows, so a student's rank
+is a count of higher buckets read from O(log B) rows (plus the few higher
+scores in their own bucket) instead of a scan over everyone ahead of them. Top-N and neighbours are range scans on the
+(board, score, user_id) index.
+
+Rebuild from the progress database (existing installs, bulk loads):
+    python leaderboard.py --rebuild
+"""
+
+import argparse
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sharding import map_shards
+from topic_meta import TOPICS, TOPIC_META
+
+# --- Configuration Block ---
+LEADERBOARD_DB_FILE = "leaderboard.db"
+GLOBAL_BOARD = "global"
+SCORE_SCALE = 10                            # Tree buckets per point.
+MAX_SCORE = 100.0 * len(TOPIC_META)         # Highest possible global score; also caps weekly gains.
+BUCKETS = int(MAX_SCORE * SCORE_SCALE) + 1
+WEEKS_KEPT = 8                              # Weekly boards older than this are dropped.
+WEEK_SECONDS = 7 * 86400
+FLUSH_SECONDS = 1.0                         # Most time a score change waits before it is written.
+FLUSH_ROWS = 1000                           # Pending (board, user) scores that trigger an early flush.
+_USER_CHUNK = 500  # Users per score lookup query.
+
+
+def course_board(course: str) -> str:
+    return f"course:{course}"
+
+
+def week_board(timestamp: Optional[float] = None) -> str:
+    """Weekly board for a time (default now): its ISO week, which starts on Monday (UTC) and never splits at New Year."""
+    year, week, _ = datetime.fromtimestamp(time.time() if timestamp is None else timestamp, timezone.utc).isocalendar()
+    return f"week:{year}-W{week:02d}"
+
+
+def bucket_of(score: float) -> int:
+    # Same truncation as CAST(score * SCORE_SCALE AS INTEGER) in SQL (see rank_of_score).
+    return min(BUCKETS - 1, max(0, int(score * SCORE_SCALE)))
+
+
+# --- Fenwick Tree Nodes ---
+
+def _update_nodes(bucket: int) -> Iterable[int]:
+    """Tree nodes whose count includes `bucket` (1-based Fenwick indexing)."""
+    node = bucket + 1
+    while node <= BUCKETS:
+        yield node
+        node += node & -node
+
+
+def _prefix_nodes(bucket: int) -> List[int]:
+    """Nodes whose counts sum to the number of scores in buckets 0..bucket."""
+    nodes, node = [], bucket + 1
+    while node > 0:
+        nodes.append(node)
+        node -= node & -node
+    return nodes
+
+
+def _build_tree(buckets: Iterable[int]) -> Dict[int, int]:
+    """Fenwick tree counts for a board's score buckets, built in O(B)."""
+    tree = [0] * (BUCKETS + 1)
+    for bucket in buckets:
+        tree[bucket + 1] += 1
+    for node in range(1, BUCKETS + 1):
+        parent = node + (node & -node)
+        if parent <= BUCKETS:
+            tree[parent] += tree[node]
+    return {node: count for node, count in enumerate(tree) if count}
+
+
+def score_deltas(events: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """
+    {board: {user_id: score change}} for progress events (with old_level filled in).
+    Placeholder labels such as General/General are not catalog topics and score nothing.
+    """
+    deltas = defaultdict(lambda: defaultdict(float))
+    for event in events:
+        if event["topic"] not in TOPIC_META:
+            continue
+        delta = event["new_level"] - (event.get("old_level") or 0.0)
+        if not delta:
+            continue
+        user_id = event["user_id"]
+        deltas[GLOBAL_BOARD][user_id] += delta
+        deltas[course_board(event["course"])][user_id] += delta
+        if delta > 0:
+            deltas[week_board(event["recorded_at"])][user_id] += delta
+    return deltas
+
+
+class Leaderboard:
+    def __init__(self, db_path: str = LEADERBOARD_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Autocommit mode: writes open their own BEGIN IMMEDIATE so concurrent processes don't lose updates.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS leaderboard_scores (
+                board TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (board, user_id)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard_scores (board, score, user_id)")
+        # `built_at` is set by rebuild(); until then the boards are empty, not just quiet.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS leaderboard_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Fenwick tree per board: `count` of scores over a range of buckets ending at `node`.
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS leaderboard_tree (
+                board TEXT NOT NULL,
+                node INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (board, node)
+            ) WITHOUT ROWID
+        """)
+        self._pruned_week = None
+        self._built = False
+        # Score deltas not yet written: {board: {user_id: delta}}.
+        self._pending = defaultdict(lambda: defaultdict(float))
+        self._pending_rows = 0
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def is_built(self) -> bool:
+        """True once `rebuild` has populated this database."""
+        if not self._built:
+            with self._lock:
+                self._built = self._conn.execute(
+                    "SELECT 1 FROM leaderboard_meta WHERE key = 'built_at'"
+                ).fetchone() is not None
+        return self._built
+
+    # --- Writes ---
+
+    def _scores(self, board: str, user_ids: List[str]) -> Dict[str, float]:
+        scores = {}
+        for i in range(0, len(user_ids), _USER_CHUNK):
+            chunk = user_ids[i:i + _USER_CHUNK]
+            scores.update(self._conn.execute(
+                f"SELECT user_id, score FROM leaderboard_scores WHERE board = ? AND user_id IN ({','.join('?' * len(chunk))})",
+                [board, *chunk],
+            ).fetchall())
+        return scores
+
+    def _apply(self, deltas: Dict[str, Dict[str, float]]):
+        """
+        Adds `deltas` to the boards and moves the students between tree
+        buckets. Runs inside the caller's transaction.
+
+        Time Complexity: O(U (log n + log B)) for U changed (board, user) scores.
+        """
+        tree = defaultdict(int)
+        rows = []
+        for board, users in deltas.items():
+            current = self._scores(board, list(users))
+            for user_id, delta in users.items():
+                old = current.get(user_id)
+                new = min(MAX_SCORE, max(0.0, (old or 0.0) + delta))
+                rows.append((board, user_id, new))
+                if old is not None and bucket_of(old) == bucket_of(new):
+                    continue
+                if old is not None:
+                    for node in _update_nodes(bucket_of(old)):
+                        tree[(board, node)] -= 1
+                for node in _update_nodes(bucket_of(new)):
+                    tree[(board, node)] += 1
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO leaderboard_scores (board, user_id, score) VALUES (?, ?, ?)", rows
+        )
+        self._conn.executemany("""
+            INSERT INTO leaderboard_tree (board, node, count) VALUES (?, ?, ?)
+            ON CONFLICT(board, node) DO UPDATE SET count = count + excluded.count
+        """, [(board, node, count) for (board, node), count in tree.items() if count])
+
+    def record_events(self, events: List[Dict]):
+        """
+        Queues the score changes of committed progress events for the flusher.
+
+        Time Complexity: O(E) for E events; never waits on the database.
+        """
+        deltas = score_deltas(events)
+        if not deltas:
+            return
+        with self._pending_lock:
+            for board, users in deltas.items():
+                pending = self._pending[board]
+                for user_id, delta in users.items():
+                    if user_id not in pending:
+                        self._pending_rows += 1
+                    pending[user_id] += delta
+            due = self._pending_rows >= FLUSH_ROWS
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="leaderboard-flush", daemon=True)
+                self._flusher.start()
+        if due:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Leaderboard flush failed: {e}")
+
+    def flush(self):
+        """Applies the pending score changes in one transaction."""
+        with self._pending_lock:
+            if not self._pending_rows:
+                return
+            deltas, self._pending, self._pending_rows = self._pending, defaultdict(lambda: defaultdict(float)), 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._apply(deltas)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                # Put the deltas back so the next flush retries them.
+                with self._pending_lock:
+                    for board, users in deltas.items():
+                        for user_id, delta in users.items():
+                            if user_id not in self._pending[board]:
+                                self._pending_rows += 1
+                            self._pending[board][user_id] += delta
+                raise
+        if self._pruned_week != week_board():
+            self.prune_weeks()
+
+    def prune_weeks(self, keep: int = WEEKS_KEPT):
+        """Drops weekly boards older than `keep` weeks."""
+        oldest = week_board(time.time() - keep * WEEK_SECONDS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM leaderboard_scores WHERE board LIKE 'week:%' AND board < ?", (oldest,))
+            self._conn.execute("DELETE FROM leaderboard_tree WHERE board LIKE 'week:%' AND board < ?", (oldest,))
+            self._conn.execute("COMMIT")
+        self._pruned_week = week_board()
+
+    def rebuild(self, catalog_path: str, weeks: int = WEEKS_KEPT) -> int:
+        """
+        Recomputes every board from the progress database (all shards): mastery
+        sums from `student_progress`, weekly gains from `mastery_events`.
+        Returns the number of scores written. Pending deltas are dropped: the
+        progress database already includes them.
+        """
+        since = time.time() - weeks * WEEK_SECONDS
+        with self._pending_lock:
+            self._pending, self._pending_rows = defaultdict(lambda: defaultdict(float)), 0
+
+        def read(conn):
+            topics = list(TOPIC_META)
+            progress = conn.execute(
+                f"SELECT user_id, course, SUM(mastery_level) FROM student_progress "
+                f"WHERE topic IN ({','.join('?' * len(topics))}) GROUP BY user_id, course", topics,
+            ).fetchall()
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            gains = conn.execute(f"""
+                SELECT user_id, CAST(recorded_at / 86400 AS INTEGER), SUM(MAX(0, new_level - COALESCE(old_level, 0)))
+                FROM mastery_events WHERE recorded_at >= ? AND topic IN ({','.join('?' * len(topics))}) GROUP BY 1, 2
+            """, (since, *topics)).fetchall() if "mastery_events" in tables else []
+            return progress, gains
+
+        scores = defaultdict(lambda: defaultdict(float))
+        for progress, gains in map_shards(catalog_path, read):
+            for user_id, course, total in progress:
+                scores[GLOBAL_BOARD][user_id] += total
+                scores[course_board(course)][user_id] = total
+            # Gains come per UTC day; SQLite's strftime has no ISO week before 3.46, so days are mapped here.
+            for user_id, day, gained in gains:
+                scores[week_board(day * 86400)][user_id] += gained
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM leaderboard_scores")
+            self._conn.execute("DELETE FROM leaderboard_tree")
+            for board, users in scores.items():
+                users = {user_id: min(MAX_SCORE, max(0.0, score)) for user_id, score in users.items()}
+                self._conn.executemany(
+                    "INSERT INTO leaderboard_scores (board, user_id, score) VALUES (?, ?, ?)",
+                    [(board, user_id, score) for user_id, score in users.items()],
+                )
+                self._conn.executemany(
+                    "INSERT INTO leaderboard_tree (board, node, count) VALUES (?, ?, ?)",
+                    [(board, node, count) for node, count in _build_tree(map(bucket_of, users.values())).items()],
+                )
+            self._conn.execute("INSERT OR REPLACE INTO leaderboard_meta (key, value) VALUES ('built_at', ?)", (str(time.time()),))
+            self._conn.execute("COMMIT")
+        self._built = True
+        return sum(len(users) for users in scores.values())
+
+    # --- Reads ---
+
+    def boards(self) -> List[str]:
+        """Every board that can have scores: global, each course, and the kept weeks (newest first)."""
+        weeks = [week_board(time.time() - i * WEEK_SECONDS) for i in range(WEEKS_KEPT)]
+        return [GLOBAL_BOARD] + [course_board(course) for course in TOPICS] + weeks
+
+    def size(self, board: str) -> int:
+        self.flush()
+        return self._count_at_most(board, BUCKETS - 1)
+
+    def _count_at_most(self, board: str, bucket: int) -> int:
+        nodes = _prefix_nodes(bucket)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COALESCE(SUM(count), 0) FROM leaderboard_tree WHERE board = ? AND node IN ({','.join('?' * len(nodes))})",
+                [board, *nodes],
+            ).fetchone()
+        return row[0]
+
+    def score(self, board: str, user_id: str) -> Optional[float]:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT score FROM leaderboard_scores WHERE board = ? AND user_id = ?", (board, user_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def rank_of_score(self, board: str, score: float) -> int:
+        """
+        1 + the number of students with a higher score (ties share a rank):
+        higher buckets are counted from the tree, and the few higher scores in
+        the same bucket from the score index.
+
+        Time Complexity: O(log B + log n + t) for t scores sharing the bucket.
+        """
+        bucket = bucket_of(score)
+        higher = self.size(board) - self._count_at_most(board, bucket)
+        with self._lock:
+            higher += self._conn.execute("""
+                SELECT COUNT(*) FROM leaderboard_scores
+                WHERE board = ? AND score > ? AND score < ? AND MIN(?, CAST(score * ? AS INTEGER)) = ?
+            """, (board, score, (bucket + 2) / SCORE_SCALE, BUCKETS - 1, SCORE_SCALE, bucket)).fetchone()[0]
+        return 1 + higher
+
+    def rank(self, board: str, user_id: str) -> Optional[int]:
+        score = self.score(board, user_id)
+        return None if score is None else self.rank_of_score(board, score)
+
+    def _entries(self, board: str, rows: List[Tuple[str, float]]) -> List[Dict]:
+        return [{"rank": self.rank_of_score(board, score), "user_id": user_id, "score": score} for user_id, score in rows]
+
+    def top(self, board: str, n: int = 10) -> List[Dict]:
+        """
+        Best `n` students, read from the end of the (board, score, user_id) index.
+
+        Time Complexity: O(log n + N log B)
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, score FROM leaderboard_scores WHERE board = ? ORDER BY score DESC, user_id DESC LIMIT ?",
+                (board, n),
+            ).fetchall()
+        return self._entries(board, rows)
+
+    def around(self, board: str, user_id: str, k: int = 2) -> List[Dict]:
+        """
+        The student with up to `k` neighbours on either side, best first (in
+        the order of `top`).
+
+        Time Complexity: O(log n + k log B)
+        """
+        score = self.score(board, user_id)
+        if score is None:
+            return []
+        with self._lock:
+            above = self._conn.execute("""
+                SELECT user_id, score FROM leaderboard_scores
+                WHERE board = ? AND (score, user_id) > (?, ?)
+                ORDER BY score, user_id LIMIT ?
+            """, (board, score, user_id, k)).fetchall()
+            below = self._conn.execute("""
+                SELECT user_id, score FROM leaderboard_scores
+                WHERE board = ? AND (score, user_id) < (?, ?)
+                ORDER BY score DESC, user_id DESC LIMIT ?
+            """, (board, score, user_id, k)).fetchall()
+        return self._entries(board, above[::-1] + [(user_id, score)] + below)
+
+
+_build_lock = threading.Lock()
+
+
+def get_leaderboard(db_path: str = LEADERBOARD_DB_FILE) -> Leaderboard:
+    """The process-wide leaderboard for `db_path`, resolved against the current directory."""
+    return _open_leaderboard(os.path.abspath(db_path))
+
+
+@lru_cache(maxsize=None)
+def _open_leaderboard(db_path: str) -> Leaderboard:
+    board = Leaderboard(db_path)
+    atexit.register(board.flush)
+    return board
+
+
+def record_leaderboard_events(events: List[Dict], catalog_path: str, db_path: str = LEADERBOARD_DB_FILE):
+    """
+    Commit listener for progress writes. The first write on an install without
+    a built leaderboard builds it from the progress database instead, which
+    already includes these events.
+    """
+    if not events:
+        return
+    board = get_leaderboard(db_path)
+    if not board.is_built():
+        with _build_lock:
+            if not board.is_built():
+                board.rebuild(os.path.abspath(catalog_path))
+                return
+    board.record_events(events)
+
+
+if __name__ == "__main__":
+    from progress_store import PROGRESS_DB_FILE
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every board from the progress database")
+    parser.add_argument("--db", default=PROGRESS_DB_FILE, help="Progress catalog database")
+    parser.add_argument("--board", default=GLOBAL_BOARD, help="Board to print")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    board = get_leaderboard()
+    if args.rebuild:
+        start = time.perf_counter()
+        written = board.rebuild(args.db)
+        print(f"Rebuilt {written} scores in {time.perf_counter() - start:.1f} s")
+    for entry in board.top(args.board, args.top):
+        print(f"{entry['rank']:>5}  {entry['user_id']:<20} {entry['score']:8.1f}")
@@ -0,0 +1,92 @@
+# learning_path.py
+
+"""
+Plans an ordered study path from a student's current mastery to a goal topic.
+
+A topic can be studied once its direct prerequisites are mastered
+(prereq_graph.MASTERY_THRESHOLD). Prerequisites already mastered end the
+search, so their own ancestors are never added to the plan. Every topic's
+cost is its `estimated_minutes` scaled by the mastery gap still to close, so
+half-learned topics are cheaper than new ones.
+"""
+
+from functools import lru_cache
+from typing import Dict, List
+
+import pandas as pd
+
+from prereq_graph import MASTERY_THRESHOLD, PREREQ_GRAPH, iter_bits
+from topic_meta import TOPIC_META
+
+# --- Configuration Block ---
+DEFAULT_GOAL_MASTERY = 80
+
+
+@lru_cache(maxsize=4096)
+def required_topics(goal: str, mastered: int) -> int:
+    """
+    Bitset of the topics that must be studied to reach `goal` given the
+    `mastered` bitset: the goal plus, recursively, every unmastered direct
+    prerequisite. Subplans are memoized per (topic, mastered) and shared
+    ancestors are merged by bitwise OR, so each is counted once.
+
+    Time Complexity: O(T) bitset operations on a cold cache, O(1) when cached.
+    """
+    i = PREREQ_GRAPH.index[goal]
+    needed = 1 << i
+    for p in iter_bits(PREREQ_GRAPH.parents[i] & ~mastered):
+        needed |= required_topics(PREREQ_GRAPH.topics[p], mastered)
+    return needed
+
+
+def topic_cost(topic: str, current: float, target: float) -> float:
+    """Estimated minutes to take `topic` from `current` to `target` mastery."""
+    gap = max(0.0, target - current) / 100.0
+    return TOPIC_META.get(topic, {}).get("estimated_minutes", 120) * gap
+
+
+def plan_path(user_mastery: Dict[str, float], goal: str, goal_mastery: float = DEFAULT_GOAL_MASTERY,
+              threshold: float = MASTERY_THRESHOLD) -> List[Dict]:
+    """
+    Ordered study plan to `goal` for a {topic: mastery_level} mapping.
+    Each step has course, topic, mastery, target_mastery and minutes. Steps come
+    in topological order (prerequisites first); [] if the goal is already reached.
+
+    Time Complexity: O(T) for T topics in the catalog.
+    """
+    if goal not in PREREQ_GRAPH.index:
+        raise KeyError(f"Unknown topic: {goal}")
+    if user_mastery.get(goal, 0) >= goal_mastery:
+        return []
+
+    mastered = PREREQ_GRAPH.mastered_mask(user_mastery, threshold)
+    plan = []
+    for topic in PREREQ_GRAPH.topics_of(required_topics(goal, mastered)):
+        current = user_mastery.get(topic, 0)
+        target = goal_mastery if topic == goal else threshold
+        plan.append({
+            "course": PREREQ_GRAPH.courses.get(topic, ""),
+            "topic": topic,
+            "mastery": current,
+            "target_mastery": target,
+            "minutes": round(topic_cost(topic, current, target), 1),
+        })
+    return plan
+
+
+def plan_learning_path(user_id: str, goal: str, all_progress_df: pd.DataFrame,
+                       goal_mastery: float = DEFAULT_GOAL_MASTERY) -> pd.DataFrame:
+    """
+    Study plan for a user from the student_progress frame (see recommender.load_progress).
+    Columns: step, course, topic, mastery, target_mastery, minutes, cumulative_minutes.
+    """
+    user_progress = all_progress_df[all_progress_df['user_id'] == user_id]
+    user_mastery = user_progress.set_index('topic')['mastery_level'].to_dict()
+    plan = pd.DataFrame(
+        plan_path(user_mastery, goal, goal_mastery),
+        columns=["course", "topic", "mastery", "target_mastery", "minutes"],
+    )
+    plan.insert(0, "step", range(1, len(plan) + 1))
+    plan["cumulative_minutes"] = plan["minutes"].cumsum()
+    return plan
+
@@ -0,0 +1,262 @@
+# llm_scheduler.py
+
+"""
+Shared scheduler for every Gemini request made by the app.
+
+- Token-bucket rate limit per model, so batch tracking and chat together stay
+  under the provider quota. A bucket holds up to a minute's quota (RATE_BURST
+  of it), so the few calls of one tutoring turn go out at once when the
+  quota is unused.
+- Priority lanes: interactive chat requests are granted tokens before batch
+  (progress tracking) requests waiting on the same model.
+- Jittered exponential backoff on 429 / 5xx responses.
+- Coalescing: identical prompts already in flight share one request.
+- Listeners: each completed request is reported with its latency (see
+  usage_ledger.py for token and cost accounting).
+"""
+
+import contextlib
+import contextvars
+import copy
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# --- Configuration Block ---
+INTERACTIVE = 0
+BATCH = 1
+
+# Requests per minute allowed per model. Override with AI_TUTOR_RATE_LIMITS='{"gemini-2.5-flash": 15}'.
+RATE_LIMITS: Dict[str, float] = {
+    "gemini-2.5-flash": 10,
+    "gemini-2.5-flash-lite": 15,
+    "gemma-3-4b-it": 30,
+}
+DEFAULT_RPM = 10
+# Bucket capacity as a fraction of the per-minute quota; refills at rpm/60 per second.
+# Override with AI_TUTOR_RATE_BURST=0.5 to keep bursts to half a minute's quota.
+RATE_BURST = float(os.getenv("AI_TUTOR_RATE_BURST", "1.0"))
+RETRY_SETTINGS = {
+    "max_attempts": 5,
+    "base_delay": 1.0,   # seconds; doubled per attempt before jitter
+    "max_delay": 30.0,
+}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_RETRYABLE_MARKERS = ("429", "RESOURCE_EXHAUSTED", "ResourceExhausted", "UNAVAILABLE", "ServiceUnavailable",
+                      "InternalServerError", "DEADLINE_EXCEEDED", "DeadlineExceeded", "503", "502", "504")
+
+if os.getenv("AI_TUTOR_RATE_LIMITS"):
+    RATE_LIMITS.update(json.loads(os.environ["AI_TUTOR_RATE_LIMITS"]))
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority_lane(priority: int):
+    """Runs every scheduled call made inside the block in the given lane."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+# --- Helpers ---
+
+def model_name(llm: Any) -> str:
+    """Resolves the model name of a chat model, including ones wrapped by `bind_tools`."""
+    target = getattr(llm, "bound", llm)
+    name = getattr(target, "model", None) or getattr(target, "model_name", None) or "unknown"
+    return name.split("/", 1)[1] if name.startswith("models/") else name
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for rate-limit and server errors, looking through wrapped exceptions."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        for attr in ("code", "status_code", "status"):
+            value = getattr(exc, attr, None)
+            if isinstance(value, int) and value in RETRYABLE_STATUS:
+                return True
+        text = f"{type(exc).__name__}: {exc}"
+        if any(marker in text for marker in _RETRYABLE_MARKERS):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def _prompt_key(prompt: Any) -> Hashable:
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, (list, tuple)):
+        return tuple(
+            (type(m).__name__, str(getattr(m, "content", m)), str(getattr(m, "tool_calls", "")))
+            for m in prompt
+        )
+    return repr(prompt)
+
+
+class TokenBucket:
+    """Classic token bucket; `rpm` <= 0 means unlimited. Holds `burst` tokens (default RATE_BURST * rpm)."""
+
+    def __init__(self, rpm: float, burst: Optional[float] = None):
+        self.rate = rpm / 60.0
+        self.capacity = burst if burst is not None else max(1.0, rpm * RATE_BURST)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def try_take(self) -> float:
+        """Takes a token if available and returns 0, otherwise returns seconds until one is."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+# --- Scheduler ---
+
+class LLMScheduler:
+    def __init__(self, rate_limits: Optional[Dict[str, float]] = None, default_rpm: float = DEFAULT_RPM):
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self.default_rpm = default_rpm
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiters: Dict[str, list] = {}
+        self._seq = itertools.count()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.stats = {"calls": 0, "retries": 0, "coalesced": 0, "wait_seconds": 0.0}
+        self._listeners: List[Callable[[str, Any, float], None]] = []
+
+    def add_listener(self, listener: Callable[[str, Any, float], None]):
+        """Calls `listener(model, response, seconds)` in the calling thread after every successful request."""
+        self._listeners.append(listener)
+
+    def set_rate_limit(self, model: str, rpm: float, burst: Optional[float] = None):
+        with self._cond:
+            self.rate_limits[model] = rpm
+            self._buckets[model] = TokenBucket(rpm, burst)
+
+    def configure_all(self, rpm: float):
+        """Applies one requests-per-minute limit to every model."""
+        with self._cond:
+            self.rate_limits = {}
+            self.default_rpm = rpm
+            self._buckets.clear()
+
+    def disable_rate_limits(self):
+        """Used by benchmarks and tests running against local stubs."""
+        self.configure_all(0)
+
+    def _bucket(self, model: str) -> TokenBucket:
+        if model not in self._buckets:
+            self._buckets[model] = TokenBucket(self.rate_limits.get(model, self.default_rpm))
+        return self._buckets[model]
+
+    def _acquire(self, model: str, priority: int):
+        """Blocks until this request is first in its model's queue and a token is free."""
+        start = time.monotonic()
+        with self._cond:
+            queue = self._waiters.setdefault(model, [])
+            entry = (priority, next(self._seq))
+            heapq.heappush(queue, entry)
+            try:
+                while True:
+                    wait = None
+                    if queue[0] == entry:
+                        wait = self._bucket(model).try_take()
+                        if wait == 0:
+                            heapq.heappop(queue)
+                            self._cond.notify_all()
+                            break
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+                raise
+            self.stats["wait_seconds"] += time.monotonic() - start
+
+    def _call_with_retry(self, model: str, fn: Callable[[], Any], priority: int) -> Any:
+        attempts = RETRY_SETTINGS["max_attempts"]
+        for attempt in range(attempts):
+            self._acquire(model, priority)
+            try:
+                self._count("calls")
+                start = time.monotonic()
+                result = fn()
+            except Exception as e:
+                if attempt == attempts - 1 or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(RETRY_SETTINGS["max_delay"], RETRY_SETTINGS["base_delay"] * 2 ** attempt))
+                print(f"LLM call to {model} failed ({e}); retrying in {delay:.1f}s")
+                self._count("retries")
+                time.sleep(delay)
+                continue
+            self._notify(model, result, time.monotonic() - start)
+            return result
+
+    def _count(self, stat: str, amount: float = 1):
+        with self._cond:
+            self.stats[stat] += amount
+
+    def _notify(self, model: str, result: Any, seconds: float):
+        for listener in self._listeners:
+            try:
+                listener(model, result, seconds)
+            except Exception as e:
+                print(f"LLM call listener failed: {e}")
+
+    def run(self, model: str, fn: Callable[[], Any], priority: Optional[int] = None,
+            coalesce_key: Optional[Hashable] = None) -> Any:
+        """
+        Runs `fn()` under the model's rate limit, retrying transient failures.
+        Calls sharing a `coalesce_key` while one is in flight wait for and reuse its result.
+        """
+        priority = _current_priority.get() if priority is None else priority
+        if coalesce_key is None:
+            return self._call_with_retry(model, fn, priority)
+
+        key = (model, coalesce_key)
+        with self._cond:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            return copy.deepcopy(future.result())
+
+        try:
+            result = self._call_with_retry(model, fn, priority)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+
+    def invoke(self, llm: Any, prompt: Any, priority: Optional[int] = None, coalesce: bool = True, **kwargs) -> Any:
+        """
+        Scheduled equivalent of `llm.invoke(prompt, **kwargs)`. Calls with
+        keyword arguments (stop sequences, config, ...) are never coalesced.
+        """
+        key = (id(llm), _prompt_key(prompt)) if coalesce and not kwargs else None
+        return self.run(model_name(llm), lambda: llm.invoke(prompt, **kwargs), priority, key)
+
+
+# Shared by every module in the process.
+scheduler = LLMScheduler()
@@ -0,0 +1,174 @@
+# mastery_history.py
+
+"""
+Append-only log of mastery changes plus daily rollups for learning curves.
+
+`mastery_events` keeps every update (old and new level, thread, time).
+`mastery_daily` keeps one row per user/topic/day and is maintained on every
+write, so curves are read from the small rollup table through its indexes
+instead of scanning the event log.
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def setup_mastery_history(conn: sqlite3.Connection):
+    """Creates the history tables and their range-scan indexes if missing."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mastery_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            course TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            old_level REAL,
+            new_level REAL NOT NULL,
+            thread_id TEXT,
+            recorded_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mastery_events_user_time ON mastery_events (user_id, recorded_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mastery_events_topic_time ON mastery_events (course, topic, recorded_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mastery_daily (
+            user_id TEXT NOT NULL,
+            course TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            day TEXT NOT NULL,
+            first_level REAL NOT NULL,
+            last_level REAL NOT NULL,
+            min_level REAL NOT NULL,
+            max_level REAL NOT NULL,
+            events INTEGER NOT NULL,
+            PRIMARY KEY (user_id, course, topic, day)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mastery_daily_user_day ON mastery_daily (user_id, day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mastery_daily_topic_day ON mastery_daily (course, topic, day)")
+
+
+def day_of(timestamp: float) -> str:
+    return _epoch_day(int(timestamp // 86400))
+
+
+@lru_cache(maxsize=4096)
+def _epoch_day(days: int) -> str:
+    return (_EPOCH + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def record_mastery_events(conn: sqlite3.Connection, events: List[Dict]):
+    """
+    Appends events (dicts with user_id, course, topic, old_level, new_level,
+    thread_id, recorded_at) and folds them into the daily rollup, in order.
+    Does not commit: callers write them in the same transaction as the progress update.
+    """
+    conn.executemany("""
+        INSERT INTO mastery_events (user_id, course, topic, old_level, new_level, thread_id, recorded_at)
+        VALUES (:user_id, :course, :topic, :old_level, :new_level, :thread_id, :recorded_at)
+    """, events)
+    conn.executemany("""
+        INSERT INTO mastery_daily (user_id, course, topic, day, first_level, last_level, min_level, max_level, events)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT(user_id, course, topic, day) DO UPDATE SET
+        last_level = excluded.last_level,
+        min_level = MIN(min_level, excluded.min_level),
+        max_level = MAX(max_level, excluded.max_level),
+        events = events + 1
+    """, [
+        (e["user_id"], e["course"], e["topic"], day_of(e["recorded_at"]),
+         e["new_level"], e["new_level"], e["new_level"], e["new_level"])
+        for e in events
+    ])
+
+
+def record_mastery_event(conn: sqlite3.Connection, user_id: str, course: str, topic: str,
+                         old_level: Optional[float], new_level: float, thread_id: Optional[str] = None,
+                         recorded_at: Optional[float] = None):
+    """Single-event form of `record_mastery_events`."""
+    record_mastery_events(conn, [{
+        "user_id": user_id, "course": course, "topic": topic, "old_level": old_level,
+        "new_level": new_level, "thread_id": thread_id,
+        "recorded_at": time.time() if recorded_at is None else recorded_at,
+    }])
+
+
+# --- Queries ---
+
+def _day_filters(start_day: Optional[str], end_day: Optional[str]):
+    clauses, params = [], []
+    if start_day:
+        clauses.append("day >= ?")
+        params.append(start_day)
+    if end_day:
+        clauses.append("day <= ?")
+        params.append(end_day)
+    return clauses, params
+
+
+def load_learning_curve(conn: sqlite3.Connection, user_id: str, course: Optional[str] = None,
+                        topic: Optional[str] = None, start_day: Optional[str] = None,
+                        end_day: Optional[str] = None) -> pd.DataFrame:
+    """
+    Daily mastery for one user (optionally one course/topic), from the rollup table.
+    Columns: day, course, topic, mastery_level (last level of the day).
+
+    Time Complexity: O(log N + R) via idx_mastery_daily_user_day, R = rows returned.
+    """
+    clauses, params = ["user_id = ?"], [user_id]
+    if course:
+        clauses.append("course = ?")
+        params.append(course)
+    if topic:
+        clauses.append("topic = ?")
+        params.append(topic)
+    day_clauses, day_params = _day_filters(start_day, end_day)
+    query = (
+        "SELECT day, course, topic, last_level AS mastery_level FROM mastery_daily WHERE "
+        + " AND ".join(clauses + day_clauses) + " ORDER BY day"
+    )
+    return pd.read_sql_query(query, conn, params=params + day_params)
+
+
+def load_topic_curve(conn: sqlite3.Connection, course: str, topic: Optional[str] = None,
+                     start_day: Optional[str] = None, end_day: Optional[str] = None) -> pd.DataFrame:
+    """
+    Average daily mastery across all users for a course (or one topic), from the rollup table.
+    Columns: day, topic, mastery_level, users.
+
+    Each user's last level is carried forward to later days, so a day's average
+    covers everyone who had studied the topic by then, not only that day's
+    active learners (`users` counts them). Rows are emitted for days with
+    activity; history before `start_day` seeds the carried levels.
+
+    Time Complexity: O(log N + R) via idx_mastery_daily_topic_day, R = rows up to end_day.
+    """
+    clauses, params = ["course = ?"], [course]
+    if topic:
+        clauses.append("topic = ?")
+        params.append(topic)
+    day_clauses, day_params = _day_filters(None, end_day)
+    query = (
+        "SELECT topic, day, user_id, last_level FROM mastery_daily WHERE "
+        + " AND ".join(clauses + day_clauses) + " ORDER BY topic, day"
+    )
+    rows, levels, total, current = [], {}, 0.0, None
+    for row_topic, day, user_id, level in conn.execute(query, params + day_params):
+        if row_topic != current:
+            levels, total, current = {}, 0.0, row_topic
+        total += level - levels.get(user_id, 0.0)
+        levels[user_id] = level
+        if start_day and day < start_day:
+            continue
+        if rows and rows[-1][:2] == [day, row_topic]:
+            rows[-1][2:] = [total / len(levels), len(levels)]
+        else:
+            rows.append([day, row_topic, total / len(levels), len(levels)])
+    df = pd.DataFrame(rows, columns=["day", "topic", "mastery_level", "users"])
+    return df.sort_values(["day", "topic"], kind="stable", ignore_index=True)
@@ -0,0 +1,62 @@
+# model_router.py
+
+"""
+Per-task model routing.
+
+Each kind of LLM work is mapped to a model, so cheap jobs like topic
+classification can run on a smaller model than tutoring. Override a route
+with an environment variable named after the task, e.g.
+AI_TUTOR_MODEL_CLASSIFICATION=gemini-2.5-flash.
+
+Students over their daily budget (usage_ledger.py) get the DEGRADED_ROUTES
+models instead, overridable as AI_TUTOR_DEGRADED_MODEL_<TASK>.
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+# --- Configuration Block ---
+MODEL_ROUTES: Dict[str, str] = {
+    "tutoring": "gemini-2.5-flash",        # the chat assistant node
+    "explanation": "gemini-2.5-flash",     # explain_text tool
+    "quiz": "gemini-2.5-flash",            # generate_quiz tool
+    "feedback": "gemini-2.5-flash",        # generate_feedback tool
+    "classification": "gemini-2.5-flash-lite",  # identify_course_topic
+    "mastery": "gemini-2.5-flash",         # evaluate_mastery
+    "vision": "gemma-3-4b-it",             # extract_text_from_image
+}
+# Cheaper models for students over budget; tasks not listed keep their route.
+DEGRADED_ROUTES: Dict[str, str] = {
+    "tutoring": "gemini-2.5-flash-lite",
+    "explanation": "gemini-2.5-flash-lite",
+    "quiz": "gemini-2.5-flash-lite",
+    "feedback": "gemini-2.5-flash-lite",
+    "mastery": "gemini-2.5-flash-lite",
+}
+
+
+def model_for(task: str, degraded: bool = False) -> str:
+    """Returns the model configured for a task, or its over-budget replacement when `degraded`."""
+    if task not in MODEL_ROUTES:
+        raise KeyError(f"Unknown LLM task '{task}'. Known tasks: {', '.join(MODEL_ROUTES)}")
+    if degraded and task in DEGRADED_ROUTES:
+        return os.getenv(f"AI_TUTOR_DEGRADED_MODEL_{task.upper()}", DEGRADED_ROUTES[task])
+    return os.getenv(f"AI_TUTOR_MODEL_{task.upper()}", MODEL_ROUTES[task])
+
+
+@lru_cache(maxsize=None)
+def _chat_model(model: str, api_key: Optional[str] = None) -> ChatGoogleGenerativeAI:
+    if api_key:
+        return ChatGoogleGenerativeAI(model=model, google_api_key=api_key)
+    return ChatGoogleGenerativeAI(model=model)
+
+
+def get_llm(task: str, api_key: Optional[str] = None, degraded: bool = False) -> ChatGoogleGenerativeAI:
+    """
+    Returns the chat model for a task. Tasks routed to the same model share one
+    client per API key; without a key the client reads it from the environment.
+    """
+    return _chat_model(model_for(task, degraded), api_key)
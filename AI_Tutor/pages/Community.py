@@ -1,8 +1,45 @@
 #Community
 import streamlit as st
+import pandas as pd
+from leaderboard import GLOBAL_BOARD, get_leaderboard
+from thread_store import DEFAULT_USER_ID
 
 st.title("Community under development")
 
-st.button("Show leaderboard")
+def board_label(board: str) -> str:
+    if board == GLOBAL_BOARD:
+        return "Overall mastery"
+    kind, _, name = board.partition(":")
+    return f"Week {name}" if kind == "week" else name
+
+def leaderboard_table(entries) -> pd.DataFrame:
+    return pd.DataFrame(entries).rename(columns={"rank": "Rank", "user_id": "Student", "score": "Points"})
+
+def render_leaderboard(user_id: str):
+    """
+    Renders the top students on the chosen board and the current student's
+    rank with their neighbours. Every lookup is an index read (see leaderboard.py).
+    """
+    board = get_leaderboard()
+    choice = st.selectbox("Leaderboard:", board.boards(), format_func=board_label)
+    top = board.top(choice, 10)
+    if not top:
+        st.info("No scores on this board yet.")
+        return
+    st.dataframe(leaderboard_table(top).round({"Points": 1}), hide_index=True, use_container_width=True)
+
+    rank = board.rank(choice, user_id)
+    if rank is None:
+        st.caption(f"{user_id} has no score on this board yet.")
+        return
+    st.markdown(f"**{user_id}** is ranked **#{rank}** of {board.size(choice)}.")
+    st.dataframe(leaderboard_table(board.around(choice, user_id)).round({"Points": 1}), hide_index=True, use_container_width=True)
+
+# The button only reveals the board; it stays open while another board is picked.
+if st.button("Show leaderboard"):
+    st.session_state['show_leaderboard'] = True
+if st.session_state.get('show_leaderboard'):
+    render_leaderboard(st.session_state.get('user_id', DEFAULT_USER_ID))
+
 st.button("Open Team Chat")
-st.button("Open community chat")
\ No newline at end of file
+st.button("Open community chat")
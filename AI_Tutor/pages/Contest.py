@@ -1,8 +1,81 @@
 ##Contest
-
+import time
 import streamlit as st
+import pandas as pd
+from contest_engine import ContestError, get_contest_engine
+from quiz_bank import COURSE_OF, OPTION_LETTERS
+from thread_store import DEFAULT_USER_ID
+
+st.title("Contest")
+
+def standings_table(contest_id: int):
+    standings = get_contest_engine().standings(contest_id)
+    if not standings:
+        st.caption("No submissions yet.")
+        return
+    table = pd.DataFrame(standings).rename(columns={"rank": "Rank", "user_id": "Student", "score": "Score", "elapsed": "Seconds"})
+    st.dataframe(table.round({"Seconds": 1}), hide_index=True, use_container_width=True)
+
+def render_contest(user_id: str):
+    """
+    Joins the open contest for the chosen topic and shows its questions until
+    the student submits or their time runs out; then the live standings.
+    """
+    engine = get_contest_engine()
+    topic = st.selectbox("Topic:", list(COURSE_OF))
+    if st.button("Join contest"):
+        try:
+            contest = engine.open_contest(COURSE_OF[topic], topic)
+            engine.start(contest.id, user_id)
+            st.session_state['contest_id'] = contest.id
+            st.session_state.pop('contest_result', None)
+        except ContestError as e:
+            st.warning(str(e))
+    contest_id = st.session_state.get('contest_id')
+    if contest_id is None:
+        return
+
+    contest = engine.get_contest(contest_id)
+    st.subheader(f"{contest.topic} contest #{contest.id}")
+    result = st.session_state.get('contest_result')
+    if result is None:
+        remaining = engine.start(contest.id, user_id) - time.time()
+        st.caption(f"{max(0, remaining) / 60:.1f} minutes left · {engine.contestants(contest.id)} submitted so far")
+        with st.form(f"contest_{contest.id}"):
+            choices = {}
+            for n, item in enumerate(contest.items, 1):
+                chosen = st.radio(f"{n}. {item.stem}", range(len(item.options)), index=None,
+                                  format_func=lambda i, item=item: f"{OPTION_LETTERS[i]}) {item.options[i]}",
+                                  key=f"contest_{contest.id}_{item.id}")
+                choices[item.id] = chosen
+            if st.form_submit_button("Submit answers"):
+                try:
+                    result = engine.submit(contest.id, user_id, choices)
+                    st.session_state['contest_result'] = result
+                except ContestError as e:
+                    st.warning(str(e))
+    if result is not None:
+        st.success(f"Score: {result.score}/{result.total} in {result.elapsed:.0f}s · rank #{result.rank}")
+    st.markdown("**Standings**")
+    standings_table(contest.id)
+
+def render_history(user_id: str):
+    history = get_contest_engine().history(user_id)
+    if not history:
+        st.info("No contests taken yet.")
+        return
+    table = pd.DataFrame(history)[["contest_id", "topic", "score", "total", "elapsed"]]
+    table = table.rename(columns={"contest_id": "Contest", "topic": "Topic", "score": "Score", "total": "Questions", "elapsed": "Seconds"})
+    st.dataframe(table.round({"Seconds": 1}), hide_index=True, use_container_width=True)
 
-st.title("Contest under development")
+# The buttons pick a view that stays open across reruns (answering a question reruns the page).
+if st.button("Take Contest"):
+    st.session_state['contest_view'] = "contest"
+if st.button("History"):
+    st.session_state['contest_view'] = "history"
 
-st.button("Take Contest")
-st.button("History")
\ No newline at end of file
+user_id = st.session_state.get('user_id', DEFAULT_USER_ID)
+if st.session_state.get('contest_view') == "contest":
+    render_contest(user_id)
+elif st.session_state.get('contest_view') == "history":
+    render_history(user_id)
@@ -2,8 +2,18 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
+import time
 from typing import Optional, List, Dict
 from progress_tracker import run_progress_tracker
+from tracking_worker import load_worker_status
+from untracked_threads import pending_count
+from mastery_history import load_learning_curve, load_topic_curve
+from exporter import DATASETS, FORMATS, export_for_download
+from data_cache import data_version
+from progress_store import get_progress_reader
+from quiz_bank import get_quiz_bank
+
+WORKER_STALE_SECONDS = 120  # A worker without a heartbeat for this long is considered down.
 
 # def run():
 #     print("Running progress tracker...")
@@ -15,8 +25,16 @@ if 'selected_user' not in st.session_state:
 elif st.session_state['selected_user'] == 'All':
     st.subheader("Select a user to view their progress")
 else:
-    if st.button("Run Progress Tracker"):
-        st.write(run_progress_tracker(st.session_state['selected_user']))
+    # Tracking normally runs in tracking_worker.py; the button is only a fallback when no worker is alive.
+    pending = pending_count(st.session_state['selected_user'])
+    live_workers = [w for w in load_worker_status() if time.time() - (w['heartbeat_at'] or 0) < WORKER_STALE_SECONDS]
+    if live_workers:
+        last_beat = int(time.time() - live_workers[0]['heartbeat_at'])
+        st.caption(f"Progress is tracked in the background: {pending} conversation(s) queued, last check {last_beat}s ago.")
+    else:
+        st.caption(f"No tracking worker is running ({pending} conversation(s) queued). Start one with `python tracking_worker.py`.")
+        if st.button("Run Progress Tracker"):
+            st.write(run_progress_tracker(st.session_state['selected_user']))
     # if st.button("Run Progress Tracker"):
     #     st.write(run())
 # --- User-provided courses & topics (kept here so UI always shows expected structure) ---
@@ -48,14 +66,21 @@ TABLE_NAME = "student_progress"      # expected table name
 
 # ----------------- Database helpers -----------------
 def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+    # Reads across every progress shard (see sharding.py).
+    conn = get_progress_reader(db_path)
     return conn
 
 
 def load_progress_data(db_path: str = DB_PATH, user_id: Optional[str] = None) -> pd.DataFrame:
     """Load progress table from sqlite into a pandas DataFrame.
     Expected schema: user_id TEXT, course TEXT, topic TEXT, mastery_level INTEGER
+    Cached until the database changes (see data_cache.data_version).
     """
+    return _read_progress_data(db_path, user_id, data_version(db_path))
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _read_progress_data(db_path: str, user_id: Optional[str], version) -> pd.DataFrame:
     conn = get_connection(db_path)
     try:
         if user_id and user_id != "All":
@@ -85,6 +110,25 @@ def load_progress_data(db_path: str = DB_PATH, user_id: Optional[str] = None) ->
     return df
 
 
+def load_mastery_curve(db_path: str, user_id: Optional[str], course: str) -> pd.DataFrame:
+    """Daily mastery per topic for a course: one user's curve, or the all-user average."""
+    return _read_mastery_curve(db_path, user_id, course, data_version(db_path))
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _read_mastery_curve(db_path: str, user_id: Optional[str], course: str, version) -> pd.DataFrame:
+    conn = get_connection(db_path)
+    try:
+        if user_id and user_id != "All":
+            return load_learning_curve(conn, user_id, course=course)
+        return load_topic_curve(conn, course)
+    except Exception:
+        # History table not created yet (no tracking has run on this DB)
+        return pd.DataFrame(columns=["day", "topic", "mastery_level"])
+    finally:
+        conn.close()
+
+
 # ----------------- UI helpers -----------------
 
 def compute_course_aggregate(df: pd.DataFrame, course: str) -> int:
@@ -168,6 +212,14 @@ def progress_tracker_page(db_path: str = DB_PATH):
                 st.write(f"**{r['topic']}** — {r['mastery_level']}%")
                 st.progress(min(max(int(r['mastery_level']) / 100.0, 0.0), 1.0))
 
+        st.markdown("---")
+        st.write("Learning curve:")
+        curve = load_mastery_curve(db_path, selected_user, selected_course)
+        if curve.empty:
+            st.info("No mastery history recorded for this course yet.")
+        else:
+            st.line_chart(curve.pivot_table(index="day", columns="topic", values="mastery_level"))
+
         st.markdown("---")
         st.write("Detailed data from DB (if available):")
         st.dataframe(df[df["course"] == selected_course][["user_id", "topic", "mastery_level"]].reset_index(drop=True))
@@ -179,6 +231,50 @@ def progress_tracker_page(db_path: str = DB_PATH):
     else:
         st.info("Click 'Open' on any course card or pick a course from the dropdown to see topic-level mastery.")
 
+    if selected_user != "All":
+        quiz_panel(selected_user)
+    export_panel(db_path, selected_user, selected_course)
+
+
+def quiz_panel(user_id: str, limit: int = 5):
+    """Latest graded quizzes; narrative feedback shows up once the background LLM call has written it."""
+    submissions = get_quiz_bank().recent_submissions(user_id, limit)
+    if not submissions:
+        return
+    st.markdown("---")
+    st.subheader("Recent quizzes")
+    for sub in submissions:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(sub["submitted_at"]))
+        st.write(f"**{when}** — {sub['correct']}/{sub['total']} correct")
+        if sub["feedback"]:
+            st.caption(sub["feedback"])
+
+
+def export_panel(db_path: str, selected_user: str, selected_course: Optional[str]):
+    """Full exports, streamed from the DB when the download button is clicked."""
+    st.markdown("---")
+    st.subheader("Export data")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        dataset = st.selectbox("Dataset", DATASETS, format_func=lambda d: {
+            "progress": "Progress", "history": "Mastery history", "transcripts": "Conversation transcripts",
+        }[d])
+    with col2:
+        fmt = st.selectbox("Format", FORMATS)
+    with col3:
+        only_course = st.checkbox(f"Only {selected_course}", value=True) if selected_course else False
+
+    filters = {
+        "user_id": selected_user if selected_user != "All" else None,
+        "course": selected_course if only_course else None,
+    }
+    scope = "_".join(v.replace(" ", "_") for v in filters.values() if v) or "all"
+    st.download_button(
+        f"Download {dataset} ({fmt})",
+        lambda: export_for_download(dataset, fmt, db_path=db_path, **filters),
+        file_name=f"{dataset}_{scope}.{fmt}",
+    )
+
 
 # Allow this file to be run directly for quick testing
 if __name__ == "__main__":
@@ -1,8 +1,24 @@
 #Personal Recommendation
 
+import time
 import streamlit as st
 import pandas as pd
-from recommender import load_progress, baseline_recommend, cf_recommend, log_user_feedback
+from recommender import baseline_recommend, cf_recommend, log_user_feedback
+from learning_path import plan_learning_path
+from data_cache import cached_progress, data_version
+from progress_store import get_progress_db_connection
+from review_scheduler import due_reviews
+from thread_store import DEFAULT_USER_ID
+from topic_meta import TOPICS
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_recommendations(user_id: str, method: str, version) -> pd.DataFrame:
+    """Recommendations are recomputed only when progress data changes."""
+    all_progress_df = cached_progress()
+    baseline_recs = baseline_recommend(user_id, all_progress_df, top_k=10)
+    if method == "baseline":
+        return baseline_recs
+    return cf_recommend(user_id, all_progress_df, baseline_recs, top_k=5)
 
 def render_recommendations_panel(user_id: str):
     """
@@ -11,9 +27,6 @@ def render_recommendations_panel(user_id: str):
     st.header("🚀 Your Personalized Learning Path")
     st.write("Here are some topics we think you should focus on next. Choose a method to see different recommendations.")
 
-    # Load data once
-    all_progress_df = load_progress()
-
     # Scorer selection
     scorer_options = ["Baseline", "Collaborative Filtering (Hybrid)" , "Community Recommendation"]
     selected_scorer = st.radio(
@@ -24,13 +37,13 @@ def render_recommendations_panel(user_id: str):
     )
 
     # Generate recommendations based on selection
-    baseline_recs = baseline_recommend(user_id, all_progress_df, top_k=10)
+    baseline_recs = cached_recommendations(user_id, "baseline", data_version())
     
     if selected_scorer == "Baseline":
         recs_df = baseline_recs.head(5)
         recs_df = recs_df.rename(columns={"score": "final_score"})
     else: # Hybrid
-        hybrid_recs = cf_recommend(user_id, all_progress_df, baseline_recs, top_k=5)
+        hybrid_recs = cached_recommendations(user_id, "hybrid", data_version())
         recs_df = hybrid_recs.rename(columns={"hybrid_score": "final_score"})
 
 
@@ -75,4 +88,60 @@ def render_recommendations_panel(user_id: str):
                 st.markdown(f"---")
                 st.markdown(f"**Hybrid Score:** `{row['final_score']:.2f}`")
 
-render_recommendations_panel('student456')
\ No newline at end of file
+def render_review_panel(user_id: str, limit: int = 5):
+    """
+    Renders the topics due for spaced-repetition review, most overdue first,
+    or the next ones coming up when nothing is due yet.
+    """
+    st.header("🔁 Due for Review")
+    conn = get_progress_db_connection(user_id=user_id)
+    now = time.time()
+    due = due_reviews(conn, user_id, now, limit)
+    upcoming = [] if due else due_reviews(conn, user_id, float("inf"), limit)
+    conn.close()
+
+    if not due and not upcoming:
+        st.info("Nothing to review yet. Topics are scheduled once you have studied them.")
+        return
+    if not due:
+        st.success("You're all caught up! Next reviews:")
+    for review in due or upcoming:
+        days = (review["due_at"] - now) / 86400
+        when = f"overdue by {-days:.0f} day(s)" if days <= -1 else "due now" if days <= 0 else f"in {days:.1f} day(s)"
+        st.markdown(f"**{review['topic']}** ({review['course']}) — {when}, last mastery {review['last_level']:.0f}%")
+
+def render_learning_path_planner(user_id: str):
+    """
+    Renders an interactive study plan from the user's current mastery to a goal topic.
+    """
+    st.markdown("---")
+    st.header("🗺️ Plan a Path to a Goal")
+    all_topics = [topic for course_topics in TOPICS.values() for topic in course_topics]
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        goal = st.selectbox("Goal topic:", all_topics, index=all_topics.index("Transformers"))
+    with col2:
+        goal_mastery = st.slider("Goal mastery", 60, 100, 80, step=5)
+
+    plan = plan_learning_path(user_id, goal, cached_progress(), goal_mastery)
+    if plan.empty:
+        st.success(f"You already have {goal_mastery}% mastery in **{goal}**.")
+        return
+
+    total = plan["minutes"].sum()
+    steps = f"{len(plan)} step" + ("s" if len(plan) != 1 else "")
+    st.markdown(f"**{steps}**, about **{total / 60:.1f} hours** of study.")
+    st.dataframe(
+        plan.rename(columns={
+            "step": "Step", "course": "Course", "topic": "Topic", "mastery": "Current Mastery",
+            "target_mastery": "Target", "minutes": "Minutes", "cumulative_minutes": "Total Minutes",
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+# The student signed in on the chat page (AiTutor.py).
+current_user = st.session_state.get('user_id', DEFAULT_USER_ID)
+render_review_panel(current_user)
+render_recommendations_panel(current_user)
+render_learning_path_planner(current_user)
\ No newline at end of file
@@ -0,0 +1,203 @@
+# prereq_graph.py
+
+"""
+Prerequisite graph over the topic catalog (topic_meta).
+
+The catalog is validated when the graph is built: unknown prerequisites and
+cycles raise `PrereqGraphError`. Topics are numbered in topological order and
+every topic's direct prerequisites, ancestors (transitive closure) and
+descendants are stored as bitsets (Python ints, bit i = i-th topic in that
+order). A student's mastered topics are a bitset too, so per-topic checks are
+a couple of integer operations, and decoding a bitset in bit order yields
+topics in a valid study order.
+
+For many users at once the same relations are exposed as boolean matrices and
+checked with numpy over a users x topics mastery matrix.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from topic_meta import TOPICS, TOPIC_META
+
+# --- Configuration Block ---
+MASTERY_THRESHOLD = 60  # Mastery level at which a topic counts as a met prerequisite.
+
+
+class PrereqGraphError(ValueError):
+    """Raised when the topic catalog has dangling prerequisites or cycles."""
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    """Yields the set bit positions of `mask`, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class PrereqGraph:
+    def __init__(self, prerequisites: Dict[str, List[str]], courses: Optional[Dict[str, str]] = None):
+        """
+        `prerequisites` maps every topic to its direct prerequisites.
+
+        Time Complexity: O(T + E) for validation and ordering, O(T * E / w) for
+        the closure over w-bit words, where E is the number of prerequisite edges.
+        """
+        self.courses = courses or {}
+        dangling = sorted(
+            f"{topic} -> {p}" for topic, prereqs in prerequisites.items() for p in prereqs if p not in prerequisites
+        )
+        if dangling:
+            raise PrereqGraphError(f"Unknown prerequisites: {', '.join(dangling)}")
+
+        self.topics = self._topological_order(prerequisites)
+        self.index = {topic: i for i, topic in enumerate(self.topics)}
+        n = len(self.topics)
+
+        self.parents = [0] * n
+        for topic, prereqs in prerequisites.items():
+            for p in prereqs:
+                self.parents[self.index[topic]] |= 1 << self.index[p]
+
+        # Prerequisites come earlier in the order, so one forward pass closes the relation.
+        self.ancestors = [0] * n
+        for i in range(n):
+            closure = self.parents[i]
+            for p in iter_bits(self.parents[i]):
+                closure |= self.ancestors[p]
+            self.ancestors[i] = closure
+
+        self.descendants = [0] * n
+        for i in range(n):
+            for a in iter_bits(self.ancestors[i]):
+                self.descendants[a] |= 1 << i
+
+        # Matrix forms for vectorized checks: row t marks the prerequisites of topic t.
+        self.parent_matrix = self._to_matrix(self.parents)
+        self.ancestor_matrix = self._to_matrix(self.ancestors)
+
+    @classmethod
+    def from_catalog(cls) -> "PrereqGraph":
+        """Builds the graph for every topic in TOPICS and TOPIC_META."""
+        prerequisites = {topic: list(meta.get("prerequisites", [])) for topic, meta in TOPIC_META.items()}
+        courses = {}
+        for course, topics in TOPICS.items():
+            for topic in topics:
+                prerequisites.setdefault(topic, [])
+                courses[topic] = course
+        return cls(prerequisites, courses)
+
+    @staticmethod
+    def _topological_order(prerequisites: Dict[str, List[str]]) -> List[str]:
+        """Kahn's algorithm; ties keep catalog order so the numbering is stable."""
+        remaining = {topic: len(set(prereqs)) for topic, prereqs in prerequisites.items()}
+        dependents: Dict[str, List[str]] = {topic: [] for topic in prerequisites}
+        for topic, prereqs in prerequisites.items():
+            for p in set(prereqs):
+                dependents[p].append(topic)
+
+        order = []
+        ready = [topic for topic, count in remaining.items() if count == 0]
+        while ready:
+            topic = ready.pop(0)
+            order.append(topic)
+            for dependent in dependents[topic]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) < len(prerequisites):
+            cyclic = [topic for topic, count in remaining.items() if count > 0]
+            raise PrereqGraphError(f"Prerequisite cycle among: {', '.join(cyclic)}")
+        return order
+
+    def _to_matrix(self, masks: List[int]) -> np.ndarray:
+        n = len(self.topics)
+        matrix = np.zeros((n, n), dtype=bool)
+        for i, mask in enumerate(masks):
+            for j in iter_bits(mask):
+                matrix[i, j] = True
+        return matrix
+
+    # --- Bitset helpers ---
+
+    def mask_of(self, topics: Iterable[str]) -> int:
+        mask = 0
+        for topic in topics:
+            if topic in self.index:
+                mask |= 1 << self.index[topic]
+        return mask
+
+    def topics_of(self, mask: int) -> List[str]:
+        """Topics in `mask`, in topological (study) order."""
+        return [self.topics[i] for i in iter_bits(mask)]
+
+    def mastered_mask(self, user_mastery: Dict[str, float], threshold: float = MASTERY_THRESHOLD) -> int:
+        """Bitset of catalog topics with mastery >= threshold. O(U) for U progress entries."""
+        return self.mask_of(topic for topic, level in user_mastery.items() if level >= threshold)
+
+    # --- Single-user checks (O(1) bitset operations per topic) ---
+
+    def unmet_prerequisites(self, topic: str, mastered: int) -> List[str]:
+        """Direct prerequisites of `topic` not in `mastered`; [] for unknown topics."""
+        i = self.index.get(topic)
+        return [] if i is None else self.topics_of(self.parents[i] & ~mastered)
+
+    def prerequisites_met(self, topic: str, mastered: int) -> bool:
+        i = self.index.get(topic)
+        return i is None or not self.parents[i] & ~mastered
+
+    def ancestors_mastered(self, topic: str, mastered: int) -> bool:
+        """True if every direct and indirect prerequisite of `topic` is mastered."""
+        i = self.index.get(topic)
+        return i is None or not self.ancestors[i] & ~mastered
+
+    def frontier(self, mastered: int) -> List[str]:
+        """Unmastered topics whose direct prerequisites are all mastered (newly unlocked)."""
+        return [
+            topic for i, topic in enumerate(self.topics)
+            if not mastered >> i & 1 and not self.parents[i] & ~mastered
+        ]
+
+    def path_to(self, target: str, mastered: int = 0) -> List[str]:
+        """Topics still to learn before and including `target`, in study order."""
+        i = self.index[target]
+        return self.topics_of((self.ancestors[i] | 1 << i) & ~mastered)
+
+    def unlocks(self, topic: str) -> List[str]:
+        """Every topic that depends on `topic`, directly or indirectly."""
+        return self.topics_of(self.descendants[self.index[topic]])
+
+    # --- Vectorized checks across users ---
+
+    def mastery_matrix(self, progress_df: pd.DataFrame, threshold: float = MASTERY_THRESHOLD) -> Tuple[List[str], np.ndarray]:
+        """
+        Pivots student_progress rows into (user_ids, users x topics boolean matrix)
+        with columns in self.topics order. Topics outside the catalog are ignored.
+        """
+        known = progress_df[progress_df["topic"].isin(self.index.keys())]
+        user_ids = sorted(progress_df["user_id"].unique())
+        rows = {user_id: r for r, user_id in enumerate(user_ids)}
+        matrix = np.zeros((len(user_ids), len(self.topics)), dtype=bool)
+        mastered = known[known["mastery_level"] >= threshold]
+        matrix[mastered["user_id"].map(rows).to_numpy(), mastered["topic"].map(self.index).to_numpy()] = True
+        return user_ids, matrix
+
+    def prerequisites_met_matrix(self, mastered: np.ndarray) -> np.ndarray:
+        """users x topics: all direct prerequisites mastered. O(U * T^2 / SIMD) via one matmul."""
+        return (~mastered).astype(np.int32) @ self.parent_matrix.T.astype(np.int32) == 0
+
+    def ancestors_mastered_matrix(self, mastered: np.ndarray) -> np.ndarray:
+        """users x topics: every direct and indirect prerequisite mastered."""
+        return (~mastered).astype(np.int32) @ self.ancestor_matrix.T.astype(np.int32) == 0
+
+    def frontier_matrix(self, mastered: np.ndarray) -> np.ndarray:
+        """users x topics: unlocked but not yet mastered."""
+        return self.prerequisites_met_matrix(mastered) & ~mastered
+
+
+# Built (and validated) at import so a broken catalog fails fast.
+PREREQ_GRAPH = PrereqGraph.from_catalog()
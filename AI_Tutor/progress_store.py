@@ -0,0 +1,352 @@
+# progress_store.py
+
+"""
+Storage for student progress: connection, schema and (bulk) writes.
+
+Kept free of LLM and graph imports so workers, importers and exporters can
+write progress without building the tutor. Every mastery write goes through
+`bulk_update_student_progress`, which applies the rows and all derived tables
+(mastery history, rollups, review schedule, and any registered listeners) in one transaction
+per shard.
+
+Per-user tables can be sharded across several files (see sharding.py):
+`get_progress_db_connection(user_id=...)` opens a user's shard,
+`get_progress_reader()` reads across all of them, and connections without a
+user go to the catalog (thread owners, tracking queue, worker status).
+The tables are created on first use of a database in each process, so reads
+and writes work on a fresh install before anything calls `setup_database`.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from leaderboard import record_leaderboard_events
+from mastery_history import setup_mastery_history, record_mastery_events
+from review_scheduler import setup_review_state, record_review_events
+from sharding import attach_shards, physical_shard, record_shard_count, shard_count, shard_paths, user_db_path
+
+# --- Database Configuration ---
+PROGRESS_DB_FILE = "progress_data.db"
+_KEY_CHUNK = 300  # (user, course, topic) keys per lookup query; 3 bound variables each.
+
+_ready = set()  # Absolute paths of catalogs set up by this process.
+_ready_lock = threading.Lock()
+
+# Called as fn(conn, events) inside the write transaction; events are dicts with
+# user_id, course, topic, old_level, new_level, thread_id, recorded_at.
+_progress_listeners: List[Callable[[sqlite3.Connection, List[Dict]], None]] = [record_mastery_events, record_review_events]
+
+
+def register_progress_listener(fn: Callable[[sqlite3.Connection, List[Dict]], None]):
+    """Registers a derived-table writer that runs in the same transaction as progress writes."""
+    if fn not in _progress_listeners:
+        _progress_listeners.append(fn)
+
+
+def _update_leaderboard(events: List[Dict]):
+    record_leaderboard_events(events, PROGRESS_DB_FILE)
+
+
+# Called as fn(events) once the events' transactions have committed; for derived
+# data kept outside the shards, such as the leaderboard.
+_commit_listeners: List[Callable[[List[Dict]], None]] = [_update_leaderboard]
+
+
+def register_commit_listener(fn: Callable[[List[Dict]], None]):
+    """Registers a writer for data outside the progress database, run after each bulk write commits."""
+    if fn not in _commit_listeners:
+        _commit_listeners.append(fn)
+
+
+def _notify_committed(events: List[Dict]):
+    for listener in _commit_listeners:
+        try:
+            listener(events)
+        except Exception as e:
+            # The progress write already succeeded; derived data can be rebuilt.
+            print(f"Post-commit listener {listener.__name__} failed: {e}")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL (set in setup_database) keeps commits durable with synchronous=NORMAL.
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def get_progress_db_connection(db_path: Optional[str] = None, user_id: Optional[str] = None):
+    """
+    Establishes a connection to the progress tracking SQLite database: the
+    shard holding `user_id`'s rows, or the catalog when no user is given.
+    """
+    db_path = ensure_database(db_path)
+    return _connect(user_db_path(db_path, user_id) if user_id else db_path)
+
+
+def get_progress_reader(db_path: Optional[str] = None):
+    """
+    Connection for queries across all users: the per-user tables read as
+    views over every shard (see sharding.attach_shards). Read-only by intent.
+    """
+    db_path = ensure_database(db_path)
+    return attach_shards(_connect(db_path), db_path)
+
+
+def _setup_user_tables(cursor: sqlite3.Cursor):
+    """Per-user tables, created in every shard."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS student_progress (
+            user_id TEXT NOT NULL,
+            course TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            mastery_level REAL DEFAULT 0.0,
+            PRIMARY KEY (user_id, course, topic)
+        )
+    """)
+    # Topic labels per tracked thread; training data for the local topic classifier.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS thread_topics (
+            thread_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            course TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            conversation TEXT NOT NULL,
+            source TEXT NOT NULL,
+            labeled_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_thread_topics_user ON thread_topics (user_id)")
+    setup_mastery_history(cursor.connection)
+    setup_review_state(cursor.connection)
+
+
+def setup_shard(path: str):
+    """Creates the per-user tables in one shard file."""
+    conn = _connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    _setup_user_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+
+
+def setup_database(db_path: Optional[str] = None):
+    """Creates the progress tables if they don't exist, in the catalog and every shard."""
+    db_path = db_path or PROGRESS_DB_FILE
+    count = shard_count(db_path)
+    conn = _connect(db_path)
+    cursor = conn.cursor()
+    # Lets the Dashboard read while the tracking worker writes.
+    cursor.execute("PRAGMA journal_mode = WAL")
+    record_shard_count(conn, count)
+    if count == 1:
+        _setup_user_tables(cursor)
+    # Conversation ownership: every chat thread belongs to one user.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS threads (
+            thread_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_active REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_threads_user_active ON threads (user_id, last_active)")
+    # Threads waiting for the progress tracker, per owner (see untracked_threads.py).
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tracking_queue (
+            thread_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            last_seen REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tracking_queue_user_seen ON tracking_queue (user_id, last_seen)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tracking_queue_shard_seen ON tracking_queue (shard, last_seen)")
+    # Heartbeats from background tracking workers, shown on the Dashboard.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tracker_status (
+            worker_id TEXT PRIMARY KEY,
+            pid INTEGER,
+            heartbeat_at REAL,
+            tracked_total INTEGER DEFAULT 0,
+            pending INTEGER DEFAULT 0,
+            last_error TEXT
+        )
+    """)
+    conn.commit()
+    conn.close()
+    if count > 1:
+        for path in shard_paths(db_path, count):
+            setup_shard(path)
+    _ready.add(os.path.abspath(db_path))
+    print("Progress database setup complete.")
+
+
+def ensure_database(db_path: Optional[str] = None) -> str:
+    """Runs `setup_database` the first time this process uses `db_path`. Returns the path."""
+    db_path = db_path or PROGRESS_DB_FILE
+    if os.path.abspath(db_path) not in _ready:
+        with _ready_lock:
+            if os.path.abspath(db_path) not in _ready:
+                setup_database(db_path)
+    return db_path
+
+
+# --- Reads ---
+
+def get_progress(user_id: str, course: str, topic: str) -> float:
+    """Current mastery_level of a student for a topic; 0.0 if no record exists."""
+    conn = get_progress_db_connection(user_id=user_id)
+    row = conn.execute(
+        "SELECT mastery_level FROM student_progress WHERE user_id = ? AND course = ? AND topic = ?",
+        (user_id, course, topic)
+    ).fetchone()
+    conn.close()
+    return row["mastery_level"] if row else 0.0
+
+
+def _current_levels(conn: sqlite3.Connection, keys: Sequence[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], float]:
+    """Looks up existing mastery for many keys with a few row-value IN queries."""
+    levels = {}
+    keys = list(dict.fromkeys(keys))
+    for i in range(0, len(keys), _KEY_CHUNK):
+        chunk = keys[i:i + _KEY_CHUNK]
+        placeholders = ",".join(["(?, ?, ?)"] * len(chunk))
+        params = [value for key in chunk for value in key]
+        for row in conn.execute(
+            f"SELECT user_id, course, topic, mastery_level FROM student_progress "
+            f"WHERE (user_id, course, topic) IN (VALUES {placeholders})", params
+        ):
+            levels[(row[0], row[1], row[2])] = row[3]
+    return levels
+
+
+# --- Writes ---
+
+def _apply_updates(conn: sqlite3.Connection, events: List[Dict], thread_labels: List[Sequence]):
+    """Writes one shard's events and labels in a single transaction."""
+    with conn:
+        known = _current_levels(conn, [(e["user_id"], e["course"], e["topic"]) for e in events])
+        for event in events:
+            key = (event["user_id"], event["course"], event["topic"])
+            event["old_level"] = known.get(key)
+            known[key] = event["new_level"]
+
+        conn.executemany("""
+            INSERT INTO student_progress (user_id, course, topic, mastery_level)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, course, topic) DO UPDATE SET
+            mastery_level = excluded.mastery_level
+        """, [(e["user_id"], e["course"], e["topic"], e["new_level"]) for e in events])
+        if events:
+            for listener in _progress_listeners:
+                listener(conn, events)
+        if thread_labels:
+            conn.executemany("""
+                INSERT OR REPLACE INTO thread_topics (thread_id, user_id, course, topic, conversation, source)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [tuple(label) for label in thread_labels])
+
+
+def bulk_update_student_progress(updates: Iterable[Sequence], conn: Optional[sqlite3.Connection] = None,
+                                 thread_labels: Iterable[Sequence] = ()) -> List[Dict]:
+    """
+    Applies many mastery updates with one transaction per shard.
+
+    `updates` are (user_id, course, topic, mastery_level[, thread_id]) tuples,
+    applied in order (a later update of the same key sees the earlier one as its
+    old level). Mastery history, rollups and registered listeners are written in
+    the same transaction, as are optional `thread_labels`
+    (thread_id, user_id, course, topic, conversation, source); commit listeners
+    (the leaderboard) run once everything has committed. When the
+    updates span several shards, the shards are written concurrently and commit
+    independently. An explicit `conn` takes every row. Returns the recorded events.
+
+    Time Complexity: O(N log P) for N updates against P progress rows, one commit per shard.
+    """
+    now = time.time()
+    events = []
+    for update in updates:
+        user_id, course, topic, level = update[:4]
+        thread_id = update[4] if len(update) > 4 else None
+        events.append({
+            "user_id": user_id, "course": course, "topic": topic,
+            "new_level": max(0.0, min(100.0, float(level))),
+            "thread_id": str(thread_id) if thread_id else None,
+            "recorded_at": now,
+        })
+    thread_labels = list(thread_labels)
+    if not events and not thread_labels:
+        return []
+    if conn is not None:
+        _apply_updates(conn, events, thread_labels)
+        _notify_committed(events)
+        return events
+
+    count = shard_count(ensure_database())
+    paths = shard_paths(PROGRESS_DB_FILE, count)
+    groups = defaultdict(lambda: ([], []))
+    for event in events:
+        groups[physical_shard(event["user_id"], count)][0].append(event)
+    for label in thread_labels:
+        groups[physical_shard(label[1], count)][1].append(label)
+
+    def write(shard: int):
+        shard_conn = _connect(paths[shard])
+        try:
+            _apply_updates(shard_conn, *groups[shard])
+        finally:
+            shard_conn.close()
+
+    if len(groups) == 1:
+        write(next(iter(groups)))
+    else:
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            list(pool.map(write, groups))
+    _notify_committed(events)
+    return events
+
+
+def update_progress(user_id: str, course: str, topic: str, mastery_level: float,
+                    thread_id: Optional[str] = None) -> float:
+    """Single-row convenience wrapper around the bulk API. Returns the stored (clamped) level."""
+    events = bulk_update_student_progress([(user_id, course, topic, mastery_level, thread_id)])
+    return events[0]["new_level"]
+
+
+class ProgressWriteBuffer:
+    """
+    Collects progress updates during batch tracking and writes them with one
+    bulk transaction per flush. Reads check the buffer first, so later threads
+    in the same batch see earlier, not yet flushed, updates.
+    """
+
+    def __init__(self):
+        self.updates: List[Tuple] = []
+        self.labels: List[Tuple] = []
+        self._pending: Dict[Tuple[str, str, str], float] = {}
+
+    def __len__(self):
+        return len(self.updates)
+
+    def get(self, user_id: str, course: str, topic: str) -> Optional[float]:
+        return self._pending.get((user_id, course, topic))
+
+    def add(self, user_id: str, course: str, topic: str, mastery_level: float, thread_id: Optional[str] = None):
+        level = max(0.0, min(100.0, float(mastery_level)))
+        self.updates.append((user_id, course, topic, level, thread_id))
+        self._pending[(user_id, course, topic)] = level
+
+    def add_label(self, thread_id: str, user_id: str, course: str, topic: str, conversation: str, source: str):
+        self.labels.append((thread_id, user_id, course, topic, conversation, source))
+
+    def flush(self) -> List[Dict]:
+        events = bulk_update_student_progress(self.updates, thread_labels=self.labels)
+        self.updates, self.labels, self._pending = [], [], {}
+        return events
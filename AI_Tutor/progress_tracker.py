@@ -1,16 +1,24 @@
-import sqlite3
 import os
 import pickle
 from typing import TypedDict, List
 from langchain_core.tools import tool
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import HumanMessage, AIMessage
 from graph_database import react_graph , retrieve_all_threads
+from llm_scheduler import scheduler, BATCH
+from thread_store import DEFAULT_USER_ID
+from untracked_threads import load_untracked_threads, remove_thread_id, remove_thread_ids
+from progress_store import (
+    get_progress_db_connection, get_progress_reader, setup_database, get_progress, update_progress,
+    ProgressWriteBuffer,
+)
+from model_router import get_llm
+from topic_classifier import CachedTopicClassifier, EmbeddingTopicClassifier, TopicClassifierChain, conversation_text
+from usage_ledger import usage_context
 import json
+import contextvars
 
 # --- Database Configuration ---
-PROGRESS_DB_FILE = "progress_data.db"
 # This should point to the database file used by SqliteSaver in your main app
 CHAT_HISTORY_DB_FILE = "chat_history.db" 
 ##courses
@@ -26,36 +34,24 @@ topics = {
     "Data Science": ["Data Analysis with Python", "Data Visualization", "Big Data Technologies"]
 }
 # --- Database Setup ---
-def get_progress_db_connection():
-    """Establishes a connection to the progress tracking SQLite database."""
-    conn = sqlite3.connect(PROGRESS_DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def setup_database():
-    """Creates the student_progress table if it doesn't exist."""
-    conn = get_progress_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS student_progress (
-            user_id TEXT NOT NULL,
-            course TEXT NOT NULL,
-            topic TEXT NOT NULL,
-            mastery_level REAL DEFAULT 0.0,
-            PRIMARY KEY (user_id, course, topic)
-        )
-    """)
-    conn.commit()
-    conn.close()
-    print("Progress database setup complete.")
-
+# Connection, schema and writes live in progress_store so they can be used without the LLM tools.
 # Initialize the database when the module is loaded
 setup_database()
 
 # --- LangChain Tools for Progress Tracking ---
 
-# Initialize the LLM for the tools that need it
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+# Set while tracking a batch of threads: progress writes are collected here and
+# committed together instead of one transaction per thread.
+_write_buffer: contextvars.ContextVar = contextvars.ContextVar("progress_write_buffer", default=None)
+
+# Initialize the LLMs for the tools that need them (see model_router.MODEL_ROUTES)
+classification_llm = get_llm("classification")
+mastery_llm = get_llm("mastery")
+# Local classifiers tried before the LLM: catalog embeddings first, then TF-IDF on past labels.
+local_topic_classifier = TopicClassifierChain([
+    EmbeddingTopicClassifier(),
+    CachedTopicClassifier(get_progress_reader),
+])
 
 def load_conversation(thread_id):
         return react_graph.get_state(config = {'configurable': {'thread_id': thread_id}}).values['messages']
@@ -90,11 +86,18 @@ def get_conversation_history(thread_id: str) -> str:
 
 
 @tool
+@usage_context(tool="identify_course_topic")
 def identify_course_topic(conversation_history: list[dict]) -> str:
     """
     Uses an LLM to identify the main educational course from a conversation history.
     """
     print("Identifying course and topic from conversation...")
+    local = local_topic_classifier.classify(conversation_history)
+    if local:
+        course, topic, confidence = local
+        print(f"Identified Topic locally ({confidence:.2f}): {course} / {topic}")
+        return json.dumps({"course": course, "topic": topic, "source": "local"})
+
     prompt = f"""
         Analyze the following conversation between a tutor and a student.
 
@@ -129,7 +132,7 @@ def identify_course_topic(conversation_history: list[dict]) -> str:
         NOTE: if the conversation is general conversation and not about a course and topic , then return {{"course": "General", "topic": "General"}}.
         """
 
-    response = llm.invoke(prompt).content.strip()
+    response = scheduler.invoke(classification_llm, prompt, priority=BATCH).content.strip()
     # topic = response.content.strip()
     if response.startswith('```json'):
         response = response[7:-3].strip()  # Remove the ```json and ``` markers
@@ -137,6 +140,7 @@ def identify_course_topic(conversation_history: list[dict]) -> str:
     return response
 
 @tool
+@usage_context(tool="evaluate_mastery")
 def evaluate_mastery(conversation_history: list[dict], topic: str, course: str , previous_mastery_level: float) -> str:
     """
     Uses an LLM to evaluate a student's mastery of a topic based on their
@@ -161,7 +165,7 @@ def evaluate_mastery(conversation_history: list[dict], topic: str, course: str ,
 
     Provide only a single floating-point number as your response.
     """
-    response = llm.invoke(prompt)
+    response = scheduler.invoke(mastery_llm, prompt, priority=BATCH)
     print("RESPONSE FROM MASTERY EVALUATION:", response.content)
     try:
         mastery_level = float(response.content.strip())
@@ -177,35 +181,42 @@ def get_student_progress(user_id: str, course: str, topic: str) -> float:
     Returns 0.0 if no record exists.
     """
     print(f"Fetching previous progress for {user_id} on course : {course} and topic: {topic}...")
-    conn = get_progress_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT mastery_level FROM student_progress WHERE user_id = ? AND course = ? AND topic = ?",
-        (user_id, course, topic)
-    )
-    row = cursor.fetchone()
-    conn.close()
-    response = row["mastery_level"] if row else 0.0
-    return response
+    buffer = _write_buffer.get()
+    pending = buffer.get(user_id, course, topic) if buffer is not None else None
+    return pending if pending is not None else get_progress(user_id, course, topic)
 
 @tool
-def update_student_progress(user_id: str, course: str, topic: str, new_mastery_level: float) -> dict:
+def update_student_progress(user_id: str, course: str, topic: str, new_mastery_level: float, thread_id: str = "") -> dict:
     """
-    Updates or inserts a student's progress for a specific topic.
+    Updates or inserts a student's progress for a specific topic and appends the
+    change to the mastery history.
     """
     print(f"Updating progress for {user_id} on '{topic}' to {new_mastery_level}...")
-    new_mastery_level = max(0.0, min(100.0, new_mastery_level))
-    conn = get_progress_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO student_progress (user_id, course, topic, mastery_level)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(user_id, course, topic) DO UPDATE SET
-        mastery_level = excluded.mastery_level;
-    """, (user_id, course, topic, new_mastery_level))
+    buffer = _write_buffer.get()
+    if buffer is not None:
+        buffer.add(user_id, course, topic, new_mastery_level, thread_id or None)
+        new_mastery_level = buffer.get(user_id, course, topic)
+    else:
+        new_mastery_level = update_progress(user_id, course, topic, new_mastery_level, thread_id or None)
+    return {"status": "success", "topic": topic, "new_mastery_level": new_mastery_level}
+
+def record_thread_topic(state: dict):
+    """Stores the thread's topic label so the local classifier can learn from it."""
+    label = (
+        str(state['thread_id']), state['user_id'], state['course'], state['topic'],
+        conversation_text(state['conversation_history']), state.get('topic_source', 'llm'),
+    )
+    buffer = _write_buffer.get()
+    if buffer is not None:
+        buffer.add_label(*label)
+        return
+    conn = get_progress_db_connection(user_id=state['user_id'])
+    conn.execute("""
+        INSERT OR REPLACE INTO thread_topics (thread_id, user_id, course, topic, conversation, source)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, label)
     conn.commit()
     conn.close()
-    return {"status": "success", "topic": topic, "new_mastery_level": new_mastery_level}
 
 # --- LangGraph Agent State and Nodes ---
 
@@ -219,6 +230,7 @@ class ProgressState(TypedDict):
     previous_mastery_level: float
     evaluated_mastery: float
     thread_id : str
+    topic_source: str
 
 def fetch_history_node(state: ProgressState):
     """Fetches the conversation history from the database."""
@@ -233,6 +245,7 @@ def identify_topic_node(state: ProgressState):
     data = json.loads(data)  # Parse the JSON response
     state['topic'] = data.get("topic") 
     state['course'] = data.get("course")
+    state['topic_source'] = data.get("source", "llm")
     return state
 
 def get_previous_progress_node(state: ProgressState):
@@ -264,8 +277,10 @@ def updater_node(state: ProgressState):
         "user_id": state['user_id'],
         "course": state['course'],
         "topic": state['topic'],
-        "new_mastery_level": state['evaluated_mastery']
+        "new_mastery_level": state['evaluated_mastery'],
+        "thread_id": str(state['thread_id']),
     })
+    record_thread_topic(state)
     return state
 
 # --- Graph Definition ---
@@ -328,48 +343,78 @@ progress_tracker_graph = builder.compile()
 #     conn.close()
 
 
-def run_progress_tracker(user_id: str):
+def track_thread(user_id: str, thread_id: str, last_seen: float = None) -> dict:
+    """
+    Runs the progress tracker graph for one thread and removes it from the untracked queue.
+    With `last_seen`, a thread that received new messages meanwhile stays queued.
+    """
+    initial_state = {
+        "user_id": user_id,
+        'thread_id': thread_id,
+    }
+
+    print(f"\n1. Invoking graph for user '{user_id}'...")
+    with usage_context(user_id=user_id, thread_id=thread_id):
+        final_state = progress_tracker_graph.invoke(initial_state)
+
+    print("\n2. Graph execution complete. Final state:")
+    print(f"   - Identified Topic: {final_state.get('topic')}")
+    print(f"   - Course: {final_state.get('course')}")
+    print(f"   - Previous Mastery: {final_state.get('previous_mastery_level')}")
+    print(f"   - New Evaluated Mastery: {final_state.get('evaluated_mastery')}")
+
+    remove_thread_id(thread_id, last_seen=last_seen)
+    print("\n--- Workflow Finished ---")
+    return final_state
+
+
+def track_threads(user_id: str, pending: dict, batch_size: int = 50, on_error=None) -> int:
     """
-    Runs the progress tracker graph for a given user and thread.
+    Tracks many threads ({thread_id: last_seen} or (thread_id, last_seen) pairs), committing progress once per
+    `batch_size` threads through the bulk write API. Threads leave the queue
+    only after their batch is committed. Returns the number tracked.
+    """
+    tracked = 0
+    buffer = ProgressWriteBuffer()
+    token = _write_buffer.set(buffer)
+    done = []
+
+    def flush():
+        buffer.flush()
+        remove_thread_ids(done)
+        done.clear()
+
+    try:
+        for thread_id, last_seen in (pending.items() if isinstance(pending, dict) else pending):
+            try:
+                with usage_context(user_id=user_id, thread_id=thread_id):
+                    final_state = progress_tracker_graph.invoke({"user_id": user_id, 'thread_id': thread_id})
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(thread_id, e)
+                continue
+            print(f"   - {thread_id}: {final_state.get('course')} / {final_state.get('topic')} -> {final_state.get('evaluated_mastery')}")
+            done.append((thread_id, last_seen))
+            tracked += 1
+            if len(done) >= batch_size:
+                flush()
+    finally:
+        flush()
+        _write_buffer.reset(token)
+    return tracked
+
+
+def run_progress_tracker(user_id: str, batch_size: int = 50):
+    """
+    Runs the progress tracker graph over every untracked thread owned by `user_id`.
     """
     print("\n--- Running Full Progress Tracker Workflow ---")
-    
-    # The only inputs needed are the user's ID (thread_id) and the course
-    # course = "Computer Science"
-    # thread_id = "e0eb2abc-3a3c-41f0-b039-ae732405f548"  # Example thread ID, replace with actual if needed
-    file_path='untracked_threads.json'
-    with open(file_path, 'r') as f:
-        data = json.load(f)
-    if not data.get("thread_ids"):
+    pending = load_untracked_threads(user_id)
+    if not pending:
         return "No untracked threads found."
-    for thread_id in data["thread_ids"][:]:
-        initial_state = {
-            "user_id": user_id,
-            'thread_id': thread_id,
-        }
+    track_threads(user_id, pending, batch_size)
 
-        print(f"\n1. Invoking graph for user '{user_id}'...")
-        final_state = progress_tracker_graph.invoke(initial_state)
-        
-        print("\n2. Graph execution complete. Final state:")
-        print(f"   - Identified Topic: {final_state.get('topic')}")
-        print(f"   - Course: {final_state.get('course')}")
-        print(f"   - Previous Mastery: {final_state.get('previous_mastery_level')}")
-        print(f"   - New Evaluated Mastery: {final_state.get('evaluated_mastery')}")
-
-        print("\n3. Verifying final progress in database...")
-        final_progress = get_student_progress.invoke({
-            "user_id": user_id, 
-            "course": final_state.get('course'), 
-            "topic": final_state.get('topic')
-        })
-        print(f"   - Mastery level in DB: {final_progress}")
-        
-        print("\n--- Workflow Finished ---")
-        data["thread_ids"].remove(thread_id)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
-    
     return "Update complete for all threads."
 
         
@@ -378,6 +423,4 @@ def run_progress_tracker(user_id: str):
 
 if __name__ == "__main__":
     # setup_dummy_chat_history()
-    student_id = "student456"
-    thread_id = "e0eb2abc-3a3c-41f0-b039-ae732405f548"  # Example thread ID
-    run_progress_tracker(student_id, thread_id)
\ No newline at end of file
+    run_progress_tracker(DEFAULT_USER_ID)
\ No newline at end of file
@@ -0,0 +1,480 @@
+# quiz_bank.py
+
+"""
+Persistent bank of multiple-choice quiz items.
+
+Generated quizzes are parsed into structured items (stem, options, answer,
+course/topic, difficulty), de-duplicated by a normalised stem fingerprint and
+stored in `quiz_bank.db`, indexed by topic and difficulty. Quiz requests are
+served from the bank, skipping items the student has already been given; the
+LLM is only called when the bank has run out of unseen items for that student.
+
+Pre-warm every catalog topic in the background (batch priority lane), or
+just the topics students have reviews coming up for:
+    python quiz_bank.py --per-topic 30
+    python quiz_bank.py --due-within 3600
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from llm_scheduler import BATCH, scheduler
+from model_router import get_llm
+from progress_store import PROGRESS_DB_FILE, get_progress
+from review_scheduler import upcoming_reviews
+from sharding import shard_of
+from topic_classifier import GENERAL
+from topic_meta import TOPICS, TOPIC_META
+
+# --- Configuration Block ---
+QUIZ_BANK_DB_FILE = "quiz_bank.db"
+DEFAULT_PER_TOPIC = 30
+QUIZ_SIZE = 5           # Unseen items kept ready for each student with a review coming up.
+GENERATION_BATCH = 10   # Items asked for per LLM call.
+MAX_EMPTY_BATCHES = 3   # Pre-warm gives up on a topic after this many batches with no new items.
+AVOID_STEMS = 20        # Recent stems listed in the prompt so refills don't repeat them.
+OPTION_LETTERS = "ABCDEF"
+
+COURSE_OF = {topic: course for course, course_topics in TOPICS.items() for topic in course_topics}
+
+
+@dataclass
+class QuizItem:
+    course: str
+    topic: str
+    difficulty: int
+    stem: str
+    options: List[str]
+    answer: int  # Index into options.
+    explanation: str = ""
+    id: Optional[int] = field(default=None, compare=False)
+
+    @property
+    def fingerprint(self) -> str:
+        return stem_fingerprint(self.stem)
+
+    @property
+    def answer_letter(self) -> str:
+        return OPTION_LETTERS[self.answer]
+
+    def to_text(self, number: int) -> str:
+        """The question as shown to the student: no answer."""
+        lines = [f"{number}. [Q{self.id}] {self.stem}"]
+        lines += [f"   {OPTION_LETTERS[i]}) {option}" for i, option in enumerate(self.options)]
+        return "\n".join(lines)
+
+
+def stem_fingerprint(stem: str) -> str:
+    """Case, punctuation and whitespace-insensitive hash of a question stem."""
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", stem.lower()).split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def target_difficulty(mastery_level: float) -> int:
+    """Difficulty (1-5) to serve a student at `mastery_level` (0-100)."""
+    return 1 + min(4, int(mastery_level // 20))
+
+
+# --- Parsing ---
+
+def _answer_index(answer, options: List[str]) -> Optional[int]:
+    if isinstance(answer, int):
+        return answer if 0 <= answer < len(options) else None
+    answer = str(answer).strip()
+    match = re.match(r"^\(?([A-Fa-f])\)?(?:[\s.):]|$)", answer)
+    if match and OPTION_LETTERS.index(match.group(1).upper()) < len(options):
+        return OPTION_LETTERS.index(match.group(1).upper())
+    lowered = [option.strip().lower() for option in options]
+    return lowered.index(answer.lower()) if answer.lower() in lowered else None
+
+
+def _item_from_dict(raw: Dict, course: str, topic: str, difficulty: int) -> Optional[QuizItem]:
+    stem = str(raw.get("question") or raw.get("stem") or "").strip()
+    options = raw.get("options") or raw.get("choices") or []
+    if isinstance(options, dict):
+        options = [options[key] for key in sorted(options)]
+    options = [re.sub(r"^\(?[A-Fa-f][).:]\s*", "", str(option)).strip() for option in options][:len(OPTION_LETTERS)]
+    answer = _answer_index(raw.get("answer", raw.get("correct", "")), options)
+    if not stem or len(options) < 2 or answer is None:
+        return None
+    try:
+        difficulty = min(5, max(1, int(raw.get("difficulty", difficulty))))
+    except (TypeError, ValueError):
+        pass
+    return QuizItem(course, topic, difficulty, stem, options, answer, str(raw.get("explanation", "")).strip())
+
+
+_QUESTION_LINE = re.compile(r"^\s*(?:Q(?:uestion)?\s*)?\d+[.):]\s*(.+)$", re.IGNORECASE)
+_OPTION_LINE = re.compile(r"^\s*\(?([A-Fa-f])[).:]\s*(.+)$")
+_ANSWER_LINE = re.compile(r"^\s*\**(?:correct\s+)?answer\**\s*[:\-]\s*\**\s*(.+?)\**\s*$", re.IGNORECASE)
+
+
+def _parse_free_text(text: str, course: str, topic: str, difficulty: int) -> List[QuizItem]:
+    """Numbered questions with lettered options and an 'Answer: X' line."""
+    items, current = [], None
+    for line in text.splitlines():
+        if _ANSWER_LINE.match(line) and current:
+            current["answer"] = _ANSWER_LINE.match(line).group(1)
+        elif _OPTION_LINE.match(line) and current:
+            current["options"].append(_OPTION_LINE.match(line).group(2))
+        elif _QUESTION_LINE.match(line):
+            current = {"question": _QUESTION_LINE.match(line).group(1), "options": []}
+            items.append(current)
+    return [item for item in (_item_from_dict(raw, course, topic, difficulty) for raw in items) if item]
+
+
+def parse_quiz_items(text: str, course: str, topic: str, difficulty: int = 3) -> List[QuizItem]:
+    """
+    Structured items from an LLM quiz response: a JSON array of objects with
+    question, options, answer (letter, index or option text), difficulty and
+    explanation, or as a fallback numbered free text. Malformed items are dropped.
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            raw_items = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            raw_items = None
+        if isinstance(raw_items, list):
+            items = [_item_from_dict(raw, course, topic, difficulty) for raw in raw_items if isinstance(raw, dict)]
+            return [item for item in items if item]
+    return _parse_free_text(text, course, topic, difficulty)
+
+
+def quiz_prompt(n: int, topic: str, difficulty: int, content: Optional[str] = None, avoid: List[str] = ()) -> str:
+    subject = f'the content below.\nCONTENT: "{content}"' if content else f'the topic "{topic}".'
+    existing = "".join(f"\n- {stem}" for stem in avoid)
+    return (
+        f"Generate exactly {n} unique multiple-choice questions about {subject}\n"
+        + (f"Do not repeat any of these existing questions:{existing}\n" if existing else "") +
+        "Return ONLY a JSON array. Each element must be an object with the keys "
+        '"question", "options" (a list of 4 strings), "answer" (the letter A-D of the correct option), '
+        f'"difficulty" (1-5, aim for {difficulty}) and "explanation" (one sentence).'
+    )
+
+
+# --- Bank ---
+
+class QuizBank:
+    def __init__(self, db_path: str = QUIZ_BANK_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                difficulty INTEGER NOT NULL,
+                stem TEXT NOT NULL,
+                options TEXT NOT NULL,
+                answer INTEGER NOT NULL,
+                explanation TEXT NOT NULL DEFAULT '',
+                fingerprint TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (topic, fingerprint)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_items_topic_difficulty ON quiz_items (topic, difficulty)")
+        # Items already given to each student, so a bank refill is only needed once they have seen them all.
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_served (
+                user_id TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                served_at REAL NOT NULL,
+                PRIMARY KEY (user_id, item_id)
+            ) WITHOUT ROWID
+        """)
+        # Graded quizzes (see quiz_grading.py); feedback is filled in later if a narrative is requested.
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_submissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                thread_id TEXT,
+                correct INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                submitted_at REAL NOT NULL,
+                feedback TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_submissions_user ON quiz_submissions (user_id, submitted_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_answers (
+                submission_id INTEGER NOT NULL,
+                item_id INTEGER NOT NULL,
+                chosen INTEGER,
+                correct INTEGER NOT NULL,
+                PRIMARY KEY (submission_id, item_id)
+            ) WITHOUT ROWID
+        """)
+        # Finds earlier answers to an item, so it is not graded twice.
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_answers_item ON quiz_answers (item_id)")
+        self._conn.commit()
+
+    @staticmethod
+    def _item(row: sqlite3.Row) -> QuizItem:
+        return QuizItem(row["course"], row["topic"], row["difficulty"], row["stem"], json.loads(row["options"]),
+                        row["answer"], row["explanation"], row["id"])
+
+    def add_items(self, items: Iterable[QuizItem]) -> List[QuizItem]:
+        """Stores items, skipping duplicates of stems already in the topic. Returns the stored items with ids."""
+        now = time.time()
+        stored = []
+        with self._lock, self._conn:
+            for item in items:
+                cursor = self._conn.execute("""
+                    INSERT OR IGNORE INTO quiz_items
+                    (course, topic, difficulty, stem, options, answer, explanation, fingerprint, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (item.course, item.topic, item.difficulty, item.stem, json.dumps(item.options), item.answer,
+                      item.explanation, item.fingerprint, now))
+                if cursor.rowcount:
+                    item.id = cursor.lastrowid
+                    stored.append(item)
+        return stored
+
+    def count(self, topic: Optional[str] = None) -> int:
+        with self._lock:
+            if topic:
+                return self._conn.execute("SELECT COUNT(*) FROM quiz_items WHERE topic = ?", (topic,)).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM quiz_items").fetchone()[0]
+
+    def counts_by_topic(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT topic, COUNT(*) FROM quiz_items GROUP BY topic").fetchall())
+
+    def recent_stems(self, topic: str, limit: int = AVOID_STEMS) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stem FROM quiz_items WHERE topic = ? ORDER BY id DESC LIMIT ?", (topic, limit)
+            ).fetchall()
+        return [row["stem"] for row in rows]
+
+    def unseen_counts(self, user_id: str, topics: Iterable[str]) -> Dict[str, int]:
+        """{topic: items on it the user has not been given yet}"""
+        topics = list(topics)
+        if not topics:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT q.topic, COUNT(*) FROM quiz_items AS q
+                WHERE q.topic IN ({','.join('?' * len(topics))})
+                  AND NOT EXISTS (SELECT 1 FROM quiz_served AS s WHERE s.user_id = ? AND s.item_id = q.id)
+                GROUP BY q.topic
+            """, topics + [user_id]).fetchall()
+        return {**dict.fromkeys(topics, 0), **dict(rows)}
+
+    def get_items(self, item_ids: Iterable[int]) -> Dict[int, QuizItem]:
+        """{id: item} for the ids that exist."""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM quiz_items WHERE id IN ({','.join('?' * len(item_ids))})", item_ids
+            ).fetchall()
+        return {row["id"]: self._item(row) for row in rows}
+
+    def draw(self, user_id: str, topic: str, n: int, difficulty: int = 3) -> List[QuizItem]:
+        """
+        Up to `n` items on `topic` the user has not been given yet, closest to
+        `difficulty` first, and records them as served.
+
+        Time Complexity: O(T log T) for T items on the topic, via idx_quiz_items_topic_difficulty.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute("""
+                SELECT * FROM quiz_items AS q
+                WHERE q.topic = ?
+                  AND NOT EXISTS (SELECT 1 FROM quiz_served AS s WHERE s.user_id = ? AND s.item_id = q.id)
+                ORDER BY ABS(q.difficulty - ?), random()
+                LIMIT ?
+            """, (topic, user_id, difficulty, n)).fetchall()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO quiz_served (user_id, item_id, served_at) VALUES (?, ?, ?)",
+                [(user_id, row["id"], now) for row in rows],
+            )
+        return [self._item(row) for row in rows]
+
+    def submit_answers(self, user_id: str, choices: Dict[int, Optional[int]],
+                       thread_id: Optional[str] = None) -> Tuple[Optional[int], List[Tuple[QuizItem, Optional[int]]]]:
+        """
+        Stores a quiz submission for the items in `choices` ({item_id: chosen
+        index or None}) that were served to the user and are not graded yet;
+        other ids are ignored, so a quiz can only be graded once. Returns
+        (submission id, [(item, chosen)]), or (None, []) when no item qualifies.
+
+        Time Complexity: O(n log S) for n answers, via the quiz_served key and idx_quiz_answers_item.
+        """
+        item_ids = list(choices)
+        if not item_ids:
+            return None, []
+        with self._lock, self._conn:
+            rows = self._conn.execute(f"""
+                SELECT q.* FROM quiz_items AS q
+                JOIN quiz_served AS s ON s.item_id = q.id AND s.user_id = ?
+                WHERE q.id IN ({','.join('?' * len(item_ids))})
+                  AND NOT EXISTS (
+                      SELECT 1 FROM quiz_answers AS a JOIN quiz_submissions AS sub ON sub.id = a.submission_id
+                      WHERE a.item_id = q.id AND sub.user_id = ?
+                  )
+            """, [user_id] + item_ids + [user_id]).fetchall()
+            if not rows:
+                return None, []
+            graded = [(self._item(row), choices[row["id"]]) for row in rows]
+            correct = sum(1 for item, chosen in graded if chosen == item.answer)
+            cursor = self._conn.execute(
+                "INSERT INTO quiz_submissions (user_id, thread_id, correct, total, submitted_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, thread_id, correct, len(graded), time.time()),
+            )
+            submission_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO quiz_answers (submission_id, item_id, chosen, correct) VALUES (?, ?, ?, ?)",
+                [(submission_id, item.id, chosen, int(chosen == item.answer)) for item, chosen in graded],
+            )
+        order = {item_id: i for i, item_id in enumerate(item_ids)}
+        return submission_id, sorted(graded, key=lambda pair: order[pair[0].id])
+
+    def set_feedback(self, submission_id: int, feedback: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE quiz_submissions SET feedback = ? WHERE id = ?", (feedback, submission_id))
+
+    def recent_submissions(self, user_id: str, limit: int = 5) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM quiz_submissions WHERE user_id = ? ORDER BY submitted_at DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def sample(self, topic: str, n: int, difficulty: int = 3) -> List[QuizItem]:
+        """Up to `n` items on `topic` closest to `difficulty`, without recording them as served (contests)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM quiz_items WHERE topic = ? ORDER BY ABS(difficulty - ?), random() LIMIT ?",
+                (topic, difficulty, n),
+            ).fetchall()
+        return [self._item(row) for row in rows]
+
+    def generate(self, course: str, topic: str, n: int, difficulty: int = 3, content: Optional[str] = None,
+                 priority: Optional[int] = None, api_key: Optional[str] = None) -> List[QuizItem]:
+        """
+        Asks the LLM (with `api_key`, default: the environment's) for `n` items,
+        then parses and stores them. Returns the new (non-duplicate) items.
+        """
+        avoid = [] if content else self.recent_stems(topic)
+        prompt = quiz_prompt(n, topic, difficulty, content, avoid)
+        response = scheduler.invoke(get_llm("quiz", api_key), prompt, priority=priority)
+        return self.add_items(parse_quiz_items(response.content, course, topic, difficulty))
+
+    def serve(self, user_id: str, course: str, topic: str, n: int, difficulty: int = 3,
+              api_key: Optional[str] = None) -> List[QuizItem]:
+        """Quiz for a user from the bank, generating only the shortfall when they have seen every stored item."""
+        items = self.draw(user_id, topic, n, difficulty)
+        if len(items) < n:
+            self.generate(course, topic, n - len(items), difficulty, api_key=api_key)
+            items += self.draw(user_id, topic, n - len(items), difficulty)
+        return items
+
+    def prewarm(self, per_topic: int = DEFAULT_PER_TOPIC, topics: Optional[List[str]] = None,
+                verbose: bool = False) -> int:
+        """
+        Fills every catalog topic (or `topics`) up to `per_topic` items with
+        batch-priority LLM calls. Returns the number of items added.
+        """
+        added = 0
+        counts = self.counts_by_topic()
+        for topic in topics or list(TOPIC_META):
+            have, empty = counts.get(topic, 0), 0
+            while have < per_topic and empty < MAX_EMPTY_BATCHES:
+                new = self.generate(COURSE_OF[topic], topic, min(GENERATION_BATCH, per_topic - have),
+                                    TOPIC_META[topic]["difficulty"], priority=BATCH)
+                have += len(new)
+                added += len(new)
+                empty = 0 if new else empty + 1
+            if verbose:
+                print(f"{topic:<28} {have:>5} items")
+        return added
+
+    def prewarm_reviews(self, within_seconds: float, quiz_size: int = QUIZ_SIZE, partition=None,
+                        catalog_path: str = PROGRESS_DB_FILE, verbose: bool = False) -> int:
+        """
+        Makes sure every student with a review due in the next `within_seconds`
+        (see review_scheduler.py) has `quiz_size` unseen items on that topic,
+        generating the largest shortfall per topic in the batch lane.
+        Optionally only for students in `partition` (index, count). Returns items added.
+        """
+        by_user = defaultdict(list)
+        for review in upcoming_reviews(catalog_path, within_seconds):
+            if review["topic"] in COURSE_OF and (
+                    not partition or shard_of(review["user_id"]) % partition[1] == partition[0]):
+                by_user[review["user_id"]].append(review["topic"])
+        shortfall = defaultdict(int)
+        for user_id, topics in by_user.items():
+            for topic, unseen in self.unseen_counts(user_id, topics).items():
+                shortfall[topic] = max(shortfall[topic], quiz_size - unseen)
+        added = 0
+        for topic, missing in shortfall.items():
+            if missing > 0:
+                added += len(self.generate(COURSE_OF[topic], topic, missing, TOPIC_META[topic]["difficulty"],
+                                           priority=BATCH))
+        if verbose:
+            print(f"{len(by_user)} student(s) with reviews due, {added} items added")
+        return added
+
+
+@lru_cache(maxsize=None)
+def get_quiz_bank(db_path: str = QUIZ_BANK_DB_FILE) -> QuizBank:
+    return QuizBank(db_path)
+
+
+def quiz_for_content(content: str, n: int, user_id: str, classifier,
+                     api_key: Optional[str] = None) -> List[QuizItem]:
+    """
+    Quiz for the generate_quiz tool. Content that `classifier` confidently
+    places in a catalog topic is served from that topic's bank, at a difficulty
+    matched to the student's mastery; anything else gets new questions on the
+    content itself, stored under General so they can still be looked up by id.
+    New questions are written with `api_key` (default: the environment's).
+    """
+    tag = classifier.classify([{"content": content}])
+    bank = get_quiz_bank()
+    if tag:
+        course, topic = tag[:2]
+        return bank.serve(user_id, course, topic, n, target_difficulty(get_progress(user_id, course, topic)), api_key)
+    return bank.generate(*GENERAL, n, content=content, api_key=api_key)
+
+
+def format_quiz(items: List[QuizItem]) -> str:
+    if not items:
+        return "No quiz questions are available right now."
+    course, topic = items[0].course, items[0].topic
+    heading = f"Quiz on {topic} ({course})" if (course, topic) != GENERAL else "Quiz"
+    return "\n\n".join([heading + ":"] + [item.to_text(i) for i, item in enumerate(items, 1)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-topic", type=int, default=DEFAULT_PER_TOPIC, help="Items to keep per catalog topic")
+    parser.add_argument("--topic", action="append", help="Only these topics (repeatable)")
+    parser.add_argument("--due-within", type=float, help="Instead, prepare quizzes for reviews due in this many seconds")
+    parser.add_argument("--db", default=QUIZ_BANK_DB_FILE)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    bank = get_quiz_bank(args.db)
+    if args.due_within is not None:
+        added = bank.prewarm_reviews(args.due_within, verbose=True)
+    else:
+        added = bank.prewarm(args.per_topic, args.topic, verbose=True)
+    print(f"Added {added} items in {time.perf_counter() - start:.1f} s")
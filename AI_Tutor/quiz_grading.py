@@ -0,0 +1,184 @@
+# quiz_grading.py
+
+"""
+Local grading of quiz-bank items.
+
+Answers to items served by quiz_bank.py are checked against the stored answer
+key, so a quiz is scored instantly and without an LLM call. Per-topic accuracy
+moves the student's mastery toward the quiz score and is written with
+`bulk_update_student_progress` (one transaction per shard, mastery history
+included). A narrative from the LLM is optional: with
+AI_TUTOR_QUIZ_NARRATIVE=1 it is written in the batch lane after the result has
+been returned, and stored with the submission for the Dashboard.
+"""
+
+import contextvars
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from llm_scheduler import BATCH, scheduler
+from model_router import get_llm
+from progress_store import bulk_update_student_progress, get_progress
+from quiz_bank import OPTION_LETTERS, QuizBank, QuizItem, get_quiz_bank
+from topic_classifier import GENERAL
+
+# --- Configuration Block ---
+QUIZ_MASTERY_WEIGHT = 0.3  # Share of the gap between mastery and quiz accuracy closed by one quiz.
+NARRATIVE_ENABLED = os.getenv("AI_TUTOR_QUIZ_NARRATIVE", "0") == "1"
+
+_narratives = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quiz-narrative")
+
+_ITEM_ID = re.compile(r"\[Q(\d+)\]")
+_ID_ANSWER = re.compile(r"\bQ(\d+)\s*[:=)\-]?\s*\(?([A-Fa-f])\b")
+_LETTER = re.compile(r"^(?:\d+[.):\-])?\(?([A-Fa-f])\)?[.)]?$")
+
+
+@dataclass
+class GradedAnswer:
+    item: QuizItem
+    chosen: Optional[int]  # Option index, None if unanswered.
+
+    @property
+    def correct(self) -> bool:
+        return self.chosen == self.item.answer
+
+
+@dataclass
+class QuizResult:
+    submission_id: int
+    user_id: str
+    answers: List[GradedAnswer]
+
+    @property
+    def correct(self) -> int:
+        return sum(1 for a in self.answers if a.correct)
+
+    def by_topic(self) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """{(course, topic): (correct, answered)}"""
+        totals = defaultdict(lambda: [0, 0])
+        for answer in self.answers:
+            key = (answer.item.course, answer.item.topic)
+            totals[key][0] += answer.correct
+            totals[key][1] += 1
+        return {key: tuple(value) for key, value in totals.items()}
+
+    def to_text(self) -> str:
+        total = len(self.answers)
+        lines = [f"Score: {self.correct}/{total} ({100 * self.correct / max(total, 1):.0f}%)"]
+        for i, answer in enumerate(self.answers, 1):
+            key = answer.item.answer_letter
+            if answer.correct:
+                lines.append(f"{i}. [Q{answer.item.id}] correct ({key})")
+            else:
+                chosen = OPTION_LETTERS[answer.chosen] if answer.chosen is not None else "no answer"
+                note = f" {answer.item.explanation}" if answer.item.explanation else ""
+                lines.append(f"{i}. [Q{answer.item.id}] incorrect: {chosen}, the answer is {key}.{note}")
+        topics = [f"{topic} {right}/{n}" for (course, topic), (right, n) in self.by_topic().items() if (course, topic) != GENERAL]
+        if topics:
+            lines.append("Topic accuracy: " + ", ".join(topics))
+        return "\n".join(lines)
+
+
+# --- Parsing ---
+
+def item_ids(questions: str) -> List[int]:
+    """Quiz-bank ids ("[Q12]") in the order the questions were shown."""
+    return [int(i) for i in _ITEM_ID.findall(questions)]
+
+
+def parse_choices(answers: str, ids: List[int]) -> Dict[int, int]:
+    """
+    {item_id: option index} from the student's answers, given either per
+    question ("Q12: B", "Q12 b") or as letters in question order ("1. B, 2. C"
+    or "B C A"). Questions without a recognisable answer are left out.
+    """
+    explicit = {int(i): OPTION_LETTERS.index(letter.upper()) for i, letter in _ID_ANSWER.findall(answers)}
+    if explicit and set(explicit) <= set(ids):
+        return explicit
+    letters = [
+        OPTION_LETTERS.index(_LETTER.match(token).group(1).upper())
+        for token in re.split(r"(?<=[.):\-])\s+|[\s,;]+", answers)
+        if _LETTER.match(token)
+    ]
+    return dict(zip(ids, letters))
+
+
+# --- Grading ---
+
+def mastery_updates(user_id: str, result: QuizResult, thread_id: Optional[str] = None) -> List[tuple]:
+    """Moves mastery of each catalog topic in the quiz QUIZ_MASTERY_WEIGHT of the way toward its accuracy."""
+    updates = []
+    for (course, topic), (right, answered) in result.by_topic().items():
+        if (course, topic) == GENERAL:
+            continue
+        current = get_progress(user_id, course, topic)
+        accuracy = 100.0 * right / answered
+        updates.append((user_id, course, topic, current + QUIZ_MASTERY_WEIGHT * (accuracy - current), thread_id))
+    return updates
+
+
+def grade(user_id: str, choices: Dict[int, Optional[int]], thread_id: Optional[str] = None,
+          bank: Optional[QuizBank] = None) -> Optional[QuizResult]:
+    """
+    Scores {item_id: chosen option index} against the bank's answer keys,
+    records the submission and writes the mastery changes. Only items served
+    to this user and not graded before count, so resubmitting a quiz (whose
+    feedback shows the answers) cannot raise mastery. None when no item counts.
+
+    Time Complexity: O(n) for n answers, plus one progress transaction per shard.
+    """
+    bank = bank or get_quiz_bank()
+    submission_id, graded = bank.submit_answers(user_id, choices, thread_id)
+    if submission_id is None:
+        return None
+    result = QuizResult(submission_id, user_id, [GradedAnswer(item, chosen) for item, chosen in graded])
+    bulk_update_student_progress(mastery_updates(user_id, result, thread_id))
+    return result
+
+
+def grade_text(user_id: str, questions: str, answers: str, thread_id: Optional[str] = None,
+               bank: Optional[QuizBank] = None) -> Optional[QuizResult]:
+    """
+    Grades a quiz as shown to the student; None when none of its questions are
+    quiz-bank items this student can still be graded on (the LLM grades those).
+    """
+    ids = item_ids(questions)
+    if not ids:
+        return None
+    choices = parse_choices(answers, ids)
+    return grade(user_id, {item_id: choices.get(item_id) for item_id in ids}, thread_id, bank)
+
+
+# --- Narrative Feedback ---
+
+def feedback_prompt(user_name: str, questions: str, answers: str, result: Optional[QuizResult] = None) -> str:
+    prompt = (
+        f"The student {user_name} answered the following questions:\n"
+        f"{questions}\n"
+        f"With answers: {answers}.\n"
+    )
+    if result is not None:
+        prompt += f"They have already been graded:\n{result.to_text()}\n"
+    return prompt + "Provide encouraging feedback and suggestions for improvement."
+
+
+def request_narrative(result: QuizResult, user_name: str, questions: str, answers: str,
+                      bank: Optional[QuizBank] = None, api_key: Optional[str] = None) -> Future:
+    """
+    Writes LLM feedback for a graded quiz in the background, with `api_key`
+    (default: the environment's), and stores it with the submission.
+    """
+    bank = bank or get_quiz_bank()
+
+    def write():
+        response = scheduler.invoke(get_llm("feedback", api_key), feedback_prompt(user_name, questions, answers, result),
+                                    priority=BATCH)
+        bank.set_feedback(result.submission_id, response.content)
+        return response.content
+
+    # The worker runs in the caller's context, so the narrative is accounted to the same user, thread and tool.
+    return _narratives.submit(contextvars.copy_context().run, write)
@@ -3,10 +3,12 @@
 import pandas as pd
 import numpy as np
 import sqlite3
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from sklearn.metrics.pairwise import cosine_similarity
 
 from topic_meta import TOPICS, TOPIC_META
+from prereq_graph import PREREQ_GRAPH
+from sharding import map_shards
 
 # --- Configuration Block ---
 # Easily tunable weights for the baseline recommender's scoring function.
@@ -21,16 +23,15 @@ BASELINE_WEIGHTS = {
 
 def load_progress(db_path: str = "progress_data.db") -> pd.DataFrame:
     """
-    Loads user progress data from the SQLite database.
+    Loads user progress data from the SQLite database, reading all shards in parallel.
     Handles cold starts by returning an empty DataFrame if the table is missing.
     
     Time Complexity: O(N) where N is the number of rows in the progress table.
     Memory Complexity: O(N) to store the DataFrame.
     """
     try:
-        with sqlite3.connect(db_path) as conn:
-            df = pd.read_sql_query("SELECT * FROM student_progress", conn)
-        return df
+        frames = map_shards(db_path, lambda conn: pd.read_sql_query("SELECT * FROM student_progress", conn))
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
     except pd.errors.DatabaseError:
         # Handle case where the database or table doesn't exist yet
         return pd.DataFrame(columns=['user_id', 'course', 'topic', 'mastery_level'])
@@ -47,23 +48,21 @@ def compute_course_aggregates(progress_df: pd.DataFrame) -> Dict[str, float]:
         return {}
     return progress_df.groupby('course')['mastery_level'].mean().to_dict()
 
-def compute_prereq_factor(topic: str, user_mastery: Dict[str, int], mastery_threshold: int = 60) -> Tuple[float, List[str]]:
+def compute_prereq_factor(topic: str, user_mastery: Dict[str, int], mastery_threshold: int = 60,
+                          mastered: Optional[int] = None) -> Tuple[float, List[str]]:
     """
     Calculates a prerequisite factor. Returns 1.0 if all prerequisites are met,
     0.0 otherwise. Also returns the list of unmet prerequisites.
-    
-    Time Complexity: O(P) where P is the number of prerequisites for a topic.
+    `mastered` is the user's mastered-topic bitset from PREREQ_GRAPH.mastered_mask;
+    pass it when checking many topics for the same user.
+
+    Time Complexity: O(1) bitset check given `mastered`, O(U) to build it otherwise.
     """
-    meta = TOPIC_META.get(topic, {})
-    prereqs = meta.get("prerequisites", [])
-    if not prereqs:
+    if mastered is None:
+        mastered = PREREQ_GRAPH.mastered_mask(user_mastery, mastery_threshold)
+    if PREREQ_GRAPH.prerequisites_met(topic, mastered):
         return 1.0, []
-
-    unmet_prereqs = [
-        p for p in prereqs if user_mastery.get(p, 0) < mastery_threshold
-    ]
-    
-    return 0.0 if unmet_prereqs else 1.0, unmet_prereqs
+    return 0.0, PREREQ_GRAPH.unmet_prerequisites(topic, mastered)
 
 def suggest_target(mastery: int) -> int:
     """Suggests a reasonable next target mastery level."""
@@ -102,6 +101,7 @@ def baseline_recommend(user_id: str, all_progress_df: pd.DataFrame, top_k: int =
     user_progress = all_progress_df[all_progress_df['user_id'] == user_id]
     user_mastery = user_progress.set_index('topic')['mastery_level'].to_dict()
     course_mastery_agg = compute_course_aggregates(user_progress)
+    mastered = PREREQ_GRAPH.mastered_mask(user_mastery)
     
     recommendations = []
 
@@ -124,7 +124,7 @@ def baseline_recommend(user_id: str, all_progress_df: pd.DataFrame, top_k: int =
         course_mastery_score = 1 - (course_mastery / 100.0)
         
         # 3. Prerequisite Factor (binary: 1 if met, 0 if not)
-        prereq_met_factor, unmet_prereqs = compute_prereq_factor(topic, user_mastery)
+        prereq_met_factor, unmet_prereqs = compute_prereq_factor(topic, user_mastery, mastered=mastered)
         # We want to recommend topics whose prerequisites are met, so a factor of 0 should be penalized.
         # A simple way is to give a large negative score if unmet.
         prereq_unmet_penalty = (prereq_met_factor-1.0)*1000
@@ -0,0 +1,154 @@
+# reshard.py
+
+"""
+Moves the progress and chat-history databases to a different number of shards.
+
+Stop the app and the tracking workers first. Rows are copied into the new
+shard files with ATTACH + INSERT ... SELECT (per-user tables by user,
+checkpoints by thread owner). The new count is recorded in the catalog only
+after every copy has succeeded, and the old shard files are removed last, so an
+interrupted run leaves the old layout in place and can simply be re-run.
+
+Usage:
+    python reshard.py 4
+    python reshard.py 1 --db progress_data.db --chat-db chat_history.db
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import Callable, List
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoint_store import CHAT_HISTORY_DB_FILE
+from progress_store import PROGRESS_DB_FILE, get_progress_db_connection, setup_shard
+from sharding import (
+    MAX_SHARDS, SHARDED_TABLES, forget_shard_count, physical_shard, record_shard_count, shard_count, shard_paths,
+)
+from thread_store import DEFAULT_USER_ID
+
+
+def _remove_file(path: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _tables(conn: sqlite3.Connection, schema: str) -> List[str]:
+    return [row[0] for row in conn.execute(
+        f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    """Columns to copy; an INTEGER PRIMARY KEY id is left out so rows from several shards don't collide."""
+    return [
+        row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")
+        if not (row[1] == "id" and row[5] and row[2].upper() == "INTEGER")
+    ]
+
+
+def _copy(sources: List[str], targets: List[str], tables: Callable[[sqlite3.Connection], List[str]],
+          route: str, prepare: Callable[[sqlite3.Connection, str], None]) -> int:
+    """
+    Copies each source's rows into the target whose index `route` (an SQL
+    expression over the source row `t`) evaluates to. Returns rows copied.
+    """
+    copied = 0
+    for index, target in enumerate(targets):
+        conn = sqlite3.connect(target)
+        conn.execute("PRAGMA synchronous = OFF")
+        prepare(conn, target)
+        for source in sources:
+            conn.execute("ATTACH DATABASE ? AS src", (source,))
+            with conn:
+                for table in tables(conn):
+                    columns = ", ".join(_columns(conn, "src", table))
+                    cursor = conn.execute(
+                        f"INSERT OR REPLACE INTO main.{table} ({columns}) "
+                        f"SELECT {columns} FROM src.{table} AS t WHERE {route} = ?", (index,)
+                    )
+                    copied += cursor.rowcount
+            conn.execute("DETACH DATABASE src")
+        conn.close()
+    return copied
+
+
+def reshard(count: int, db_path: str = PROGRESS_DB_FILE, chat_db_path: str = CHAT_HISTORY_DB_FILE) -> bool:
+    """Re-lays out both databases over `count` shards. Returns False if they already have that many."""
+    old_count = shard_count(db_path)
+    if count == old_count:
+        return False
+    if not 1 <= count <= MAX_SHARDS:
+        raise ValueError(f"Shard count must be between 1 and {MAX_SHARDS}, got {count}")
+    old_progress, new_progress = shard_paths(db_path, old_count), shard_paths(db_path, count)
+    old_chat, new_chat = shard_paths(chat_db_path, old_count), shard_paths(chat_db_path, count)
+
+    for path in new_progress + new_chat:
+        if path != db_path and path not in old_progress + old_chat:
+            # Left over from an interrupted run.
+            _remove_file(path)
+
+    def prepare_progress(conn, target):
+        if target == db_path:
+            # The catalog becomes the only shard; drop any partial copy from an earlier run.
+            for table in SHARDED_TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+        setup_shard(target)
+        conn.create_function("target_shard", 1, lambda user_id: physical_shard(user_id, count), deterministic=True)
+
+    def progress_tables(conn):
+        return [table for table in SHARDED_TABLES if table in _tables(conn, "src")]
+
+    start = time.perf_counter()
+    rows = _copy(old_progress, new_progress, progress_tables, "target_shard(t.user_id)", prepare_progress)
+    print(f"Copied {rows} progress rows into {count} shard(s) in {time.perf_counter() - start:.1f} s")
+
+    catalog = get_progress_db_connection(db_path)
+    thread_shards = [(row[0], physical_shard(row[1], count)) for row in catalog.execute("SELECT thread_id, user_id FROM threads")]
+    catalog.close()
+
+    def prepare_chat(conn, target):
+        SqliteSaver(conn).setup()
+        conn.execute("CREATE TEMP TABLE thread_shards (thread_id TEXT PRIMARY KEY, shard INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO thread_shards VALUES (?, ?)", thread_shards)
+
+    def chat_tables(conn):
+        return [table for table in _tables(conn, "src") if "thread_id" in _columns(conn, "src", table)]
+
+    if any(os.path.exists(path) for path in old_chat):
+        start = time.perf_counter()
+        default_shard = physical_shard(DEFAULT_USER_ID, count)
+        rows = _copy(
+            [path for path in old_chat if os.path.exists(path)], new_chat, chat_tables,
+            f"COALESCE((SELECT shard FROM thread_shards WHERE thread_id = t.thread_id), {default_shard})",
+            prepare_chat,
+        )
+        print(f"Copied {rows} checkpoint rows into {count} shard(s) in {time.perf_counter() - start:.1f} s")
+
+    catalog = get_progress_db_connection(db_path)
+    with catalog:
+        record_shard_count(catalog, count, replace=True)
+        if old_count == 1:
+            # The catalog was the only shard; its per-user tables now live in the new shards.
+            for table in SHARDED_TABLES:
+                catalog.execute(f"DROP TABLE IF EXISTS {table}")
+    catalog.execute("VACUUM")
+    catalog.close()
+    forget_shard_count(db_path)
+    for path in old_progress + old_chat:
+        if path != db_path and path not in new_progress + new_chat:
+            _remove_file(path)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("shards", type=int, help="New number of shards (1 = single file)")
+    parser.add_argument("--db", default=PROGRESS_DB_FILE, help="Progress catalog database")
+    parser.add_argument("--chat-db", default=CHAT_HISTORY_DB_FILE, help="Chat history database")
+    args = parser.parse_args()
+    if not reshard(args.shards, args.db, args.chat_db):
+        print(f"{args.db} already has {args.shards} shard(s).")
@@ -0,0 +1,191 @@
+# review_scheduler.py
+
+"""
+Spaced-repetition review schedule (SM-2) kept next to `student_progress`.
+
+Every mastery change counts as a review of that topic: the new level is
+mapped to an SM-2 quality grade (0-5), which updates the topic's ease factor,
+interval and due time in `review_state`. Only catalog topics (TOPIC_META) are
+scheduled; placeholder labels such as General/General are not reviewable.
+The table lives in each user's shard and is written by a progress listener,
+in the same transaction as the progress row.
+
+`review_state` is indexed on (user_id, due_at) and on due_at, so "what is due
+now for this student" and "everything due in the next hour" are index range
+scans, already in due order; the cross-shard query merges the per-shard
+results like a priority queue.
+"""
+
+import heapq
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sharding import map_shards
+from topic_meta import TOPIC_META
+
+# --- Configuration Block ---
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASSING_QUALITY = 3         # SM-2 grades below this restart the repetition sequence.
+FIRST_INTERVALS = [1, 6]    # Days until the first and second review after a pass.
+DAY_SECONDS = 86400
+
+_KEY = Tuple[str, str, str]
+
+
+def setup_review_state(conn: sqlite3.Connection):
+    """Creates the review table and its due-date indexes, seeding it from existing progress when new."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'review_state'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_state (
+            user_id TEXT NOT NULL,
+            course TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            ease REAL NOT NULL,
+            interval_days REAL NOT NULL,
+            repetitions INTEGER NOT NULL,
+            last_level REAL NOT NULL,
+            reviewed_at REAL NOT NULL,
+            due_at REAL NOT NULL,
+            PRIMARY KEY (user_id, course, topic)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_state_user_due ON review_state (user_id, due_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_state_due ON review_state (due_at)")
+    if not exists:
+        seed_review_state(conn)
+    else:
+        # Schedules for placeholder topics written before they were excluded.
+        conn.execute(f"DELETE FROM review_state WHERE topic NOT IN ({_catalog_placeholders()})", list(TOPIC_META))
+
+
+def _catalog_placeholders() -> str:
+    return ",".join("?" * len(TOPIC_META))
+
+
+def seed_review_state(conn: sqlite3.Connection, now: Optional[float] = None):
+    """
+    Gives every catalog-topic progress row without a schedule one: passing
+    topics count as reviewed once and are due in a day, the rest are due now.
+    """
+    now = time.time() if now is None else now
+    conn.execute(f"""
+        INSERT OR IGNORE INTO review_state
+        (user_id, course, topic, ease, interval_days, repetitions, last_level, reviewed_at, due_at)
+        SELECT user_id, course, topic, ?, 1,
+               CASE WHEN mastery_level >= ? THEN 1 ELSE 0 END,
+               mastery_level, ?,
+               ? + CASE WHEN mastery_level >= ? THEN {FIRST_INTERVALS[0] * DAY_SECONDS} ELSE 0 END
+        FROM student_progress WHERE topic IN ({_catalog_placeholders()})
+    """, (DEFAULT_EASE, quality_level(PASSING_QUALITY), now, now, quality_level(PASSING_QUALITY), *TOPIC_META))
+
+
+def quality(level: float) -> float:
+    """SM-2 grade for a mastery level: 0-100 maps linearly onto 0-5."""
+    return max(0.0, min(5.0, level / 20.0))
+
+
+def quality_level(grade: float) -> float:
+    return grade * 20.0
+
+
+def next_review(state: Optional[Dict], level: float, reviewed_at: float) -> Dict:
+    """
+    SM-2 step: the new schedule after a review at `level`.
+
+    Time Complexity: O(1)
+    """
+    ease = state["ease"] if state else DEFAULT_EASE
+    repetitions = state["repetitions"] if state else 0
+    interval = state["interval_days"] if state else 0.0
+    grade = quality(level)
+    if grade >= PASSING_QUALITY:
+        interval = FIRST_INTERVALS[repetitions] if repetitions < len(FIRST_INTERVALS) else interval * ease
+        repetitions += 1
+    else:
+        interval, repetitions = FIRST_INTERVALS[0], 0
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    return {
+        "ease": ease, "interval_days": interval, "repetitions": repetitions, "last_level": level,
+        "reviewed_at": reviewed_at, "due_at": reviewed_at + interval * DAY_SECONDS,
+    }
+
+
+def record_review_events(conn: sqlite3.Connection, events: List[Dict]):
+    """
+    Progress listener: advances the schedule of every catalog topic in
+    `events`, in order, inside the caller's transaction.
+
+    Time Complexity: O(E log R) for E events against R scheduled topics.
+    """
+    if not events:
+        return
+    states: Dict[_KEY, Optional[Dict]] = {}
+    for event in events:
+        if event["topic"] not in TOPIC_META:
+            continue
+        key = (event["user_id"], event["course"], event["topic"])
+        if key not in states:
+            row = conn.execute(
+                "SELECT ease, interval_days, repetitions FROM review_state WHERE user_id = ? AND course = ? AND topic = ?",
+                key,
+            ).fetchone()
+            states[key] = dict(zip(("ease", "interval_days", "repetitions"), row)) if row else None
+        states[key] = next_review(states[key], event["new_level"], event["recorded_at"])
+    conn.executemany("""
+        INSERT INTO review_state
+        (user_id, course, topic, ease, interval_days, repetitions, last_level, reviewed_at, due_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, course, topic) DO UPDATE SET
+            ease = excluded.ease, interval_days = excluded.interval_days, repetitions = excluded.repetitions,
+            last_level = excluded.last_level, reviewed_at = excluded.reviewed_at, due_at = excluded.due_at
+    """, [key + (s["ease"], s["interval_days"], s["repetitions"], s["last_level"], s["reviewed_at"], s["due_at"])
+          for key, s in states.items()])
+
+
+# --- Queries ---
+
+_COLUMNS = "user_id, course, topic, last_level, repetitions, interval_days, due_at"
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[Dict]:
+    names = [d[0] for d in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def due_reviews(conn: sqlite3.Connection, user_id: str, until: Optional[float] = None,
+                limit: Optional[int] = None) -> List[Dict]:
+    """
+    A student's topics due by `until` (default: now), most overdue first.
+    Pass the student's shard connection.
+
+    Time Complexity: O(log R + k) via idx_review_state_user_due.
+    """
+    until = time.time() if until is None else until
+    cursor = conn.execute(
+        f"SELECT {_COLUMNS} FROM review_state WHERE user_id = ? AND due_at <= ? ORDER BY due_at LIMIT ?",
+        (user_id, until, -1 if limit is None else limit),
+    )
+    return _rows(cursor)
+
+
+def reviews_due_between(conn: sqlite3.Connection, start: float, end: float) -> List[Dict]:
+    """Every student's reviews falling due in [start, end), in due order (idx_review_state_due)."""
+    cursor = conn.execute(
+        f"SELECT {_COLUMNS} FROM review_state WHERE due_at >= ? AND due_at < ? ORDER BY due_at",
+        (start, end),
+    )
+    return _rows(cursor)
+
+
+def upcoming_reviews(catalog_path: str, within_seconds: float, now: Optional[float] = None,
+                     include_overdue: bool = True) -> List[Dict]:
+    """
+    Reviews due in the next `within_seconds` across all shards (and, by
+    default, those already overdue), merged into one due-ordered list.
+    """
+    now = time.time() if now is None else now
+    start = 0.0 if include_overdue else now
+    per_shard = map_shards(catalog_path, lambda conn: reviews_due_between(conn, start, now + within_seconds))
+    return list(heapq.merge(*per_shard, key=lambda row: row["due_at"]))
@@ -0,0 +1,153 @@
+# sharding.py
+
+"""
+Sharded layout of the progress and chat-history databases.
+
+Per-user tables (progress, mastery history, topic labels, and the chat
+checkpoints) can be split across N SQLite files by hashed user id, so writes
+for different users commit to different files instead of queueing on one
+write lock. Shared tables (thread owners, the tracking queue, worker status)
+stay in the catalog: the `progress_data.db` path every caller already uses.
+
+With one shard (the default) the catalog is also the only shard, which is the
+original single-file layout. The shard count is recorded in the catalog when
+it is created; AI_TUTOR_PROGRESS_SHARDS only applies to new databases, and
+`python reshard.py N` moves an existing one.
+
+Users hash into SHARDS virtual shards (`shard_of`, stored with every thread and
+queued item); a user's physical shard is its virtual shard % N.
+"""
+
+import os
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, TypeVar
+
+# --- Configuration Block ---
+SHARDS = 1024
+MAX_SHARDS = 10  # SQLite's default attach limit; fan-out reads attach every shard.
+DEFAULT_SHARD_COUNT = int(os.getenv("AI_TUTOR_PROGRESS_SHARDS", "1"))
+
+# Tables keyed by user that live in the shards. Modules that add per-user
+# tables register them so fan-out reads can see them.
+SHARDED_TABLES: List[str] = ["student_progress", "thread_topics", "mastery_events", "mastery_daily", "review_state"]
+
+T = TypeVar("T")
+_counts: Dict[str, int] = {}
+
+
+def register_sharded_table(name: str):
+    if name not in SHARDED_TABLES:
+        SHARDED_TABLES.append(name)
+
+
+def shard_of(user_id: str) -> int:
+    """Stable virtual shard of a user; all of a user's rows and threads share it."""
+    return zlib.crc32(user_id.encode("utf-8")) % SHARDS
+
+
+def physical_shard(user_id: str, count: int) -> int:
+    return shard_of(user_id) % count
+
+
+def shard_path(db_path: str, index: int, count: int) -> str:
+    """progress_data.db -> progress_data.shard2of4.db; the path itself with one shard."""
+    if count == 1:
+        return db_path
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.shard{index}of{count}{ext}"
+
+
+def shard_paths(db_path: str, count: int) -> List[str]:
+    return [shard_path(db_path, i, count) for i in range(count)]
+
+
+# --- Shard Count ---
+
+def shard_count(catalog_path: str) -> int:
+    """
+    Shard count recorded in the catalog. A catalog from before sharding has
+    one; one that does not exist yet gets DEFAULT_SHARD_COUNT when created.
+    """
+    key = os.path.abspath(catalog_path)
+    if key in _counts:
+        return _counts[key]
+    if not os.path.exists(catalog_path):
+        return DEFAULT_SHARD_COUNT
+    conn = sqlite3.connect(catalog_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "storage_config" not in tables:
+            return 1 if "student_progress" in tables else DEFAULT_SHARD_COUNT
+        row = conn.execute("SELECT value FROM storage_config WHERE key = 'progress_shards'").fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return DEFAULT_SHARD_COUNT
+    _counts[key] = int(row[0])
+    return _counts[key]
+
+
+def record_shard_count(conn: sqlite3.Connection, count: int, replace: bool = False):
+    """Stores the shard count in a catalog connection (first writer wins unless `replace`)."""
+    if not 1 <= count <= MAX_SHARDS:
+        raise ValueError(f"Shard count must be between 1 and {MAX_SHARDS}, got {count}")
+    conn.execute("CREATE TABLE IF NOT EXISTS storage_config (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    conn.execute(f"{verb} INTO storage_config (key, value) VALUES ('progress_shards', ?)", (str(count),))
+
+
+def forget_shard_count(catalog_path: str):
+    """Drops the cached count after the catalog has been changed (see reshard.py)."""
+    _counts.pop(os.path.abspath(catalog_path), None)
+
+
+def user_db_path(catalog_path: str, user_id: str) -> str:
+    count = shard_count(catalog_path)
+    return shard_path(catalog_path, physical_shard(user_id, count), count)
+
+
+# --- Fan-out ---
+
+def attach_shards(conn: sqlite3.Connection, catalog_path: str):
+    """
+    Makes a catalog connection read across all shards: each shard is attached
+    and every sharded table is replaced by a temporary UNION ALL view, so
+    existing queries (filters, GROUP BY, ORDER BY) run over all users.
+    SQLite pushes WHERE clauses down into each shard's part of the view.
+    """
+    count = shard_count(catalog_path)
+    if count == 1:
+        return conn
+    for i, path in enumerate(shard_paths(catalog_path, count)):
+        conn.execute(f"ATTACH DATABASE ? AS shard{i}", (path,))
+    existing = set.intersection(*(
+        {name for (name,) in conn.execute(f"SELECT name FROM shard{i}.sqlite_master WHERE type = 'table'")}
+        for i in range(count)
+    ))
+    for table in SHARDED_TABLES:
+        if table in existing:
+            union = " UNION ALL ".join(f"SELECT * FROM shard{i}.{table}" for i in range(count))
+            conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+    return conn
+
+
+def map_shards(catalog_path: str, fn: Callable[[sqlite3.Connection], T]) -> List[T]:
+    """
+    Runs fn(conn) against every shard concurrently (sqlite3 releases the GIL
+    while a query runs) and returns the results in shard order.
+    """
+    paths = shard_paths(catalog_path, shard_count(catalog_path))
+
+    def run(path):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            return fn(conn)
+        finally:
+            conn.close()
+
+    if len(paths) == 1:
+        return [run(paths[0])]
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        return list(pool.map(run, paths))
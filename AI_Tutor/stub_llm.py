@@ -0,0 +1,285 @@
+# stub_llm.py
+
+"""
+Deterministic local stand-ins for the Gemini clients used by the app.
+
+`install_stubs()` swaps `langchain_google_genai.ChatGoogleGenerativeAI` and
+`google.genai.Client` for the fakes below. It must run before `graph_factory`
+or `progress_tracker` are imported, because both build their clients at import
+time. Responses are derived from a hash of the prompt, so the same input always
+produces the same output, tool call and simulated latency.
+"""
+
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from topic_meta import TOPICS
+
+_WORDS = (
+    "the student learns each concept step by step with clear examples and a short "
+    "summary so that the idea becomes simple to apply in practice problems"
+).split()
+
+
+# --- Latency and Token-Size Models ---
+
+@dataclass
+class LatencyModel:
+    """Simulated request latency: a fixed cost plus a cost per generated token."""
+    base_ms: float = 0.0
+    per_token_ms: float = 0.0
+    jitter: float = 0.0  # Fractional +/- noise applied to the total.
+
+    def seconds(self, output_tokens: int, rng: random.Random) -> float:
+        total_ms = self.base_ms + self.per_token_ms * output_tokens
+        if self.jitter:
+            total_ms *= 1 + rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, total_ms) / 1000.0
+
+
+@dataclass
+class TokenModel:
+    """Simulated response size, in whitespace-separated tokens."""
+    mean_tokens: int = 120
+    spread: float = 0.25
+
+    def sample(self, rng: random.Random) -> int:
+        low = int(self.mean_tokens * (1 - self.spread))
+        high = int(self.mean_tokens * (1 + self.spread))
+        return max(1, rng.randint(low, max(low, high)))
+
+
+def _seeded_rng(*parts: Any) -> random.Random:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def _filler_text(n_tokens: int, rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n_tokens))
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        return " ".join(part if isinstance(part, str) else str(part.get("text", "")) for part in content)
+    return str(content)
+
+
+# --- Canned Responses for Known Prompts ---
+
+def _guess_topic(text: str) -> tuple:
+    """Picks the course/topic whose name appears in the text, like the tracker prompt expects."""
+    lowered = text.lower()
+    for course, course_topics in TOPICS.items():
+        for topic in course_topics:
+            if topic.lower() in lowered:
+                return course, topic
+    return "General", "General"
+
+
+def _respond_to_prompt(prompt: str, rng: random.Random, tokens: TokenModel) -> str:
+    # identify_course_topic: the conversation sits between the last pair of --- fences.
+    if "Return ONLY a valid JSON object" in prompt:
+        conversation = prompt.split("---")[-2] if prompt.count("---") >= 2 else prompt
+        course, topic = _guess_topic(conversation)
+        return json.dumps({"course": course, "topic": topic})
+    # evaluate_mastery: answer with a nudge from the previous level.
+    if "single floating-point number" in prompt:
+        match = re.search(r"previous mastery level was ([0-9.]+)", prompt)
+        previous = float(match.group(1)) if match else 0.0
+        return f"{min(100.0, previous + rng.uniform(0, 15)):.2f}"
+    # Quiz bank: a JSON array of multiple-choice items.
+    if "multiple-choice questions" in prompt and "JSON array" in prompt:
+        match = re.search(r"Generate exactly (\d+)", prompt)
+        _, topic = _guess_topic(prompt.split("Return ONLY")[0])
+        return json.dumps([{
+            "question": f"Which statement about {topic} is correct: {_filler_text(8, rng)}?",
+            "options": [_filler_text(4, rng) for _ in range(4)],
+            "answer": rng.choice("ABCD"),
+            "difficulty": rng.randint(1, 5),
+            "explanation": _filler_text(10, rng),
+        } for _ in range(int(match.group(1)) if match else 5)])
+    return _filler_text(tokens.sample(rng), rng)
+
+
+# --- Chat Model Stub ---
+
+class StubChatModel(BaseChatModel):
+    """
+    Drop-in fake for `ChatGoogleGenerativeAI`.
+
+    Supports `invoke`, `stream` and `bind_tools`. When tools are bound and the
+    last message is from the user, it requests a tool call for `tool_call_rate`
+    of prompts (decided by prompt hash), then answers once the tool result is in.
+    """
+
+    model: str = "gemini-2.5-flash"
+    latency: LatencyModel = LatencyModel()
+    tokens: TokenModel = TokenModel()
+    tool_call_rate: float = 0.5
+    stream_chunk_tokens: int = 8
+
+    model_config = {"arbitrary_types_allowed": True, "extra": "ignore"}
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _build_message(self, messages: List[BaseMessage], tools: Optional[list]) -> AIMessage:
+        prompt = "\n".join(_message_text(m) for m in messages)
+        rng = _seeded_rng(self.model, prompt)
+        input_tokens = _count_tokens(prompt)
+
+        if tools and isinstance(messages[-1], HumanMessage) and rng.random() < self.tool_call_rate:
+            spec = next((t for t in tools if t["function"]["name"] == "explain_text"), tools[0])
+            args = {}
+            for name, schema in spec["function"].get("parameters", {}).get("properties", {}).items():
+                if schema.get("type") == "integer":
+                    args[name] = 3
+                elif schema.get("type") == "number":
+                    args[name] = 0.0
+                else:
+                    args[name] = _message_text(messages[-1])[:200]
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": spec["function"]["name"], "args": args, "id": str(uuid.UUID(int=rng.getrandbits(128)))}],
+            )
+            output_tokens = 10
+        else:
+            message = AIMessage(content=_respond_to_prompt(prompt, rng, self.tokens))
+            output_tokens = _count_tokens(message.content)
+
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        message.response_metadata = {"model_name": self.model, "simulated_latency_s": self.latency.seconds(output_tokens, rng)}
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._build_message(messages, kwargs.get("tools"))
+        time.sleep(message.response_metadata["simulated_latency_s"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._build_message(messages, kwargs.get("tools"))
+        delay = message.response_metadata["simulated_latency_s"]
+        if message.tool_calls:
+            time.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                    for i, tc in enumerate(message.tool_calls)
+                ],
+                usage_metadata=message.usage_metadata,
+            ))
+            return
+
+        words = message.content.split(" ")
+        step = max(1, self.stream_chunk_tokens)
+        pieces = [" ".join(words[i:i + step]) + (" " if i + step < len(words) else "") for i in range(0, len(words), step)]
+        for i, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=piece,
+                usage_metadata=message.usage_metadata if i == len(pieces) - 1 else None,
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+# --- google.genai Client Stub ---
+
+class _StubUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class _StubGenerateResponse:
+    def __init__(self, text: str, usage: _StubUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class _StubModels:
+    def __init__(self, client: "StubGenaiClient"):
+        self._client = client
+
+    def generate_content(self, model: str, contents: list, **kwargs) -> _StubGenerateResponse:
+        # Images are keyed by size and mode rather than pixels to keep hashing cheap.
+        key = [model] + [
+            getattr(c, "size", None) and f"{c.size}:{getattr(c, 'mode', '')}" or str(c) for c in contents
+        ]
+        rng = _seeded_rng(*key)
+        text = _filler_text(self._client.tokens.sample(rng), rng)
+        time.sleep(self._client.latency.seconds(_count_tokens(text), rng))
+        return _StubGenerateResponse(text, _StubUsage(258 * len(contents), _count_tokens(text)))
+
+
+class StubGenaiClient:
+    """Drop-in fake for `google.genai.Client`; only `models.generate_content` is used by the app."""
+
+    latency = LatencyModel()
+    tokens = TokenModel()
+
+    def __init__(self, *args, **kwargs):
+        self.models = _StubModels(self)
+
+
+# --- Installation ---
+
+def install_stubs(
+    latency: Optional[LatencyModel] = None,
+    tokens: Optional[TokenModel] = None,
+    tool_call_rate: float = 0.5,
+) -> Dict[str, Any]:
+    """
+    Replaces the Gemini client classes with the stubs, configured with the given models.
+    Returns the original classes so callers can restore them.
+    """
+    import langchain_google_genai
+    from google import genai
+
+    latency = latency or LatencyModel()
+    tokens = tokens or TokenModel()
+
+    class ConfiguredStubChatModel(StubChatModel):
+        def __init__(self, **kwargs):
+            kwargs.setdefault("latency", latency)
+            kwargs.setdefault("tokens", tokens)
+            kwargs.setdefault("tool_call_rate", tool_call_rate)
+            super().__init__(**kwargs)
+
+    StubGenaiClient.latency = latency
+    StubGenaiClient.tokens = tokens
+
+    originals = {
+        "ChatGoogleGenerativeAI": langchain_google_genai.ChatGoogleGenerativeAI,
+        "Client": genai.Client,
+    }
+    langchain_google_genai.ChatGoogleGenerativeAI = ConfiguredStubChatModel
+    genai.Client = StubGenaiClient
+    return originals
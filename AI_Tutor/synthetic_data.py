@@ -0,0 +1,299 @@
+# synthetic_data.py
+
+"""
+Generates synthetic `progress_data.db` and `chat_history.db` files (students,
+owned conversations and a tracking backlog) for benchmarks and load tests
+without real students.
+
+Students work through the catalog along `topic_meta` prerequisites: a topic is
+only studied once its prerequisites are mastered, and mastery levels come from
+a per-student ability. Rows are written in batched transactions, and each stage
+reports its throughput, so databases with 10^5-10^6 progress rows can be built
+in seconds.
+
+Usage:
+    python synthetic_data.py --users 100000 --topics-per-user 8 --history-days 30 \\
+        --threads 20000 --backlog 5000 --workdir /tmp/load
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import MessagesState, START, StateGraph
+
+from leaderboard import LEADERBOARD_DB_FILE, get_leaderboard
+from mastery_history import record_mastery_events
+from review_scheduler import record_review_events, seed_review_state
+from prereq_graph import MASTERY_THRESHOLD, PREREQ_GRAPH
+from checkpoint_store import checkpoint_paths
+from progress_store import PROGRESS_DB_FILE, setup_database
+from sharding import physical_shard, shard_count, shard_paths
+from thread_store import DEFAULT_USER_ID, register_threads
+from topic_meta import TOPICS
+from untracked_threads import enqueue_threads
+
+ALL_TOPICS = [(course, topic) for course, course_topics in TOPICS.items() for topic in course_topics]
+DISTRIBUTIONS = ["skill", "uniform"]
+DEFAULT_BATCH_SIZE = 10000
+
+_QUESTIONS = [
+    "Can you explain {topic} step by step?",
+    "I am stuck on a {topic} problem, where do I start?",
+    "What is the most important idea in {topic}?",
+    "Give me an example from {topic} please.",
+]
+_ANSWERS = [
+    "Sure! In {topic} the key idea is to break the problem into small parts.",
+    "Let's look at {topic} with a simple example first.",
+    "Good question. {topic} builds on what you already know.",
+]
+
+
+def user_ids(n_users: int) -> List[str]:
+    return [f"user{i:06d}" for i in range(n_users)]
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _report(label: str, count: int, elapsed: float):
+    print(f"{label:<22} {count:>10} rows  {elapsed:8.2f} s  {count / max(elapsed, 1e-9):>12.0f} rows/s")
+
+
+def _fast_load(conn: sqlite3.Connection):
+    # Bulk loads are reproducible from the seed, so durability is traded for speed.
+    conn.execute("PRAGMA synchronous = OFF")
+
+
+# --- Progress Database ---
+
+def synthetic_mastery(rng: random.Random, topics_per_user: int,
+                      distribution: str = "skill") -> List[Tuple[str, str, float]]:
+    """
+    (course, topic, mastery_level) rows for one student who studies topics from
+    their unlock frontier: a topic is only picked once its prerequisites are
+    mastered. With "skill", levels scatter around a per-student ability; with
+    "uniform", they are uniform in [0, 100].
+    """
+    ability = 30 + rng.betavariate(2, 2) * 70
+    mastered, studied, rows = 0, 0, []
+    while len(rows) < topics_per_user:
+        frontier = [t for t in PREREQ_GRAPH.frontier(mastered) if not studied >> PREREQ_GRAPH.index[t] & 1]
+        if not frontier:
+            break
+        # Students tend to build on what they just mastered rather than start a new subject.
+        unlocked = [t for t in frontier if PREREQ_GRAPH.parents[PREREQ_GRAPH.index[t]]]
+        topic = rng.choice(unlocked if unlocked and rng.random() < 0.6 else frontier)
+        if distribution == "uniform":
+            level = rng.uniform(0, 100)
+        else:
+            level = min(100.0, max(0.0, rng.gauss(ability, 15)))
+        bit = 1 << PREREQ_GRAPH.index[topic]
+        studied |= bit
+        if level >= MASTERY_THRESHOLD:
+            mastered |= bit
+        rows.append((PREREQ_GRAPH.courses[topic], topic, round(level, 2)))
+    return rows
+
+
+def synthetic_progress_rows(n_users: int, topics_per_user: int = 8, seed: int = 0,
+                            distribution: str = "skill") -> Iterator[Tuple[str, str, str, float]]:
+    rng = random.Random(seed)
+    for user_id in user_ids(n_users):
+        for course, topic, level in synthetic_mastery(rng, min(topics_per_user, len(ALL_TOPICS)), distribution):
+            yield user_id, course, topic, level
+
+
+def synthetic_history(rng: random.Random, row: Tuple[str, str, str, float], days: int, now: float) -> List[Dict]:
+    """1-4 mastery events rising to the row's final level, spread over the last `days` days."""
+    user_id, course, topic, final = row
+    n_events = rng.randint(1, 4)
+    times = sorted(now - rng.uniform(0, days * 86400) for _ in range(n_events))
+    levels = sorted(round(rng.uniform(0, final), 2) for _ in range(n_events - 1)) + [final]
+    events, old_level = [], None
+    for recorded_at, level in zip(times, levels):
+        events.append({
+            "user_id": user_id, "course": course, "topic": topic, "old_level": old_level,
+            "new_level": level, "thread_id": None, "recorded_at": recorded_at,
+        })
+        old_level = level
+    return events
+
+
+def generate_progress_db(db_path: str, n_users: int, topics_per_user: int = 8, seed: int = 0,
+                         distribution: str = "skill", history_days: int = 0,
+                         batch_size: int = DEFAULT_BATCH_SIZE, verbose: bool = False) -> int:
+    """
+    Fills `student_progress` and the review schedule (and, with `history_days`,
+    the mastery history and rollups) in transactions of `batch_size` rows, each
+    row in its user's shard, then rebuilds the leaderboard. Returns the number
+    of progress rows.
+    """
+    setup_database(db_path)
+    count = shard_count(db_path)
+    rng = random.Random(seed + 1)
+    now = time.time()
+    conns = [sqlite3.connect(path) for path in shard_paths(db_path, count)]
+    for conn in conns:
+        _fast_load(conn)
+    total, events_total = 0, 0
+    start = time.perf_counter()
+    for batch in _batches(synthetic_progress_rows(n_users, topics_per_user, seed, distribution), batch_size):
+        by_shard = defaultdict(list)
+        for row in batch:
+            by_shard[physical_shard(row[0], count)].append(row)
+        for shard, rows in by_shard.items():
+            conn = conns[shard]
+            with conn:
+                conn.executemany("""
+                    INSERT INTO student_progress (user_id, course, topic, mastery_level)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id, course, topic) DO UPDATE SET
+                    mastery_level = excluded.mastery_level
+                """, rows)
+                if history_days:
+                    events = [event for row in rows for event in synthetic_history(rng, row, history_days, now)]
+                    # The daily rollup folds events in order.
+                    events.sort(key=lambda e: e["recorded_at"])
+                    record_mastery_events(conn, events)
+                    record_review_events(conn, events)
+                    events_total += len(events)
+        total += len(batch)
+    for conn in conns:
+        # Rows without history get a starting review schedule.
+        with conn:
+            seed_review_state(conn)
+        conn.close()
+    if verbose:
+        _report("student_progress", total, time.perf_counter() - start)
+        if history_days:
+            _report("  + mastery_events", events_total, time.perf_counter() - start)
+    # Bulk rows bypass the progress listeners, so the leaderboard next to the database is rebuilt.
+    start = time.perf_counter()
+    scores = get_leaderboard(os.path.join(os.path.dirname(db_path), LEADERBOARD_DB_FILE)).rebuild(db_path)
+    if verbose:
+        _report("leaderboard", scores, time.perf_counter() - start)
+    return total
+
+
+# --- Chat History Database ---
+
+class _ChatState(MessagesState):
+    image_path: str
+
+
+def _checkpoint_writer(conn: sqlite3.Connection):
+    """A no-op graph with the tutor's state schema, used only to write checkpoints."""
+    builder = StateGraph(_ChatState)
+    builder.add_node("assistant", lambda state: {})
+    builder.add_edge(START, "assistant")
+    return builder.compile(checkpointer=SqliteSaver(conn))
+
+
+def synthetic_conversation(rng: random.Random, turns: int) -> List:
+    course, topic = rng.choice(ALL_TOPICS)
+    messages = []
+    for _ in range(turns):
+        messages.append(HumanMessage(content=f"user_input: {rng.choice(_QUESTIONS).format(topic=topic)}"))
+        messages.append(AIMessage(content=rng.choice(_ANSWERS).format(topic=topic)))
+    return messages
+
+
+def generate_chat_history_db(db_path: str, n_threads: int, turns: int = 3, seed: int = 0,
+                             verbose: bool = False, users: Optional[List[str]] = None,
+                             progress_db_path: str = PROGRESS_DB_FILE) -> Dict[str, str]:
+    """
+    Writes `n_threads` conversations as tutor-graph checkpoints, each owned by a
+    random one of `users` (DEFAULT_USER_ID by default) and stored in the owner's
+    checkpoint shard. Owners are registered in `progress_db_path`.
+    Returns {thread_id: owner} in creation order.
+    """
+    rng = random.Random(seed)
+    users = users or [DEFAULT_USER_ID]
+    paths = checkpoint_paths(db_path, progress_db_path)
+    conns = [sqlite3.connect(path, check_same_thread=False) for path in paths]
+    for conn in conns:
+        _fast_load(conn)
+    writers = [_checkpoint_writer(conn) for conn in conns]
+    owners = {}
+    start = time.perf_counter()
+    for _ in range(n_threads):
+        thread_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        owner = rng.choice(users)
+        writers[physical_shard(owner, len(paths))].update_state(
+            {"configurable": {"thread_id": thread_id}},
+            {"messages": synthetic_conversation(rng, turns), "image_path": "No image uploaded"},
+            as_node="assistant",
+        )
+        owners[thread_id] = owner
+    for conn in conns:
+        conn.close()
+    register_threads(owners.items(), progress_db_path)
+    if verbose:
+        _report("checkpoints", n_threads, time.perf_counter() - start)
+    return owners
+
+
+# --- Tracking Backlog ---
+
+def write_untracked_threads(db_path: str, owners: Dict[str, str], max_age_seconds: float = 0, seed: int = 0):
+    """
+    Queues threads for the tracker under their owners. With `max_age_seconds`,
+    each thread's last activity is spread over that window so only some are
+    past the worker's idle time; otherwise all are immediately idle.
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    enqueue_threads(
+        [(tid, user_id, now - rng.uniform(0, max_age_seconds) if max_age_seconds else 0.0)
+         for tid, user_id in owners.items()],
+        db_path,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--topics-per-user", type=int, default=8)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="skill")
+    parser.add_argument("--history-days", type=int, default=0, help="Also write mastery history spread over this many days")
+    parser.add_argument("--threads", type=int, default=1000, help="Conversations in chat_history.db")
+    parser.add_argument("--turns", type=int, default=3, help="Question/answer pairs per conversation")
+    parser.add_argument("--backlog", type=int, default=0, help="Threads queued for the progress tracker")
+    parser.add_argument("--backlog-max-age", type=float, default=3600, help="Spread of queued threads' last activity, seconds")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per transaction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=".", help="Directory for the generated files")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    progress_db = os.path.join(args.workdir, "progress_data.db")
+    generate_progress_db(
+        progress_db, args.users, args.topics_per_user, args.seed,
+        args.distribution, args.history_days, args.batch_size, verbose=True,
+    )
+    owners = generate_chat_history_db(
+        os.path.join(args.workdir, "chat_history.db"), args.threads, args.turns, args.seed, verbose=True,
+        users=user_ids(args.users), progress_db_path=progress_db,
+    ) if args.threads else {}
+    if args.backlog:
+        write_untracked_threads(
+            progress_db, dict(list(owners.items())[:args.backlog]), args.backlog_max_age, args.seed,
+        )
+        print(f"{'tracking_queue':<22} {min(args.backlog, len(owners)):>10} threads queued")
@@ -0,0 +1,37 @@
+# conftest.py
+
+"""
+Shared fixtures. The app's modules are flat and open their databases relative
+to the working directory, so every test runs in its own temporary directory.
+
+Run from AI_Tutor/ (from the repository root, the legacy streamlit.py would
+shadow the streamlit package):
+    python -m pytest tests -q
+"""
+
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+def pytest_configure(config):
+    """No test talks to Gemini: the stubs go in before any test module imports the app (see stub_llm.py)."""
+    from stub_llm import install_stubs
+    install_stubs()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A fresh working directory with an empty, single-file progress database."""
+    import sharding
+    from progress_store import setup_database
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sharding, "DEFAULT_SHARD_COUNT", 1)
+    setup_database()
+    return tmp_path
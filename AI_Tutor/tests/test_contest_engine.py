@@ -0,0 +1,126 @@
+import sqlite3
+import time
+
+import pytest
+
+from contest_engine import ContestEngine, ContestError, _BatchWriter
+from quiz_bank import QuizBank, QuizItem
+from topic_meta import TOPICS
+
+COURSE = next(iter(TOPICS))
+TOPIC = TOPICS[COURSE][0]
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = QuizBank(str(tmp_path / "quiz_bank.db"))
+    bank.add_items([QuizItem(COURSE, TOPIC, 3, f"Question {i}?", ["a", "b", "c", "d"], i % 4) for i in range(5)])
+    return bank
+
+
+@pytest.fixture
+def engine(tmp_path, bank):
+    return ContestEngine(str(tmp_path / "contest.db"), bank)
+
+
+def answer_key(contest):
+    return {item.id: item.answer for item in contest.items}
+
+
+def test_a_failing_write_only_fails_its_own_caller(tmp_path):
+    db_path = str(tmp_path / "writer.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE t (x INTEGER PRIMARY KEY)")
+    conn.close()
+    writer = _BatchWriter(db_path)
+
+    ops = [writer.enqueue("INSERT INTO t VALUES (?)", (i,)) for i in range(3)]
+    ops.append(writer.enqueue(None, ()))  # Not an sqlite3.Error: TypeError.
+    ops.append(writer.enqueue("INSERT INTO t VALUES (?)", (0,)))  # Duplicate key.
+    assert [writer.wait(op) for op in ops[:3]] == [1, 1, 1]
+    with pytest.raises(TypeError):
+        writer.wait(ops[3])
+    with pytest.raises(sqlite3.IntegrityError):
+        writer.wait(ops[4])
+
+    # The writer is still running.
+    assert writer.write("INSERT INTO t VALUES (?)", (9,)) == 1
+    conn = sqlite3.connect(db_path)
+    assert [row[0] for row in conn.execute("SELECT x FROM t ORDER BY x")] == [0, 1, 2, 9]
+    conn.close()
+
+
+def test_submission_is_graded_once(engine):
+    contest = engine.open_contest(COURSE, TOPIC, n_questions=4)
+    engine.start(contest.id, "alice")
+    choices = answer_key(contest)
+    choices[contest.items[0].id] = (contest.items[0].answer + 1) % 4
+    result = engine.submit(contest.id, "alice", choices)
+
+    assert (result.score, result.total, result.rank) == (3, 4, 1)
+    assert result.correct == [False, True, True, True]
+    with pytest.raises(ContestError, match="already been submitted"):
+        engine.submit(contest.id, "alice", answer_key(contest))
+    assert engine.history("alice")[0]["correct"] == result.correct
+
+
+def test_submitting_requires_a_started_attempt(engine):
+    contest = engine.open_contest(COURSE, TOPIC, n_questions=4)
+    with pytest.raises(ContestError, match="Start the contest"):
+        engine.submit(contest.id, "alice", answer_key(contest))
+
+
+def test_an_invalid_choice_does_not_use_up_the_attempt(engine):
+    contest = engine.open_contest(COURSE, TOPIC, n_questions=4)
+    engine.start(contest.id, "alice")
+    for bad in (300, -1, 4, "B"):
+        with pytest.raises(ContestError, match="not an option"):
+            engine.submit(contest.id, "alice", {contest.items[0].id: bad})
+    assert engine.submit(contest.id, "alice", answer_key(contest)).score == 4
+
+
+def test_time_limit_is_enforced(engine, monkeypatch):
+    import contest_engine
+    monkeypatch.setattr(contest_engine, "GRACE_SECONDS", 0)
+    contest = engine.open_contest(COURSE, TOPIC, n_questions=4, duration=0.05)
+    deadline = engine.start(contest.id, "alice")
+    assert engine.start(contest.id, "alice") == deadline  # Resuming keeps the original start.
+    time.sleep(0.1)
+    with pytest.raises(ContestError, match="Time is up"):
+        engine.submit(contest.id, "alice", answer_key(contest))
+
+
+def test_standings_rank_by_score_then_time(engine):
+    contest = engine.open_contest(COURSE, TOPIC, n_questions=4)
+    key = answer_key(contest)
+    wrong = {item_id: (answer + 1) % 4 for item_id, answer in key.items()}
+    results = {}
+    for user_id, choices, think in (("alice", key, 0.0), ("bob", wrong, 0.0), ("carol", key, 0.05)):
+        engine.start(contest.id, user_id)
+        time.sleep(think)
+        results[user_id] = engine.submit(contest.id, user_id, choices)
+
+    assert [(e["user_id"], e["score"], e["rank"]) for e in engine.standings(contest.id)] == \
+           [("alice", 4, 1), ("carol", 4, 1), ("bob", 0, 3)]
+    assert (results["bob"].rank, results["carol"].rank) == (2, 1)  # Ranks at the time of submitting.
+    assert engine.contestants(contest.id) == 3
+
+
+def test_engines_in_different_processes_share_attempts_and_standings(tmp_path, bank, monkeypatch):
+    import contest_engine
+    monkeypatch.setattr(contest_engine, "STANDINGS_REFRESH", 0.0)
+    first = ContestEngine(str(tmp_path / "contest.db"), bank)
+    second = ContestEngine(str(tmp_path / "contest.db"), bank)
+    contest = first.open_contest(COURSE, TOPIC, n_questions=4)
+    assert first.standings(contest.id) == []
+
+    deadline = first.start(contest.id, "alice")
+    assert second.start(contest.id, "alice") == deadline
+    assert second.submit(contest.id, "alice", answer_key(contest)).score == 4
+    with pytest.raises(ContestError, match="already been submitted"):
+        first.submit(contest.id, "alice", answer_key(contest))
+
+    first.start(contest.id, "bob")
+    first.submit(contest.id, "bob", {})
+    assert [e["user_id"] for e in second.standings(contest.id)] == ["alice", "bob"]
+    assert [e["user_id"] for e in first.standings(contest.id)] == ["alice", "bob"]
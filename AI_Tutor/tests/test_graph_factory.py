@@ -0,0 +1,34 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import APP_DIR
+
+
+@pytest.fixture
+def graph_factory(workdir, monkeypatch):
+    from stub_llm import install_stubs
+    install_stubs()
+    monkeypatch.setenv("GEMINI_API_KEY", "stub-key")
+    shutil.copy(os.path.join(APP_DIR, "agent_prompt.txt"), workdir)
+    import graph_factory
+    monkeypatch.setattr(graph_factory, "_graphs", {})
+    monkeypatch.setattr(graph_factory, "MAX_GRAPHS", 2)
+    return graph_factory
+
+
+def test_graphs_are_cached_per_saver_and_bounded(graph_factory):
+    from langgraph.checkpoint.memory import InMemorySaver
+    first, second, third = InMemorySaver(), InMemorySaver(), InMemorySaver()
+
+    graph = graph_factory.get_graph("key", first)
+    assert graph_factory.get_graph("key", first) is graph
+    assert graph_factory.get_graph("other-key", first) is not graph
+    graph_factory.get_graph("key", first)  # Now the most recently used.
+    graph_factory.get_graph("key", second)
+    assert list(graph_factory._graphs) == [("key", first), ("key", second)]
+
+    graph_factory.get_graph("key", third)
+    assert list(graph_factory._graphs) == [("key", second), ("key", third)]
+    assert graph_factory.get_graph("key", first) is not graph  # Rebuilt after eviction.
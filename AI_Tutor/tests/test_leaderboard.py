@@ -0,0 +1,96 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+import leaderboard
+from leaderboard import GLOBAL_BOARD, course_board, get_leaderboard, week_board
+from progress_store import bulk_update_student_progress, setup_database
+from topic_meta import TOPICS
+
+COURSE = next(iter(TOPICS))
+TOPIC_A, TOPIC_B = TOPICS[COURSE][:2]
+
+
+def test_first_write_builds_once_and_later_writes_are_incremental(workdir, monkeypatch):
+    builds = []
+    rebuild = leaderboard.Leaderboard.rebuild
+    monkeypatch.setattr(leaderboard.Leaderboard, "rebuild", lambda self, *a, **k: builds.append(self.db_path) or rebuild(self, *a, **k))
+
+    for level in (10, 20, 30):
+        bulk_update_student_progress([("alice", COURSE, TOPIC_A, level)])
+
+    assert len(builds) == 1
+    assert get_leaderboard().score(GLOBAL_BOARD, "alice") == pytest.approx(30)
+
+
+def test_writes_after_chdir_use_that_directorys_leaderboard(workdir, tmp_path_factory, monkeypatch):
+    bulk_update_student_progress([("alice", COURSE, TOPIC_A, 40)])
+    first = get_leaderboard()
+
+    other = tmp_path_factory.mktemp("other")
+    monkeypatch.chdir(other)
+    setup_database()
+    builds = []
+    rebuild = leaderboard.Leaderboard.rebuild
+    monkeypatch.setattr(leaderboard.Leaderboard, "rebuild", lambda self, *a, **k: builds.append(self.db_path) or rebuild(self, *a, **k))
+    for level in (10, 20, 30, 50):
+        bulk_update_student_progress([("bob", COURSE, TOPIC_A, level)])
+
+    assert builds == [str(other / "leaderboard.db")]
+    assert get_leaderboard() is not first
+    assert get_leaderboard().score(GLOBAL_BOARD, "bob") == pytest.approx(50)
+    assert first.score(GLOBAL_BOARD, "bob") is None
+
+
+def test_ranks_match_a_full_sort(workdir):
+    rng = random.Random(7)
+    users = [f"user{i}" for i in range(60)]
+    for _ in range(300):
+        bulk_update_student_progress([(rng.choice(users), COURSE, rng.choice([TOPIC_A, TOPIC_B]), rng.uniform(0, 100))])
+
+    board = get_leaderboard()
+    scores = {u: board.score(GLOBAL_BOARD, u) for u in users if board.score(GLOBAL_BOARD, u) is not None}
+    for user_id, score in scores.items():
+        assert board.rank(GLOBAL_BOARD, user_id) == 1 + sum(other > score for other in scores.values())
+    top = board.top(GLOBAL_BOARD, 5)
+    assert [entry["score"] for entry in top] == sorted(scores.values(), reverse=True)[:5]
+    assert board.size(GLOBAL_BOARD) == len(scores)
+
+
+def test_rebuild_matches_incremental_scores(workdir):
+    rng = random.Random(3)
+    for _ in range(100):
+        bulk_update_student_progress([(f"user{rng.randrange(10)}", COURSE, rng.choice([TOPIC_A, TOPIC_B]), rng.uniform(0, 100))])
+    board = get_leaderboard()
+    incremental = board.top(course_board(COURSE), 10)
+
+    board.rebuild("progress_data.db")
+    assert [(e["user_id"], round(e["score"], 6)) for e in board.top(course_board(COURSE), 10)] == \
+           [(e["user_id"], round(e["score"], 6)) for e in incremental]
+
+
+def test_placeholder_topics_do_not_score(workdir):
+    bulk_update_student_progress([("alice", COURSE, TOPIC_A, 10)])
+    bulk_update_student_progress([("alice", "General", "General", 90), ("carol", "General", "General", 90)])
+
+    board = get_leaderboard()
+    assert board.score(GLOBAL_BOARD, "alice") == pytest.approx(10)
+    assert board.score(GLOBAL_BOARD, "carol") is None
+    assert board.size(course_board("General")) == 0
+
+
+def test_the_week_spanning_new_year_is_one_board():
+    new_years_eve = datetime(2025, 12, 31, 12, tzinfo=timezone.utc).timestamp()
+    assert week_board(new_years_eve) == week_board(new_years_eve + 86400) == "week:2026-W01"
+    assert week_board(new_years_eve - 3 * 86400) == "week:2025-W52"  # The Sunday before.
+
+
+def test_rebuild_matches_incremental_weekly_gains(workdir):
+    bulk_update_student_progress([("alice", COURSE, TOPIC_A, 30), ("bob", COURSE, TOPIC_B, 50)])
+    bulk_update_student_progress([("alice", COURSE, TOPIC_A, 60)])
+    board = get_leaderboard()
+    incremental = {e["user_id"]: e["score"] for e in board.top(week_board(), 10)}
+
+    board.rebuild("progress_data.db")
+    assert {e["user_id"]: e["score"] for e in board.top(week_board(), 10)} == incremental == {"alice": 60, "bob": 50}
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from llm_scheduler import LLMScheduler, TokenBucket
+
+
+class FakeLLM:
+    model = "fake-model"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    def invoke(self, prompt, **kwargs):
+        self.calls.append((prompt, kwargs))
+        time.sleep(self.delay)
+        return f"{prompt}|{sorted(kwargs.items())}"
+
+
+def test_bucket_holds_a_minutes_quota():
+    bucket = TokenBucket(10)
+    assert [bucket.try_take() for _ in range(10)] == [0.0] * 10
+    assert 5.0 < bucket.try_take() <= 6.0
+
+
+def test_a_turns_calls_do_not_wait_when_the_quota_is_unused():
+    scheduler = LLMScheduler(rate_limits={"fake-model": 10})
+    llm = FakeLLM()
+    start = time.monotonic()
+    for prompt in ("assistant", "tool", "assistant again"):
+        scheduler.invoke(llm, prompt)
+    assert time.monotonic() - start < 1.0
+
+
+def test_interactive_lane_is_served_first():
+    scheduler = LLMScheduler(rate_limits={"fake-model": 600})
+    scheduler.set_rate_limit("fake-model", 600, burst=1)
+    scheduler.run("fake-model", lambda: None)  # Empties the bucket.
+    order = []
+    batch = threading.Thread(target=lambda: scheduler.run("fake-model", lambda: order.append("batch"), priority=1))
+    batch.start()
+    time.sleep(0.02)
+    scheduler.run("fake-model", lambda: order.append("interactive"), priority=0)
+    batch.join()
+    assert order == ["interactive", "batch"]
+
+
+def test_identical_prompts_in_flight_share_one_call():
+    scheduler = LLMScheduler(rate_limits={})
+    scheduler.disable_rate_limits()
+    llm = FakeLLM(delay=0.1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.invoke(llm, "same"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(llm.calls) == 1
+    assert len(set(results)) == 1
+    assert scheduler.stats["coalesced"] == 4
+
+
+def test_calls_with_different_kwargs_are_not_coalesced():
+    scheduler = LLMScheduler(rate_limits={})
+    scheduler.disable_rate_limits()
+    llm = FakeLLM(delay=0.1)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda stop=stop: results.__setitem__(stop, scheduler.invoke(llm, "same", stop=[stop])))
+        for stop in ("\n", "END")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(llm.calls) == 2
+    assert results["\n"] != results["END"]
+
+
+def test_stats_count_every_call_under_concurrency():
+    scheduler = LLMScheduler(rate_limits={})
+    scheduler.disable_rate_limits()
+
+    def worker():
+        for _ in range(500):
+            scheduler.run("fake-model", lambda: None)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert scheduler.stats["calls"] == 4000
+
+
+def test_retryable_errors_are_retried(monkeypatch):
+    import llm_scheduler
+    monkeypatch.setitem(llm_scheduler.RETRY_SETTINGS, "base_delay", 0.0)
+    scheduler = LLMScheduler(rate_limits={})
+    scheduler.disable_rate_limits()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return "ok"
+
+    assert scheduler.run("fake-model", flaky) == "ok"
+    assert scheduler.stats["retries"] == 2
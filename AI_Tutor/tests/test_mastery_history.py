@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+
+from mastery_history import day_of, load_learning_curve, load_topic_curve, record_mastery_event, setup_mastery_history
+
+DAY = 86400.0
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    setup_mastery_history(conn)
+    yield conn
+    conn.close()
+
+
+def test_daily_rollup_keeps_the_last_level_of_each_day(conn):
+    for level, at in ((10.0, 0.0), (30.0, 60.0), (50.0, DAY)):
+        record_mastery_event(conn, "alice", "Python", "Lists", None, level, recorded_at=at)
+    curve = load_learning_curve(conn, "alice")
+    assert list(curve["day"]) == [day_of(0), day_of(DAY)]
+    assert list(curve["mastery_level"]) == [30.0, 50.0]
+
+
+def test_topic_curve_carries_inactive_users_forward(conn):
+    record_mastery_event(conn, "alice", "Python", "Lists", None, 50.0, recorded_at=0.0)
+    record_mastery_event(conn, "bob", "Python", "Lists", None, 30.0, recorded_at=0.0)
+    record_mastery_event(conn, "alice", "Python", "Lists", 50.0, 70.0, recorded_at=DAY)
+    record_mastery_event(conn, "carol", "Python", "Lists", None, 90.0, recorded_at=2 * DAY)
+
+    curve = load_topic_curve(conn, "Python")
+    # Bob did not study on day two, but his level still counts.
+    assert list(curve["mastery_level"]) == [40.0, 50.0, pytest.approx(190.0 / 3)]
+    assert list(curve["users"]) == [2, 2, 3]
+
+    later = load_topic_curve(conn, "Python", start_day=day_of(DAY))
+    assert list(later["day"]) == [day_of(DAY), day_of(2 * DAY)]
+    assert later["mastery_level"].iloc[0] == 50.0
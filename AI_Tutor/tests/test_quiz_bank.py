@@ -0,0 +1,111 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import quiz_bank
+from quiz_bank import QuizBank, QuizItem, format_quiz, parse_quiz_items, quiz_for_content, target_difficulty
+from topic_meta import TOPICS
+
+COURSE = next(iter(TOPICS))
+TOPIC = TOPICS[COURSE][0]
+
+
+def item(stem: str, difficulty: int = 3) -> QuizItem:
+    return QuizItem(COURSE, TOPIC, difficulty, stem, ["one", "two", "three", "four"], 1, "because")
+
+
+class FakeQuizLLM:
+    """Returns `n` new JSON items per call, numbered across calls."""
+    model = "fake-quiz"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        n = int(prompt.split("Generate exactly ")[1].split()[0])
+        items = [{"question": f"Generated question {self.calls}.{i}?", "options": ["a", "b", "c", "d"],
+                  "answer": "C", "difficulty": 2} for i in range(n)]
+        return SimpleNamespace(content=json.dumps(items))
+
+
+class FixedClassifier:
+    def __init__(self, tag):
+        self.tag = tag
+
+    def classify(self, messages):
+        return self.tag
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    bank = QuizBank(str(tmp_path / "quiz_bank.db"))
+    monkeypatch.setattr(quiz_bank, "get_quiz_bank", lambda db_path=None: bank)
+    return bank
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    llm = FakeQuizLLM()
+    monkeypatch.setattr(quiz_bank, "get_llm", lambda task, api_key=None: llm)
+    return llm
+
+
+def test_parses_json_and_free_text_responses():
+    from_json = parse_quiz_items('Here you go: [{"question": "Q?", "options": ["x", "y"], "answer": "B"},'
+                                 ' {"question": "", "options": []}]', COURSE, TOPIC)
+    assert [(i.stem, i.answer) for i in from_json] == [("Q?", 1)]
+
+    text = "1. What is 2+2?\nA) 3\nB) 4\nC) 5\nAnswer: B\n2. Broken question\nAnswer: A"
+    assert [(i.stem, i.options, i.answer) for i in parse_quiz_items(text, COURSE, TOPIC)] == \
+           [("What is 2+2?", ["3", "4", "5"], 1)]
+
+
+def test_duplicate_stems_are_stored_once(bank):
+    stored = bank.add_items([item("What is a list?"), item("what is a LIST"), item("What is a tuple?")])
+    assert [i.stem for i in stored] == ["What is a list?", "What is a tuple?"]
+    assert bank.add_items([item("What is a list ?!")]) == []
+    assert bank.count(TOPIC) == 2
+
+
+def test_draw_never_repeats_an_item_for_a_student(bank):
+    bank.add_items([item(f"Question {i}?", difficulty=1 + i % 5) for i in range(6)])
+    first = bank.draw("alice", TOPIC, 4, difficulty=1)
+    second = bank.draw("alice", TOPIC, 4, difficulty=1)
+    assert len(first) == 4 and len(second) == 2
+    assert not {i.id for i in first} & {i.id for i in second}
+    assert first[0].difficulty == 1
+    assert len(bank.draw("bob", TOPIC, 6)) == 6
+    assert bank.unseen_counts("alice", [TOPIC]) == {TOPIC: 0}
+
+
+def test_serve_generates_only_the_shortfall(bank, fake_llm):
+    bank.add_items([item(f"Question {i}?") for i in range(3)])
+    served = bank.serve("alice", COURSE, TOPIC, 5)
+    assert len(served) == 5
+    assert fake_llm.calls == 1
+    assert bank.count(TOPIC) == 5
+
+    bank.serve("bob", COURSE, TOPIC, 5)
+    assert fake_llm.calls == 1  # Bob has seen nothing yet, so the bank covers him.
+
+
+def test_quiz_for_content_works_before_the_progress_database_exists(bank, fake_llm, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bank.add_items([item(f"Question {i}?") for i in range(5)])
+
+    items = quiz_for_content("lists and tuples", 3, "alice", FixedClassifier((COURSE, TOPIC, 0.9)))
+    assert len(items) == 3 and all(i.topic == TOPIC for i in items)
+    assert fake_llm.calls == 0
+    assert "[Q" in format_quiz(items)
+
+
+def test_unclassified_content_gets_new_general_questions(bank, fake_llm):
+    items = quiz_for_content("something off-catalog", 2, "alice", FixedClassifier(None))
+    assert len(items) == 2 and all(i.id is not None for i in items)
+    assert fake_llm.calls == 1
+
+
+def test_target_difficulty_rises_with_mastery():
+    assert [target_difficulty(level) for level in (0, 19.9, 20, 55, 99, 100)] == [1, 1, 2, 3, 5, 5]
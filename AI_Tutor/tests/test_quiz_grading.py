@@ -0,0 +1,83 @@
+import pytest
+
+from progress_store import bulk_update_student_progress, get_progress
+from quiz_bank import QuizBank, QuizItem, format_quiz
+from quiz_grading import QUIZ_MASTERY_WEIGHT, grade, grade_text, item_ids, parse_choices
+from topic_meta import TOPICS
+
+COURSE = next(iter(TOPICS))
+TOPIC_A, TOPIC_B = TOPICS[COURSE][:2]
+
+
+@pytest.fixture
+def bank(workdir):
+    bank = QuizBank(str(workdir / "quiz_bank.db"))
+    bank.add_items(
+        [QuizItem(COURSE, TOPIC_A, 2, f"{TOPIC_A} question {i}?", ["w", "x", "y", "z"], i % 4, "see notes") for i in range(4)]
+        + [QuizItem(COURSE, TOPIC_B, 2, f"{TOPIC_B} question {i}?", ["w", "x", "y", "z"], 0) for i in range(2)]
+        + [QuizItem("General", "General", 2, "Off-catalog question?", ["w", "x"], 1)]
+    )
+    return bank
+
+
+def test_choices_are_read_by_id_or_in_question_order():
+    ids = [12, 7, 30]
+    assert parse_choices("Q7: b, Q12=A, Q30 (c)", ids) == {7: 1, 12: 0, 30: 2}
+    assert parse_choices("1. B 2) c 3- D", ids) == {12: 1, 7: 2, 30: 3}
+    assert parse_choices("A, b", ids) == {12: 0, 7: 1}
+    # Ids the student made up fall back to reading the letters in order.
+    assert parse_choices("Q99: A", ids) == {12: 0}
+
+
+def test_grading_scores_against_the_answer_key(bank):
+    items = bank.draw("alice", TOPIC_A, 4)
+    choices = {item.id: item.answer for item in items[:3]}
+    choices[items[3].id] = (items[3].answer + 1) % 4
+    result = grade("alice", choices, bank=bank)
+
+    assert (result.correct, len(result.answers)) == (3, 4)
+    assert result.by_topic() == {(COURSE, TOPIC_A): (3, 4)}
+    assert result.to_text().startswith("Score: 3/4 (75%)")
+    assert "the answer is" in result.to_text()
+    assert grade("alice", {10_000: 0}, bank=bank) is None
+
+
+def test_mastery_moves_part_way_toward_quiz_accuracy(bank):
+    bulk_update_student_progress([("alice", COURSE, TOPIC_B, 40.0)])
+    items = bank.draw("alice", TOPIC_B, 2)
+    grade("alice", {item.id: item.answer for item in items}, bank=bank)
+    assert get_progress("alice", COURSE, TOPIC_B) == pytest.approx(40.0 + QUIZ_MASTERY_WEIGHT * 60.0)
+
+
+def test_general_questions_do_not_touch_progress(bank, workdir):
+    item = bank.draw("alice", "General", 1)[0]
+    result = grade("alice", {item.id: item.answer}, bank=bank)
+    assert result.correct == 1
+    assert get_progress("alice", "General", "General") == 0.0
+    assert "Topic accuracy" not in result.to_text()
+
+
+def test_only_unanswered_items_served_to_the_student_are_graded(bank):
+    items = bank.draw("alice", TOPIC_B, 2)
+    answers = {item.id: item.answer for item in items}
+    assert grade("bob", answers, bank=bank) is None  # Never served to Bob.
+
+    first = grade("alice", {items[0].id: items[0].answer}, bank=bank)
+    assert len(first.answers) == 1
+    assert [a.item.id for a in grade("alice", answers, bank=bank).answers] == [items[1].id]
+    assert grade("alice", answers, bank=bank) is None
+    assert get_progress("alice", COURSE, TOPIC_B) == pytest.approx(100 * (1 - (1 - QUIZ_MASTERY_WEIGHT) ** 2))
+
+
+def test_grade_text_reads_the_quiz_as_shown(bank):
+    items = bank.draw("alice", TOPIC_A, 2)
+    questions = format_quiz(items)
+    assert item_ids(questions) == [item.id for item in items]
+
+    letters = " ".join("ABCD"[item.answer] for item in items)
+    result = grade_text("alice", questions, letters, bank=bank)
+    assert result.correct == 2
+    # A resubmission goes to the LLM grader instead of being scored again.
+    assert grade_text("alice", questions, letters, bank=bank) is None
+
+    assert grade_text("alice", "1. A question written by the LLM?", "A", bank=bank) is None
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+from progress_store import bulk_update_student_progress, get_progress_db_connection
+from review_scheduler import (DAY_SECONDS, DEFAULT_EASE, MIN_EASE, due_reviews, next_review, seed_review_state,
+                              setup_review_state, upcoming_reviews)
+from topic_meta import TOPICS
+
+COURSE = next(iter(TOPICS))
+TOPIC_A, TOPIC_B = TOPICS[COURSE][:2]
+
+
+def test_passing_reviews_follow_the_sm2_intervals():
+    state, intervals, eases = None, [], []
+    for _ in range(4):
+        eases.append(state["ease"] if state else DEFAULT_EASE)
+        state = next_review(state, 100.0, 0.0)
+        intervals.append(state["interval_days"])
+    # 1 day, 6 days, then the previous interval times the ease, which grows by 0.1 per perfect review.
+    assert intervals[:2] == [1, 6]
+    assert intervals[2] == pytest.approx(6 * eases[2])
+    assert intervals[3] == pytest.approx(intervals[2] * eases[3])
+    assert eases[3] == pytest.approx(DEFAULT_EASE + 0.3)
+    assert state["due_at"] == intervals[3] * DAY_SECONDS
+
+
+def test_a_failed_review_restarts_the_sequence_and_lowers_ease():
+    state = next_review(next_review(None, 100.0, 0.0), 100.0, 0.0)
+    failed = next_review(state, 10.0, 0.0)
+    assert (failed["repetitions"], failed["interval_days"]) == (0, 1)
+    assert failed["ease"] < state["ease"]
+    for _ in range(20):
+        failed = next_review(failed, 0.0, 0.0)
+    assert failed["ease"] == MIN_EASE
+
+
+def test_progress_writes_schedule_reviews_in_due_order(workdir):
+    bulk_update_student_progress([("alice", COURSE, TOPIC_A, 20), ("alice", COURSE, TOPIC_B, 90)])
+    conn = get_progress_db_connection(user_id="alice")
+    due_now = due_reviews(conn, "alice")
+    due_later = due_reviews(conn, "alice", until=float("inf"))
+    conn.close()
+
+    assert due_now == []  # Even a failed review is due a day later.
+    assert [row["topic"] for row in due_later] == [TOPIC_A, TOPIC_B]
+    assert [row["due_at"] for row in due_later] == sorted(row["due_at"] for row in due_later)
+
+
+def test_placeholder_topics_are_not_scheduled(workdir):
+    bulk_update_student_progress([("alice", "General", "General", 50), ("alice", COURSE, TOPIC_A, 50)])
+    reviews = upcoming_reviews("progress_data.db", within_seconds=365 * DAY_SECONDS)
+    assert [(row["user_id"], row["topic"]) for row in reviews] == [("alice", TOPIC_A)]
+
+
+def test_seeding_skips_placeholder_topics_and_purges_old_ones(tmp_path):
+    conn = sqlite3.connect(tmp_path / "legacy.db")
+    conn.execute("CREATE TABLE student_progress (user_id TEXT, course TEXT, topic TEXT, mastery_level REAL)")
+    conn.executemany("INSERT INTO student_progress VALUES (?, ?, ?, ?)",
+                     [("bob", COURSE, TOPIC_A, 80), ("bob", "General", "General", 80)])
+    setup_review_state(conn)
+    assert conn.execute("SELECT topic, ease FROM review_state").fetchall() == [(TOPIC_A, DEFAULT_EASE)]
+
+    # A schedule written by an older version is removed on the next setup.
+    conn.execute("INSERT INTO review_state VALUES ('bob', 'General', 'General', 2.5, 1, 0, 80, 0, 0)")
+    setup_review_state(conn)
+    seed_review_state(conn)
+    assert [row[0] for row in conn.execute("SELECT topic FROM review_state")] == [TOPIC_A]
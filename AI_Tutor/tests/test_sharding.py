@@ -0,0 +1,80 @@
+import os
+import sqlite3
+
+import pytest
+
+import sharding
+from progress_store import bulk_update_student_progress, get_progress, get_progress_reader, setup_database
+from sharding import SHARDS, physical_shard, shard_count, shard_of, shard_path, shard_paths
+from topic_meta import TOPICS
+
+COURSE = next(iter(TOPICS))
+TOPIC = TOPICS[COURSE][0]
+USERS = [f"student-{i}" for i in range(40)]
+
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    """A fresh working directory whose progress database is created with four shards."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sharding, "DEFAULT_SHARD_COUNT", 4)
+    setup_database()
+    return tmp_path
+
+
+def rows_per_file(paths):
+    counts = []
+    for path in paths:
+        conn = sqlite3.connect(path)
+        counts.append(conn.execute("SELECT COUNT(*) FROM student_progress").fetchone()[0])
+        conn.close()
+    return counts
+
+
+def test_users_hash_to_stable_shards():
+    assert shard_of("alice") == shard_of("alice")
+    assert 0 <= shard_of("alice") < SHARDS
+    assert {physical_shard(user, 4) for user in USERS} == {0, 1, 2, 3}
+    assert all(physical_shard(user, 1) == 0 for user in USERS)
+    assert shard_path("progress_data.db", 2, 4) == "progress_data.shard2of4.db"
+    assert shard_path("progress_data.db", 0, 1) == "progress_data.db"
+
+
+def test_writes_go_to_the_users_shard(sharded):
+    assert shard_count("progress_data.db") == 4
+    bulk_update_student_progress([(user, COURSE, TOPIC, 50.0) for user in USERS])
+
+    for index, path in enumerate(shard_paths("progress_data.db", 4)):
+        conn = sqlite3.connect(path)
+        users = {row[0] for row in conn.execute("SELECT user_id FROM student_progress")}
+        conn.close()
+        assert users == {user for user in USERS if physical_shard(user, 4) == index}
+    assert get_progress(USERS[0], COURSE, TOPIC) == 50.0
+
+
+def test_reader_sees_every_shard(sharded):
+    bulk_update_student_progress([(user, COURSE, TOPIC, 10.0 * (i % 10)) for i, user in enumerate(USERS)])
+    conn = get_progress_reader()
+    count, total = conn.execute("SELECT COUNT(*), SUM(mastery_level) FROM student_progress").fetchone()
+    conn.close()
+    assert (count, total) == (len(USERS), sum(10.0 * (i % 10) for i in range(len(USERS))))
+
+
+def test_resharding_keeps_every_row(workdir):
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    from reshard import reshard
+    from thread_store import register_thread
+
+    bulk_update_student_progress([(user, COURSE, TOPIC, 42.0) for user in USERS])
+    register_thread("thread-0", USERS[0])
+
+    assert reshard(4, "progress_data.db", "chat_history.db")
+    assert shard_count("progress_data.db") == 4
+    assert sum(rows_per_file(shard_paths("progress_data.db", 4))) == len(USERS)
+    assert all(get_progress(user, COURSE, TOPIC) == 42.0 for user in USERS)
+    assert not reshard(4, "progress_data.db", "chat_history.db")
+
+    # And back to a single file, removing the shard files.
+    assert reshard(1, "progress_data.db", "chat_history.db")
+    assert rows_per_file(["progress_data.db"]) == [len(USERS)]
+    assert not any(os.path.exists(path) for path in shard_paths("progress_data.db", 4))
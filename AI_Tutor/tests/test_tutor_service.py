@@ -0,0 +1,85 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import APP_DIR
+
+
+@pytest.fixture
+def client(workdir, monkeypatch):
+    from stub_llm import install_stubs
+    install_stubs()
+    monkeypatch.setenv("GEMINI_API_KEY", "stub-key")
+    shutil.copy(os.path.join(APP_DIR, "agent_prompt.txt"), workdir)
+    from llm_scheduler import scheduler
+    scheduler.disable_rate_limits()
+
+    from starlette.testclient import TestClient
+    from thread_store import register_thread
+    from tutor_service import create_app
+
+    register_thread("alice-thread", "alice")
+    return TestClient(create_app())
+
+
+def test_threads_are_only_readable_by_their_owner(client):
+    assert client.get("/threads/alice-thread", params={"user_id": "alice"}).status_code == 200
+    assert client.get("/threads/alice-thread", params={"user_id": "mallory"}).status_code == 403
+    assert client.get("/threads/missing", params={"user_id": "alice"}).status_code == 404
+
+
+def test_tracking_another_students_thread_is_refused(client):
+    response = client.post("/track", json={"user_id": "mallory", "thread_id": "alice-thread"})
+    assert response.status_code == 403
+    assert client.post("/track", json={"user_id": "alice", "thread_id": "missing"}).status_code == 404
+
+
+def test_chat_into_another_students_thread_is_refused(client):
+    response = client.post("/chat", json={"user_id": "mallory", "thread_id": "alice-thread", "message": "hi"})
+    assert response.status_code == 403
+
+
+def png_bytes() -> bytes:
+    from PIL import Image
+    out = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_chat_images_are_referenced_by_the_owners_hash(client):
+    response = client.post("/images", params={"user_id": "alice"}, content=png_bytes())
+    assert response.status_code == 201
+    image_hash = response.json()["hash"]
+    assert client.post("/images", params={"user_id": "alice"}, content=b"not an image").status_code == 400
+
+    assert client.post("/chat", json={"user_id": "mallory", "message": "hi", "image_hash": image_hash}).status_code == 404
+    response = client.post("/chat", json={"user_id": "alice", "message": "What is this?", "image_hash": image_hash,
+                                          "thread_id": "alice-thread"})
+    assert response.status_code == 200 and "event: done" in response.text
+    history = client.get("/threads/alice-thread", params={"user_id": "alice"}).json()
+    assert {"role": "image", "hash": image_hash, "name": None} in history
+
+
+
+def test_the_service_does_not_import_streamlit(tmp_path):
+    code = "import sys, tutor_service; sys.exit('streamlit' in sys.modules)"
+    env = {**os.environ, "PYTHONPATH": APP_DIR, "GEMINI_API_KEY": "stub-key"}
+    assert subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True).returncode == 0
+
+
+def test_recommendations_come_from_the_progress_database(client):
+    from progress_store import bulk_update_student_progress
+    from topic_meta import TOPICS
+    course = next(iter(TOPICS))
+    bulk_update_student_progress([("alice", course, TOPICS[course][0], 95.0)])
+    response = client.get("/recommendations/alice", params={"top_k": 3})
+    assert response.status_code == 200 and len(response.json()) <= 3
+
+
+def test_malformed_query_numbers_are_rejected(client):
+    assert client.get("/recommendations/alice", params={"top_k": "many"}).status_code == 400
+    assert client.get("/usage", params={"days": "week"}).status_code == 400
@@ -0,0 +1,17 @@
+import usage_ledger
+from usage_ledger import UsageLedger
+
+
+def test_budgets_set_elsewhere_are_picked_up_on_refresh(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "usage.db")
+    app = UsageLedger(db_file, default_budget=None)
+    cli = UsageLedger(db_file, default_budget=None)
+    assert app.budget("alice") is None
+
+    cli.set_budget("alice", 0.5)
+    assert app.budget("alice") is None  # Still within SPEND_REFRESH_SECONDS.
+    monkeypatch.setattr(usage_ledger, "SPEND_REFRESH_SECONDS", 0.0)
+    assert app.budget("alice") == 0.5
+
+    cli.set_budget("alice", None)
+    assert app.budget("alice") is None
@@ -0,0 +1,94 @@
+# thread_store.py
+
+"""
+Conversation ownership: which user each chat thread belongs to.
+
+Threads are registered on their first message and owned by that user from then
+on. Every thread carries its owner's virtual shard (sharding.shard_of), so
+tracking work can be split across workers by user (`parse_partition`).
+"""
+
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from progress_store import PROGRESS_DB_FILE, get_progress_db_connection, setup_database
+from sharding import shard_of
+
+# --- Configuration Block ---
+DEFAULT_USER_ID = "student456"  # Owner of data from before threads had owners, and of anonymous sessions.
+
+_ready = set()
+
+
+def parse_partition(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    """'i/n' -> (i, n): this worker handles shards with shard % n == i."""
+    if not spec:
+        return None
+    index, count = (int(part) for part in spec.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Partition index must be in [0, {count}): {spec}")
+    return index, count
+
+
+def connect(db_path: Optional[str] = None):
+    """Connection to the progress database, creating the tables on first use in this process."""
+    db_path = db_path or PROGRESS_DB_FILE
+    if db_path not in _ready:
+        setup_database(db_path)
+        _ready.add(db_path)
+    return get_progress_db_connection(db_path)
+
+
+# --- Ownership ---
+
+def register_threads(threads: Iterable[Sequence], db_path: Optional[str] = None):
+    """Bulk-registers (thread_id, user_id[, created_at]) rows; existing owners are kept."""
+    now = time.time()
+    rows = []
+    for thread in threads:
+        thread_id, user_id = str(thread[0]), thread[1]
+        created_at = thread[2] if len(thread) > 2 else now
+        rows.append((thread_id, user_id, shard_of(user_id), created_at, created_at))
+    conn = connect(db_path)
+    with conn:
+        conn.executemany("""
+            INSERT INTO threads (thread_id, user_id, shard, created_at, last_active)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(thread_id) DO UPDATE SET last_active = MAX(last_active, excluded.last_active)
+        """, rows)
+    conn.close()
+
+
+def register_thread(thread_id, user_id: str) -> str:
+    """
+    Records activity on a thread and returns its owner. The first user to post
+    in a thread owns it; posting to another user's thread raises ValueError.
+    """
+    thread_id = str(thread_id)
+    register_threads([(thread_id, user_id)])
+    owner = thread_owner(thread_id)
+    if owner != user_id:
+        raise ValueError(f"Thread {thread_id} belongs to another user")
+    return owner
+
+
+def thread_owner(thread_id, db_path: Optional[str] = None) -> Optional[str]:
+    conn = connect(db_path)
+    row = conn.execute("SELECT user_id FROM threads WHERE thread_id = ?", (str(thread_id),)).fetchone()
+    conn.close()
+    return row["user_id"] if row else None
+
+
+def user_threads(user_id: str) -> List[str]:
+    """A user's thread ids, oldest first. Time Complexity: O(log N + R) via idx_threads_user_active."""
+    conn = connect()
+    rows = conn.execute(
+        "SELECT thread_id FROM threads WHERE user_id = ? ORDER BY created_at", (user_id,)
+    ).fetchall()
+    conn.close()
+    return [row["thread_id"] for row in rows]
+
+
+def adopt_threads(thread_ids: Iterable, user_id: str = DEFAULT_USER_ID):
+    """Gives threads that have no owner yet (created before ownership existed) to `user_id`."""
+    register_threads([(thread_id, user_id, 0.0) for thread_id in thread_ids])
@@ -0,0 +1,179 @@
+# topic_classifier.py
+
+"""
+Local fast paths for `identify_course_topic`.
+
+- EmbeddingTopicClassifier: scores the conversation against precomputed
+  embedding vectors for every topic in `topic_meta.TOPICS`. Needs no training.
+- CachedTopicClassifier: TF-IDF + logistic regression trained on threads the
+  LLM has already labeled (the `thread_topics` table).
+
+`TopicClassifierChain` tries them in order; the LLM is only called when none
+of them is confident enough.
+"""
+
+import os
+import sqlite3
+import threading
+import warnings
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from embeddings import get_encoder
+from topic_meta import TOPICS, TOPIC_KEYWORDS
+
+# --- Configuration Block ---
+LOCAL_CLASSIFIER_ENABLED = os.getenv("AI_TUTOR_LOCAL_CLASSIFIER", "1") != "0"
+CONFIDENCE_THRESHOLD = float(os.getenv("AI_TUTOR_CLASSIFIER_THRESHOLD", "0.6"))
+EMBEDDING_CONFIDENCE_THRESHOLD = float(os.getenv("AI_TUTOR_EMBEDDING_THRESHOLD", "0.7"))
+EMBEDDING_TEMPERATURE = 20.0  # Sharpness of the softmax over cosine similarities.
+MIN_LABELED_THREADS = 30   # Below this the classifier abstains and the LLM decides.
+RETRAIN_EVERY = 20         # Retrain after this many new labels.
+
+LABEL_SEPARATOR = " :: "
+GENERAL = ("General", "General")
+
+
+def conversation_text(conversation_history) -> str:
+    """Flattens the tracker's conversation history (list of role/content dicts) into plain text."""
+    if isinstance(conversation_history, str):
+        return conversation_history
+    return "\n".join(str(message.get("content", "")) for message in conversation_history or [])
+
+
+def load_labeled_threads(conn: sqlite3.Connection) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Returns (texts, (course, topic) labels) for threads labeled by the LLM."""
+    rows = conn.execute(
+        "SELECT conversation, course, topic FROM thread_topics WHERE source = 'llm'"
+    ).fetchall()
+    valid = {(c, t) for c, ts in TOPICS.items() for t in ts} | {GENERAL}
+    texts, labels = [], []
+    for text, course, topic in rows:
+        if (course, topic) in valid:
+            texts.append(text)
+            labels.append((course, topic))
+    return texts, labels
+
+
+def topic_description(course: str, topic: str) -> str:
+    return " ".join([topic, course] + TOPIC_KEYWORDS.get(topic, []))
+
+
+# --- Classifier ---
+
+class TfidfTopicClassifier:
+    def __init__(self):
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+        self.model = LogisticRegression(max_iter=1000, C=10.0)
+
+    def fit(self, texts: List[str], labels: List[Tuple[str, str]]) -> "TfidfTopicClassifier":
+        # Keyword documents give every catalog topic at least one example.
+        seed_texts, seed_labels = [], []
+        for course, course_topics in TOPICS.items():
+            for topic in course_topics:
+                seed_texts.append(topic_description(course, topic))
+                seed_labels.append((course, topic))
+
+        all_labels = [LABEL_SEPARATOR.join(label) for label in seed_labels + list(labels)]
+        features = self.vectorizer.fit_transform(seed_texts + list(texts))
+        with warnings.catch_warnings():
+            # Seed documents give one example per class, which sklearn flags as regression-like.
+            warnings.simplefilter("ignore", UserWarning)
+            self.model.fit(features, all_labels)
+        return self
+
+    def predict(self, text: str) -> Tuple[str, str, float]:
+        """Returns (course, topic, confidence)."""
+        probabilities = self.model.predict_proba(self.vectorizer.transform([text]))[0]
+        best = probabilities.argmax()
+        course, topic = self.model.classes_[best].split(LABEL_SEPARATOR)
+        return course, topic, float(probabilities[best])
+
+
+class CachedTopicClassifier:
+    """Trains lazily from the labels table and retrains as new labels arrive."""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self.connect = connect
+        self._classifier: Optional[TfidfTopicClassifier] = None
+        self._trained_on = 0
+        self._lock = threading.Lock()
+
+    def _label_count(self) -> int:
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM thread_topics WHERE source = 'llm'").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _current(self) -> Optional[TfidfTopicClassifier]:
+        count = self._label_count()
+        if count < MIN_LABELED_THREADS:
+            return None
+        with self._lock:
+            if self._classifier is None or count - self._trained_on >= RETRAIN_EVERY:
+                conn = self.connect()
+                try:
+                    texts, labels = load_labeled_threads(conn)
+                finally:
+                    conn.close()
+                self._classifier = TfidfTopicClassifier().fit(texts, labels)
+                self._trained_on = count
+            return self._classifier
+
+    def classify(self, conversation_history) -> Optional[Tuple[str, str, float]]:
+        """
+        Returns (course, topic, confidence) when the local model is at least
+        CONFIDENCE_THRESHOLD sure, otherwise None so the caller falls back to the LLM.
+        """
+        if not LOCAL_CLASSIFIER_ENABLED:
+            return None
+        classifier = self._current()
+        if classifier is None:
+            return None
+        course, topic, confidence = classifier.predict(conversation_text(conversation_history))
+        return (course, topic, confidence) if confidence >= CONFIDENCE_THRESHOLD else None
+
+
+class EmbeddingTopicClassifier:
+    """
+    Nearest-topic classifier over embedding vectors precomputed for every catalog topic.
+    Confidence is the softmax probability of the best topic over all topics.
+    """
+
+    def __init__(self, encoder=None, threshold: float = EMBEDDING_CONFIDENCE_THRESHOLD):
+        self.encoder = encoder or get_encoder()
+        self.threshold = threshold
+        self.labels = [(course, topic) for course, course_topics in TOPICS.items() for topic in course_topics]
+        self.topic_vectors = self.encoder.encode([topic_description(c, t) for c, t in self.labels])
+
+    def predict(self, text: str) -> Tuple[str, str, float]:
+        """Returns (course, topic, confidence)."""
+        similarities = self.topic_vectors @ self.encoder.encode([text])[0]
+        weights = np.exp((similarities - similarities.max()) * EMBEDDING_TEMPERATURE)
+        best = int(similarities.argmax())
+        course, topic = self.labels[best]
+        return course, topic, float(weights[best] / weights.sum())
+
+    def classify(self, conversation_history) -> Optional[Tuple[str, str, float]]:
+        if not LOCAL_CLASSIFIER_ENABLED:
+            return None
+        course, topic, confidence = self.predict(conversation_text(conversation_history))
+        return (course, topic, confidence) if confidence >= self.threshold else None
+
+
+class TopicClassifierChain:
+    """Returns the first confident answer from a list of classifiers."""
+
+    def __init__(self, classifiers: List):
+        self.classifiers = classifiers
+
+    def classify(self, conversation_history) -> Optional[Tuple[str, str, float]]:
+        for classifier in self.classifiers:
+            result = classifier.classify(conversation_history)
+            if result:
+                return result
+        return None
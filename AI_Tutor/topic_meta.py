@@ -39,7 +39,7 @@ TOPIC_META: Dict[str, Dict] = {
     # AI/ML/DS
     "RAG": {"difficulty": 4, "prerequisites": ["Natural Language Processing"], "estimated_minutes": 150},
     "Generative AI": {"difficulty": 4, "prerequisites": ["Neural Networks"], "estimated_minutes": 180},
-    "Natural Language Processing": {"difficulty": 3, "prerequisites": ["Machine Learning Foundations"], "estimated_minutes": 200},
+    "Natural Language Processing": {"difficulty": 3, "prerequisites": ["Supervised Learning"], "estimated_minutes": 200},
     "Transformers": {"difficulty": 5, "prerequisites": ["Neural Networks"], "estimated_minutes": 240},
     "Supervised Learning": {"difficulty": 2, "prerequisites": ["Python Basics", "Statistics"], "estimated_minutes": 160},
     "Unsupervised Learning": {"difficulty": 3, "prerequisites": ["Python Basics", "Statistics"], "estimated_minutes": 160},
@@ -50,6 +50,41 @@ TOPIC_META: Dict[str, Dict] = {
     "Big Data Technologies": {"difficulty": 4, "prerequisites": ["Data Structures"], "estimated_minutes": 200},
 }
 
+# 3. Topic keywords: seed vocabulary for the local topic classifiers
+TOPIC_KEYWORDS: Dict[str, List[str]] = {
+    "Python Basics": ["python", "variable", "loop", "function", "list", "dictionary", "print", "string"],
+    "Data Structures": ["array", "linked list", "stack", "queue", "tree", "hash table", "heap", "graph"],
+    "Algorithms": ["sorting", "searching", "complexity", "big o", "recursion", "dynamic programming", "greedy"],
+    "Web Development": ["html", "css", "javascript", "http", "server", "api", "frontend", "backend"],
+    "Calculus": ["derivative", "integral", "limit", "differentiation", "integration", "chain rule", "slope"],
+    "Linear Algebra": ["matrix", "vector", "eigenvalue", "determinant", "linear transformation", "basis"],
+    "Statistics": ["mean", "variance", "probability", "distribution", "hypothesis test", "regression", "sample"],
+    "Discrete Mathematics": ["set", "logic", "proof", "induction", "combinatorics", "permutation", "relation"],
+    "Classical Mechanics": ["force", "newton", "velocity", "acceleration", "momentum", "energy", "friction"],
+    "Electromagnetism": ["electric field", "magnetic field", "charge", "current", "voltage", "maxwell", "circuit"],
+    "Quantum Physics": ["quantum", "wave function", "photon", "uncertainty", "schrodinger", "electron spin"],
+    "Thermodynamics": ["heat", "temperature", "entropy", "pressure", "gas law", "thermal", "engine"],
+    "Organic Chemistry": ["carbon", "hydrocarbon", "alkane", "functional group", "benzene", "isomer"],
+    "Inorganic Chemistry": ["metal", "periodic table", "ionic", "coordination", "salt", "oxidation state"],
+    "Physical Chemistry": ["reaction rate", "equilibrium", "kinetics", "enthalpy", "gibbs", "activation energy"],
+    "Analytical Chemistry": ["titration", "spectroscopy", "chromatography", "concentration", "ph", "assay"],
+    "Cell Biology": ["cell", "membrane", "mitochondria", "nucleus", "organelle", "mitosis", "protein"],
+    "Genetics": ["gene", "dna", "allele", "chromosome", "mutation", "inheritance", "mendel"],
+    "Evolutionary Biology": ["evolution", "natural selection", "species", "adaptation", "darwin", "fossil"],
+    "Ecology": ["ecosystem", "population", "food chain", "habitat", "biodiversity", "predator"],
+    "RAG": ["retrieval", "augmented generation", "vector database", "embedding", "chunk", "retriever"],
+    "Generative AI": ["generative", "diffusion", "gan", "llm", "prompt", "image generation"],
+    "Natural Language Processing": ["nlp", "token", "text", "language model", "sentiment", "word embedding"],
+    "Transformers": ["transformer", "attention", "self attention", "encoder", "decoder", "bert", "gpt"],
+    "Supervised Learning": ["label", "classification", "regression", "training set", "overfitting", "decision tree"],
+    "Unsupervised Learning": ["clustering", "k means", "pca", "dimensionality reduction", "unlabeled"],
+    "Reinforcement Learning": ["reward", "agent", "policy", "q learning", "environment", "markov decision"],
+    "Neural Networks": ["neuron", "layer", "activation", "backpropagation", "gradient descent", "weights"],
+    "Data Analysis with Python": ["pandas", "dataframe", "numpy", "csv", "groupby", "cleaning data"],
+    "Data Visualization": ["plot", "chart", "matplotlib", "seaborn", "histogram", "dashboard"],
+    "Big Data Technologies": ["hadoop", "spark", "distributed", "mapreduce", "data lake", "kafka"],
+}
+
 # Add default metadata for topics not explicitly defined
 for course, topics in TOPICS.items():
     for topic in topics:
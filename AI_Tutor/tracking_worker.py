@@ -0,0 +1,143 @@
+# tracking_worker.py
+
+"""
+Background progress tracking, off the Streamlit request path.
+
+Every chat message re-queues its thread with a fresh `last_seen` time (see
+untracked_threads.save_thread_id). The worker polls the queue and runs the
+progress tracker graph for threads that have been idle for at least
+`--idle` seconds, so conversations still in progress are debounced and only
+evaluated once they settle. Heartbeats go to the `tracker_status` table,
+which the Dashboard reads.
+
+Each thread is tracked for its owner. Several workers can split the users
+between them with `--partition i/n` (users are hashed into shards, worker i
+takes shards with shard % n == i), so a user's threads are never tracked twice.
+
+Usage:
+    python tracking_worker.py --idle 300 --interval 30
+    python tracking_worker.py --once          # drain idle threads and exit (cron)
+    python tracking_worker.py --partition 0/4 # one of four workers
+    python tracking_worker.py --review-quizzes 3600  # also prepare quizzes for reviews due within an hour
+"""
+
+import argparse
+import os
+import signal
+import socket
+import time
+
+from llm_scheduler import BATCH, priority_lane
+from progress_tracker import get_progress_db_connection, track_threads
+from quiz_bank import get_quiz_bank
+from thread_store import parse_partition
+from untracked_threads import idle_threads_by_user, pending_count
+
+# --- Configuration Block ---
+DEFAULT_IDLE_SECONDS = 300
+DEFAULT_POLL_SECONDS = 30
+
+_stopping = False
+
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def write_heartbeat(worker_id: str, tracked_total: int, pending: int, last_error: str = None):
+    conn = get_progress_db_connection()
+    conn.execute("""
+        INSERT INTO tracker_status (worker_id, pid, heartbeat_at, tracked_total, pending, last_error)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(worker_id) DO UPDATE SET
+        pid = excluded.pid, heartbeat_at = excluded.heartbeat_at, tracked_total = excluded.tracked_total,
+        pending = excluded.pending, last_error = excluded.last_error
+    """, (worker_id, os.getpid(), time.time(), tracked_total, pending, last_error))
+    conn.commit()
+    conn.close()
+
+
+def load_worker_status() -> list:
+    """Latest heartbeat row per worker, newest first."""
+    conn = get_progress_db_connection()
+    rows = conn.execute("SELECT * FROM tracker_status ORDER BY heartbeat_at DESC").fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def track_idle_threads(idle_seconds: float, batch_size: int = 50, partition=None, user_id: str = None) -> tuple:
+    """
+    Tracks every thread idle for `idle_seconds`, for its owner, optionally only
+    in `partition` or for one user. Returns (tracked, last_error).
+    """
+    errors = []
+
+    def on_error(thread_id, e):
+        # Leave the thread queued; it is retried on the next poll.
+        errors.append(f"{thread_id}: {e}")
+        print(f"Tracking failed for thread {thread_id}: {e}")
+
+    def until_stopped(pending):
+        for item in pending.items():
+            if _stopping:
+                return
+            yield item
+
+    tracked = 0
+    with priority_lane(BATCH):
+        for owner, pending in idle_threads_by_user(idle_seconds, partition, user_id).items():
+            if _stopping:
+                break
+            tracked += track_threads(owner, until_stopped(pending), batch_size, on_error)
+    return tracked, errors[-1] if errors else None
+
+
+def prepare_review_quizzes(within_seconds: float, partition=None) -> str:
+    """Pre-generates quiz items for reviews coming due; returns an error message or None."""
+    try:
+        get_quiz_bank().prewarm_reviews(within_seconds, partition=partition)
+    except Exception as e:
+        print(f"Review quiz preparation failed: {e}")
+        return f"review quizzes: {e}"
+    return None
+
+
+def run_worker(idle_seconds: float, poll_seconds: float, once: bool = False, batch_size: int = 50,
+               partition=None, user_id: str = None, review_window: float = 0):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    if partition:
+        worker_id += f"[{partition[0]}/{partition[1]}]"
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    print(f"Tracking worker {worker_id} started (idle={idle_seconds}s, poll={poll_seconds}s)")
+
+    tracked_total = 0
+    while not _stopping:
+        tracked, last_error = track_idle_threads(idle_seconds, batch_size, partition, user_id)
+        tracked_total += tracked
+        if review_window and not _stopping:
+            last_error = prepare_review_quizzes(review_window, partition) or last_error
+        write_heartbeat(worker_id, tracked_total, pending_count(user_id), last_error)
+        if once:
+            break
+        # Sleep in short steps so a stop signal is honoured promptly.
+        deadline = time.monotonic() + poll_seconds
+        while not _stopping and time.monotonic() < deadline:
+            time.sleep(min(1.0, deadline - time.monotonic()))
+    print(f"Tracking worker {worker_id} stopped after tracking {tracked_total} threads")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--idle", type=float, default=DEFAULT_IDLE_SECONDS, help="Seconds since a thread's last message before it is tracked")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_SECONDS, help="Seconds between queue polls")
+    parser.add_argument("--user-id", help="Only track this user's threads")
+    parser.add_argument("--partition", help="i/n: only track users in shard partition i of n")
+    parser.add_argument("--batch-size", type=int, default=50, help="Threads per progress-write transaction")
+    parser.add_argument("--once", action="store_true", help="Process idle threads once and exit")
+    parser.add_argument("--review-quizzes", type=float, default=0, metavar="SECONDS",
+                        help="Also pre-generate quizzes for reviews due within this many seconds (0 = off)")
+    args = parser.parse_args()
+    run_worker(args.idle, args.interval, args.once, args.batch_size, parse_partition(args.partition), args.user_id,
+               args.review_quizzes)
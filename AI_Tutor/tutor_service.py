@@ -0,0 +1,396 @@
+# tutor_service.py
+
+"""
+Headless tutoring service: chat, progress tracking and recommendations
+without Streamlit.
+
+`TutorService` keeps the compiled tutoring graph (graph_factory.py),
+`progress_tracker_graph` and the recommender's progress frame alive for the
+life of the process, so any number of front ends (and load tests) can share
+one warm process. The same object backs an ASGI app (Starlette) and a CLI:
+
+    GET  /health
+    POST /images?user_id=             raw image bytes -> {"hash", ...} to send with chat messages
+    POST /chat                        {"user_id", "message", "thread_id"?, "image_hash"?} -> SSE tokens
+    WS   /ws/chat                     the same requests as JSON messages, tokens as JSON frames
+    GET  /threads?user_id=            a student's conversations
+    GET  /threads/{thread_id}?user_id=  a conversation's messages
+    POST /track                       {"user_id", "thread_id"?} -> tracking job id
+    GET  /jobs/{job_id}
+    GET  /recommendations/{user_id}?method=baseline|hybrid&top_k=5
+    GET  /usage?group_by=user_id,tool&days=7&user_id=   token and cost rollups (usage_ledger.py)
+
+Threads are only readable and trackable by their owner: another student's
+thread answers 403, an unknown one 404.
+
+Usage:
+    python tutor_service.py serve --port 8000
+    python tutor_service.py chat student456 "What is a list comprehension?"
+    python tutor_service.py chat student456 "Explain this diagram" --image diagram.png
+    python tutor_service.py track student456
+    python tutor_service.py recommend student456 --method hybrid
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from langchain_core.messages import HumanMessage
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from graph_factory import get_graph, history_entries
+from image_store import StoredImage, get_image_store
+from llm_scheduler import BATCH, priority_lane
+from progress_tracker import track_thread, track_threads
+from recommender import baseline_recommend, cf_recommend, load_progress
+from thread_store import DEFAULT_USER_ID, thread_owner, user_threads
+from untracked_threads import load_untracked_threads, save_thread_id
+from usage_ledger import get_usage_ledger
+
+# --- Configuration Block ---
+TRACKING_WORKERS = 1   # Tracking jobs run in the batch lane, one at a time by default.
+JOBS_KEPT = 1000       # Finished job records kept for GET /jobs.
+PROGRESS_TTL = 5.0     # Seconds the progress frame is reused for recommendations before it is re-read.
+
+
+class AccessError(Exception):
+    """A request for something that does not exist (status 404) or belongs to another student (403)."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ThreadAccessError(AccessError):
+    """A thread that does not exist or belongs to another student."""
+
+
+class ImageAccessError(AccessError):
+    """An image hash that is not in the image store under this student."""
+
+
+def check_thread_owner(user_id: str, thread_id: str, allow_new: bool = False):
+    """Raises ThreadAccessError unless `user_id` owns the thread (or, with `allow_new`, nobody does yet)."""
+    owner = thread_owner(thread_id)
+    if owner is None and not allow_new:
+        raise ThreadAccessError(f"Unknown thread {thread_id}", 404)
+    if owner is not None and owner != user_id:
+        raise ThreadAccessError(f"Thread {thread_id} belongs to another user", 403)
+
+
+def resolve_image(user_id: str, image_hash: str) -> StoredImage:
+    """
+    The stored image behind a hash the student uploaded. Clients only ever send
+    hashes, so the graph's image tools never open a path chosen by a caller.
+    """
+    stored = get_image_store().user_image(image_hash, user_id)
+    if stored is None:
+        raise ImageAccessError(f"Unknown image {image_hash}", 404)
+    return stored
+
+
+class TutorService:
+    def __init__(self, tracking_workers: int = TRACKING_WORKERS):
+        self.graph = get_graph()
+        self._tracking = ThreadPoolExecutor(max_workers=tracking_workers, thread_name_prefix="tracking-job")
+        self._jobs: Dict[str, Dict] = {}
+        self._jobs_lock = threading.Lock()
+        self._progress = (0.0, None)  # (monotonic time loaded, progress frame)
+        self._progress_lock = threading.Lock()
+
+    # --- Chat ---
+
+    def chat_stream(self, user_id: str, message: str, thread_id: Optional[str] = None,
+                    image_hash: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Runs one chat turn, yielding {"type": "token", "content"} for each
+        assistant token and finally {"type": "done", "thread_id", "text"}.
+        A new thread is started when `thread_id` is not given. `image_hash`
+        attaches an image the student uploaded (see `upload_image`).
+        """
+        if thread_id:
+            check_thread_owner(user_id, thread_id, allow_new=True)
+        image = resolve_image(user_id, image_hash) if image_hash else None
+        thread_id = thread_id or str(uuid.uuid4())
+        save_thread_id(thread_id, user_id)
+        config = {'configurable': {'thread_id': thread_id, 'user_id': user_id}}
+        turn_input = {"messages": [HumanMessage(content=f"user_input: {message}")], "image_path": image.path if image else ""}
+        if image:
+            turn = sum(isinstance(m, HumanMessage) for m in self.graph.get_state(config).values.get("messages", []))
+            turn_input["images"] = [{"hash": image.hash, "name": None, "turn": turn}]
+        parts = []
+        for chunk, metadata in self.graph.stream(
+            turn_input,
+            config=config,
+            stream_mode='messages',
+        ):
+            if metadata.get('langgraph_node') == 'assistant' and isinstance(chunk.content, str) and chunk.content:
+                parts.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+        yield {"type": "done", "thread_id": thread_id, "text": "".join(parts)}
+
+    def upload_image(self, user_id: str, data: bytes, filename: Optional[str] = None) -> Dict:
+        """Stores an image for the student; its hash is what chat requests refer to. Raises ValueError for non-images."""
+        stored = get_image_store().put(data, user_id, filename=filename)
+        return {"hash": stored.hash, "format": stored.format, "width": stored.width, "height": stored.height}
+
+    def threads(self, user_id: str) -> List[str]:
+        return [str(thread_id) for thread_id in user_threads(user_id)]
+
+    def messages(self, user_id: str, thread_id: str) -> List[Dict]:
+        """The conversation's messages, with its images as {'role': 'image', 'hash', 'name'} entries."""
+        check_thread_owner(user_id, thread_id)
+        state = self.graph.get_state(config={'configurable': {'thread_id': thread_id, 'user_id': user_id}})
+        return history_entries(state.values)
+
+    # --- Tracking ---
+
+    def track(self, user_id: str, thread_id: Optional[str] = None) -> Dict:
+        """Tracks one thread, or every queued thread of the student. Runs in the calling thread."""
+        if thread_id:
+            check_thread_owner(user_id, thread_id)
+        with priority_lane(BATCH):
+            if thread_id:
+                state = track_thread(user_id, thread_id)
+                return {"tracked": 1, "course": state.get("course"), "topic": state.get("topic"),
+                        "mastery": state.get("evaluated_mastery")}
+            pending = load_untracked_threads(user_id)
+            return {"tracked": track_threads(user_id, pending) if pending else 0}
+
+    def submit_tracking(self, user_id: str, thread_id: Optional[str] = None) -> str:
+        """Queues a tracking job on the service's worker pool. Returns its id for `job`."""
+        if thread_id:
+            check_thread_owner(user_id, thread_id)
+        job_id = uuid.uuid4().hex
+        record = {"id": job_id, "user_id": user_id, "thread_id": thread_id, "status": "queued",
+                  "submitted_at": time.time()}
+        with self._jobs_lock:
+            self._jobs[job_id] = record
+            while len(self._jobs) > JOBS_KEPT:
+                self._jobs.pop(next(iter(self._jobs)))
+
+        def run():
+            record["status"] = "running"
+            try:
+                record["result"] = self.track(user_id, thread_id)
+                record["status"] = "done"
+            except Exception as e:
+                record["status"], record["error"] = "failed", str(e)
+            record["finished_at"] = time.time()
+
+        self._tracking.submit(run)
+        return job_id
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        with self._jobs_lock:
+            record = self._jobs.get(job_id)
+            return dict(record) if record else None
+
+    # --- Recommendations ---
+
+    def _progress_frame(self):
+        """recommender.load_progress, reused for PROGRESS_TTL seconds (the service runs without Streamlit's caches)."""
+        with self._progress_lock:
+            loaded_at, frame = self._progress
+            if frame is None or time.monotonic() - loaded_at > PROGRESS_TTL:
+                frame = load_progress()
+                self._progress = (time.monotonic(), frame)
+            return frame
+
+    def recommendations(self, user_id: str, method: str = "baseline", top_k: int = 5) -> List[Dict]:
+        """Baseline or hybrid recommendations, from a progress frame at most PROGRESS_TTL seconds old."""
+        progress = self._progress_frame()
+        recs = baseline_recommend(user_id, progress, top_k=max(top_k, 10))
+        if method == "hybrid":
+            recs = cf_recommend(user_id, progress, recs, top_k=top_k)
+        return json.loads(recs.head(top_k).to_json(orient="records"))
+
+
+# --- ASGI App ---
+
+def _sse(event: Dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def create_app(service: Optional[TutorService] = None) -> Starlette:
+    service = service or TutorService()
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    async def chat(request: Request):
+        body = await request.json()
+        if not body.get("message"):
+            return JSONResponse({"error": "message is required"}, status_code=400)
+        user_id = body.get("user_id") or DEFAULT_USER_ID
+        try:
+            if body.get("thread_id"):
+                await run_in_threadpool(check_thread_owner, user_id, body["thread_id"], True)
+            if body.get("image_hash"):
+                await run_in_threadpool(resolve_image, user_id, body["image_hash"])
+        except AccessError as e:
+            return JSONResponse({"error": str(e)}, status_code=e.status_code)
+
+        def events():
+            try:
+                for event in service.chat_stream(user_id, body["message"], body.get("thread_id"), body.get("image_hash")):
+                    yield _sse(event)
+            except Exception as e:
+                yield _sse({"type": "error", "error": str(e)})
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def chat_socket(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            while True:
+                body = await websocket.receive_json()
+                if not body.get("message"):
+                    await websocket.send_json({"type": "error", "error": "message is required"})
+                    continue
+                try:
+                    stream = service.chat_stream(body.get("user_id") or DEFAULT_USER_ID, body["message"],
+                                                 body.get("thread_id"), body.get("image_hash"))
+                    async for event in iterate_in_threadpool(stream):
+                        await websocket.send_json(event)
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+        except WebSocketDisconnect:
+            pass
+
+    async def upload_image(request: Request):
+        user_id = request.query_params.get("user_id", DEFAULT_USER_ID)
+        data = await request.body()
+        try:
+            stored = await run_in_threadpool(service.upload_image, user_id, data, request.query_params.get("filename"))
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        return JSONResponse(stored, status_code=201)
+
+    async def threads(request: Request):
+        user_id = request.query_params.get("user_id", DEFAULT_USER_ID)
+        return JSONResponse(await run_in_threadpool(service.threads, user_id))
+
+    async def thread_messages(request: Request):
+        user_id = request.query_params.get("user_id", DEFAULT_USER_ID)
+        try:
+            return JSONResponse(await run_in_threadpool(service.messages, user_id, request.path_params["thread_id"]))
+        except ThreadAccessError as e:
+            return JSONResponse({"error": str(e)}, status_code=e.status_code)
+
+    async def track(request: Request):
+        body = await request.json()
+        try:
+            job_id = await run_in_threadpool(service.submit_tracking, body.get("user_id") or DEFAULT_USER_ID, body.get("thread_id"))
+        except ThreadAccessError as e:
+            return JSONResponse({"error": str(e)}, status_code=e.status_code)
+        return JSONResponse({"job_id": job_id}, status_code=202)
+
+    async def job(request: Request):
+        record = service.job(request.path_params["job_id"])
+        if record is None:
+            return JSONResponse({"error": "unknown job"}, status_code=404)
+        return JSONResponse(record)
+
+    async def recommendations(request: Request):
+        method = request.query_params.get("method", "baseline")
+        if method not in ("baseline", "hybrid"):
+            return JSONResponse({"error": "method must be baseline or hybrid"}, status_code=400)
+        try:
+            top_k = int(request.query_params.get("top_k", 5))
+        except ValueError:
+            return JSONResponse({"error": "top_k must be an integer"}, status_code=400)
+        return JSONResponse(await run_in_threadpool(service.recommendations, request.path_params["user_id"], method, top_k))
+
+    async def usage(request: Request):
+        group_by = tuple(c for c in request.query_params.get("group_by", "user_id").split(",") if c)
+        try:
+            days = float(request.query_params.get("days", 7))
+        except ValueError:
+            return JSONResponse({"error": "days must be a number"}, status_code=400)
+        try:
+            report = await run_in_threadpool(get_usage_ledger().report, group_by, days, request.query_params.get("user_id"))
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        return JSONResponse(report)
+
+    app = Starlette(routes=[
+        Route("/health", health),
+        Route("/images", upload_image, methods=["POST"]),
+        Route("/chat", chat, methods=["POST"]),
+        WebSocketRoute("/ws/chat", chat_socket),
+        Route("/threads", threads),
+        Route("/threads/{thread_id}", thread_messages),
+        Route("/track", track, methods=["POST"]),
+        Route("/jobs/{job_id}", job),
+        Route("/recommendations/{user_id}", recommendations),
+        Route("/usage", usage),
+    ])
+    app.state.service = service
+    return app
+
+
+# --- CLI ---
+
+def run_command(service: TutorService, args: argparse.Namespace):
+    if args.command == "chat":
+        image_hash = None
+        if args.image:
+            with open(args.image, "rb") as f:
+                image_hash = service.upload_image(args.user_id, f.read(), os.path.basename(args.image))["hash"]
+        for event in service.chat_stream(args.user_id, args.message, args.thread_id, image_hash):
+            if event["type"] == "token":
+                print(event["content"], end="", flush=True)
+            else:
+                print(f"\n[thread {event['thread_id']}]")
+    elif args.command == "track":
+        print(json.dumps(service.track(args.user_id, args.thread_id)))
+    else:
+        print(json.dumps(service.recommendations(args.user_id, args.method, args.top_k), indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless AI Tutor service.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Run the ASGI app with uvicorn")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    chat = commands.add_parser("chat", help="Run one chat turn, streaming the answer")
+    chat.add_argument("user_id")
+    chat.add_argument("message")
+    chat.add_argument("--thread-id")
+    chat.add_argument("--image", help="Image file to upload and ask about")
+    track = commands.add_parser("track", help="Track a thread, or all of a student's queued threads")
+    track.add_argument("user_id")
+    track.add_argument("--thread-id")
+    recommend = commands.add_parser("recommend", help="Print a student's recommendations as JSON")
+    recommend.add_argument("user_id")
+    recommend.add_argument("--method", choices=["baseline", "hybrid"], default="baseline")
+    recommend.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        import uvicorn
+        uvicorn.run(create_app(), host=args.host, port=args.port)
+        return
+    service = TutorService()
+    try:
+        run_command(service, args)
+    except (AccessError, ValueError) as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
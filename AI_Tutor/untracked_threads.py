@@ -1,20 +1,143 @@
 import os
 import json
-import streamlit as st
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Sequence, Tuple
 
-def save_thread_id(thread_id, file_path='untracked_threads.json'):
-    if not os.path.exists(file_path):
-        with open(file_path, 'w') as f:
-            json.dump({"thread_ids": []}, f, indent=4)
+from thread_store import DEFAULT_USER_ID, connect, register_thread, register_threads, shard_of
+
+# Queue of threads waiting for the progress tracker, stored per owner in the
+# `tracking_queue` table of the progress database. Earlier versions kept it in
+# this JSON file; it is imported once and renamed.
+UNTRACKED_THREADS_FILE = 'untracked_threads.json'
+
+_migrated = False
 
-    # Read the existing JSON
+
+def migrate_legacy_queue(file_path=UNTRACKED_THREADS_FILE, user_id=DEFAULT_USER_ID):
+    """Moves a JSON queue from before threads had owners into the table."""
+    global _migrated
+    _migrated = True
+    if not os.path.exists(file_path):
+        return 0
     with open(file_path, 'r') as f:
         data = json.load(f)
+    last_seen = data.get("last_seen", {})
+    items = [(tid, user_id, last_seen.get(tid, 0.0)) for tid in data.get("thread_ids", [])]
+    register_threads(items)
+    enqueue_threads(items)
+    os.replace(file_path, file_path + '.migrated')
+    return len(items)
+
+
+def _ensure_migrated():
+    if not _migrated:
+        migrate_legacy_queue()
+
+
+def _connect():
+    _ensure_migrated()
+    return connect()
+
+
+def enqueue_threads(items: Iterable[Sequence], db_path: Optional[str] = None):
+    """
+    Bulk-queues (thread_id, user_id, last_seen) rows. A thread already queued
+    keeps its place but takes the newer last_seen.
+    """
+    rows = [(str(tid), user_id, shard_of(user_id), last_seen) for tid, user_id, last_seen in items]
+    conn = connect(db_path)
+    with conn:
+        conn.executemany("""
+            INSERT INTO tracking_queue (thread_id, user_id, shard, last_seen) VALUES (?, ?, ?, ?)
+            ON CONFLICT(thread_id) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)
+        """, rows)
+    conn.close()
+
+
+def save_thread_id(thread_id, user_id=DEFAULT_USER_ID):
+    """Queues a thread for tracking and records when it was last active."""
+    _ensure_migrated()
+    owner = register_thread(thread_id, user_id)
+    enqueue_threads([(thread_id, owner, time.time())])
+
+
+def load_untracked_threads(user_id=None) -> Dict[str, float]:
+    """Returns {thread_id: last_seen timestamp} for every queued thread, or only `user_id`'s."""
+    conn = _connect()
+    if user_id:
+        rows = conn.execute("SELECT thread_id, last_seen FROM tracking_queue WHERE user_id = ?", (user_id,))
+    else:
+        rows = conn.execute("SELECT thread_id, last_seen FROM tracking_queue")
+    queued = {row["thread_id"]: row["last_seen"] for row in rows}
+    conn.close()
+    return queued
+
+
+def pending_count(user_id=None) -> int:
+    conn = _connect()
+    if user_id:
+        row = conn.execute("SELECT COUNT(*) FROM tracking_queue WHERE user_id = ?", (user_id,)).fetchone()
+    else:
+        row = conn.execute("SELECT COUNT(*) FROM tracking_queue").fetchone()
+    conn.close()
+    return row[0]
+
+
+def idle_threads(idle_seconds, user_id=None) -> Dict[str, float]:
+    """Queued threads with no activity for at least `idle_seconds`, as {thread_id: last_seen}."""
+    cutoff = time.time() - idle_seconds
+    return {tid: seen for tid, seen in load_untracked_threads(user_id).items() if seen <= cutoff}
+
+
+def idle_threads_by_user(idle_seconds, partition: Optional[Tuple[int, int]] = None,
+                         user_id=None) -> Dict[str, Dict[str, float]]:
+    """
+    {user_id: {thread_id: last_seen}} for idle queued threads, optionally only
+    one user's or only the users in `partition` (index, count) of the shards.
+    """
+    clauses, params = ["last_seen <= ?"], [time.time() - idle_seconds]
+    if user_id:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if partition:
+        clauses.append("shard % ? = ?")
+        params.extend([partition[1], partition[0]])
+    conn = _connect()
+    rows = conn.execute(
+        f"SELECT thread_id, user_id, last_seen FROM tracking_queue WHERE {' AND '.join(clauses)} ORDER BY last_seen",
+        params,
+    ).fetchall()
+    conn.close()
+    by_user = defaultdict(dict)
+    for row in rows:
+        by_user[row["user_id"]][row["thread_id"]] = row["last_seen"]
+    return dict(by_user)
+
+
+def remove_thread_ids(items: Iterable[Tuple[str, float]]):
+    """Bulk form of remove_thread_id for (thread_id, last_seen) pairs, in one transaction."""
+    conn = _connect()
+    with conn:
+        conn.executemany(
+            "DELETE FROM tracking_queue WHERE thread_id = ? AND last_seen <= ?",
+            [(str(tid), seen) for tid, seen in items],
+        )
+    conn.close()
 
-    # Add thread_id if not already present
-    if thread_id not in data["thread_ids"]:
-        data["thread_ids"].append(thread_id)
 
-        # Save back to file
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+def remove_thread_id(thread_id, last_seen=None):
+    """
+    Removes a tracked thread from the queue. If `last_seen` is given and the thread
+    has been active since, it stays queued so the new messages get tracked too.
+    """
+    conn = _connect()
+    with conn:
+        if last_seen is None:
+            cursor = conn.execute("DELETE FROM tracking_queue WHERE thread_id = ?", (str(thread_id),))
+        else:
+            cursor = conn.execute(
+                "DELETE FROM tracking_queue WHERE thread_id = ? AND last_seen <= ?", (str(thread_id), last_seen)
+            )
+    conn.close()
+    return cursor.rowcount > 0
@@ -0,0 +1,339 @@
+# usage_ledger.py
+
+"""
+Token and cost accounting for every LLM and vision call.
+
+The scheduler (llm_scheduler.py) reports each request it completes, with its
+latency, to `UsageLedger.record`, which reads the token counts from the
+response's usage metadata (LangChain `usage_metadata` or google.genai
+`usage_metadata`) and prices them with PRICES. Calls are attributed to a user,
+thread, graph node and tool:
+
+- `usage_context(user_id=..., tool=...)` sets attribution for a block (or, as a
+  decorator, a function); inner blocks override only the fields they name.
+- Fields left unset fall back to the running LangGraph config: the
+  `configurable` user_id/thread_id and the `langgraph_node` metadata.
+
+Calls are folded in memory into hourly rollups keyed by
+(hour, user, thread, node, tool, model) and upserted into usage.db every
+FLUSH_SECONDS or FLUSH_ROWS keys, so accounting costs a small batched write
+rather than a row per call. Coalesced calls (see `LLMScheduler.run`) made one
+request and are counted once, for the caller that made it.
+
+Optional per-user daily budgets (the usage_budgets table, or
+AI_TUTOR_DAILY_BUDGET_USD for everyone): once a student's spend for the UTC
+day reaches it, the tutor answers from the answer cache when it can and
+otherwise uses the cheaper DEGRADED_ROUTES models (see model_router.py).
+Spend and budgets are tracked per process and re-read from the database
+every SPEND_REFRESH_SECONDS, so several processes enforce a shared budget,
+and pick up `--set-budget` changes, with a small lag.
+
+Usage:
+    python usage_ledger.py --report user_id --days 7
+    python usage_ledger.py --report user_id,tool --user-id student456
+    python usage_ledger.py --set-budget student456 0.50
+"""
+
+import argparse
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_scheduler import scheduler
+
+# --- Configuration Block ---
+USAGE_DB_FILE = "usage.db"
+USAGE_ACCOUNTING_ENABLED = os.getenv("AI_TUTOR_USAGE_ACCOUNTING", "1") == "1"
+# USD per million (input, output) tokens. Override with AI_TUTOR_PRICES='{"gemini-2.5-flash": [0.3, 2.5]}'.
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemma-3-4b-it": (0.0, 0.0),
+}
+DEFAULT_PRICE = (0.30, 2.50)  # Unknown models are priced like the tutoring model.
+DEFAULT_DAILY_BUDGET = float(os.environ["AI_TUTOR_DAILY_BUDGET_USD"]) if os.getenv("AI_TUTOR_DAILY_BUDGET_USD") else None
+ROLLUP_SECONDS = 3600
+FLUSH_SECONDS = 10.0
+FLUSH_ROWS = 200
+SPEND_REFRESH_SECONDS = 60.0
+ATTRIBUTION_FIELDS = ("user_id", "thread_id", "node", "tool")
+
+if os.getenv("AI_TUTOR_PRICES"):
+    PRICES.update({model: tuple(price) for model, price in json.loads(os.environ["AI_TUTOR_PRICES"]).items()})
+
+_attribution: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("usage_attribution", default={})
+
+
+@contextlib.contextmanager
+def usage_context(user_id: Optional[str] = None, thread_id: Optional[str] = None,
+                  node: Optional[str] = None, tool: Optional[str] = None):
+    """Attributes the LLM calls made inside the block. Works as a decorator too."""
+    fields = {"user_id": user_id, "thread_id": thread_id, "node": node, "tool": tool}
+    token = _attribution.set({**_attribution.get(), **{k: str(v) for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+
+def current_attribution() -> Dict[str, str]:
+    """The (user_id, thread_id, node, tool) of a call made here; '' for unknown fields."""
+    fields = dict(_attribution.get())
+    if len(fields) < len(ATTRIBUTION_FIELDS):
+        try:
+            from langgraph.config import get_config
+            config = get_config()
+        except (ImportError, RuntimeError):
+            config = {}
+        configurable, metadata = config.get("configurable", {}), config.get("metadata", {})
+        fields.setdefault("user_id", configurable.get("user_id"))
+        fields.setdefault("thread_id", configurable.get("thread_id"))
+        fields.setdefault("node", metadata.get("langgraph_node"))
+    return {field: str(fields.get(field) or "") for field in ATTRIBUTION_FIELDS}
+
+
+# --- Helpers ---
+
+def token_counts(response: Any) -> Tuple[int, int]:
+    """(input, output) tokens of a LangChain message or a google.genai response; (0, 0) when unreported."""
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict):
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    if usage is not None:
+        return int(getattr(usage, "prompt_token_count", 0) or 0), int(getattr(usage, "candidates_token_count", 0) or 0)
+    return 0, 0
+
+
+def call_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = PRICES.get(model, DEFAULT_PRICE)
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+
+def _day_start(timestamp: float) -> int:
+    return int(timestamp // 86400) * 86400
+
+
+# --- Ledger ---
+
+class UsageLedger:
+    def __init__(self, db_file: str = USAGE_DB_FILE, default_budget: Optional[float] = DEFAULT_DAILY_BUDGET):
+        self.default_budget = default_budget
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._setup()
+        # (hour, user, thread, node, tool, model) -> [calls, input tokens, output tokens, latency ms, cost]
+        self._pending: Dict[Tuple, List[float]] = {}
+        self._last_flush = time.monotonic()
+        self._spend: Dict[str, List[float]] = {}  # user -> [day start, usd, loaded at]
+        self._budgets: Dict[str, float] = {}
+        self._budgets_loaded_at = float("-inf")
+        self.stats = {"calls": 0, "flushes": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+    def _setup(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage_rollups (
+                hour INTEGER NOT NULL,
+                user_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                node TEXT NOT NULL,
+                tool TEXT NOT NULL,
+                model TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                latency_ms REAL NOT NULL,
+                cost_usd REAL NOT NULL,
+                PRIMARY KEY (hour, user_id, thread_id, node, tool, model)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_rollups_user_hour ON usage_rollups (user_id, hour)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage_budgets (
+                user_id TEXT PRIMARY KEY,
+                daily_usd REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    # --- Recording ---
+
+    def record(self, model: str, response: Any, seconds: float, attribution: Optional[Dict[str, str]] = None):
+        """
+        Adds one completed call to its hourly rollup and to the user's spend for the day.
+
+        Time Complexity: O(1), plus an O(k) upsert of the k pending rollups every FLUSH_SECONDS.
+        """
+        attribution = attribution or current_attribution()
+        input_tokens, output_tokens = token_counts(response)
+        cost = call_cost(model, input_tokens, output_tokens)
+        now = time.time()
+        key = (int(now // ROLLUP_SECONDS) * ROLLUP_SECONDS, attribution["user_id"], attribution["thread_id"],
+               attribution["node"], attribution["tool"], model)
+        with self._lock:
+            totals = self._pending.setdefault(key, [0, 0, 0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += input_tokens
+            totals[2] += output_tokens
+            totals[3] += seconds * 1000
+            totals[4] += cost
+            spend = self._spend.get(attribution["user_id"])
+            if spend is not None and spend[0] == _day_start(now):
+                spend[1] += cost
+            self.stats["calls"] += 1
+            self.stats["input_tokens"] += input_tokens
+            self.stats["output_tokens"] += output_tokens
+            self.stats["cost_usd"] += cost
+            due = len(self._pending) >= FLUSH_ROWS or time.monotonic() - self._last_flush >= FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Upserts the pending rollups in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            self._conn.executemany("""
+                INSERT INTO usage_rollups (hour, user_id, thread_id, node, tool, model,
+                                           calls, input_tokens, output_tokens, latency_ms, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(hour, user_id, thread_id, node, tool, model) DO UPDATE SET
+                calls = calls + excluded.calls,
+                input_tokens = input_tokens + excluded.input_tokens,
+                output_tokens = output_tokens + excluded.output_tokens,
+                latency_ms = latency_ms + excluded.latency_ms,
+                cost_usd = cost_usd + excluded.cost_usd
+            """, [key + tuple(totals) for key, totals in pending.items()])
+            self._conn.commit()
+            self.stats["flushes"] += 1
+
+    # --- Budgets ---
+
+    def spend_today(self, user_id: str) -> float:
+        """The user's spend since 00:00 UTC: stored rollups plus calls not yet flushed."""
+        now = time.time()
+        day = _day_start(now)
+        with self._lock:
+            spend = self._spend.get(user_id)
+            if spend is not None and spend[0] == day and now - spend[2] < SPEND_REFRESH_SECONDS:
+                return spend[1]
+            stored = self._conn.execute(
+                "SELECT COALESCE(SUM(cost_usd), 0) FROM usage_rollups WHERE user_id = ? AND hour >= ?",
+                (user_id, day),
+            ).fetchone()[0]
+            pending = sum(totals[4] for key, totals in self._pending.items() if key[1] == user_id and key[0] >= day)
+            self._spend[user_id] = [day, stored + pending, now]
+            return stored + pending
+
+    def budget(self, user_id: str) -> Optional[float]:
+        """The user's daily budget in USD, or None for no limit."""
+        now = time.monotonic()
+        with self._lock:
+            # Re-read like spend, so `--set-budget` from another process takes effect.
+            if now - self._budgets_loaded_at >= SPEND_REFRESH_SECONDS:
+                self._budgets = dict(self._conn.execute("SELECT user_id, daily_usd FROM usage_budgets").fetchall())
+                self._budgets_loaded_at = now
+            return self._budgets.get(user_id, self.default_budget)
+
+    def set_budget(self, user_id: str, daily_usd: Optional[float]):
+        """Sets a user's daily budget; None returns them to the default."""
+        with self._lock:
+            if daily_usd is None:
+                self._conn.execute("DELETE FROM usage_budgets WHERE user_id = ?", (user_id,))
+                self._budgets.pop(user_id, None)
+            else:
+                self._conn.execute("""
+                    INSERT INTO usage_budgets (user_id, daily_usd) VALUES (?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET daily_usd = excluded.daily_usd
+                """, (user_id, daily_usd))
+                self._budgets[user_id] = daily_usd
+            self._conn.commit()
+
+    def over_budget(self, user_id: Optional[str] = None) -> bool:
+        """True once the user (default: the current attribution's) has spent their daily budget."""
+        user_id = user_id if user_id is not None else current_attribution()["user_id"]
+        budget = self.budget(user_id) if user_id else None
+        return budget is not None and self.spend_today(user_id) >= budget
+
+    # --- Reports ---
+
+    def report(self, group_by: Tuple[str, ...] = ("user_id",), days: float = 7,
+               user_id: Optional[str] = None) -> List[Dict]:
+        """Totals over the last `days`, grouped by any of user_id, thread_id, node, tool, model and hour, costliest first."""
+        columns = [c for c in group_by if c in ATTRIBUTION_FIELDS + ("model", "hour")]
+        if len(columns) != len(group_by):
+            raise ValueError(f"Can only group by {', '.join(ATTRIBUTION_FIELDS + ('model', 'hour'))}.")
+        self.flush()
+        since = int((time.time() - days * 86400) // ROLLUP_SECONDS) * ROLLUP_SECONDS
+        select = ", ".join(columns + ["SUM(calls)", "SUM(input_tokens)", "SUM(output_tokens)", "SUM(latency_ms)", "SUM(cost_usd)"])
+        query = f"SELECT {select} FROM usage_rollups WHERE hour >= ?"
+        params: List[Any] = [since]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        if columns:
+            query += f" GROUP BY {', '.join(columns)}"
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY SUM(cost_usd) DESC", params).fetchall()
+        report = []
+        for row in rows:
+            calls, input_tokens, output_tokens, latency_ms, cost = row[len(columns):]
+            if not calls:
+                continue
+            entry = dict(zip(columns, row))
+            entry.update(calls=calls, input_tokens=input_tokens, output_tokens=output_tokens,
+                         avg_latency_ms=round(latency_ms / calls, 1), cost_usd=round(cost, 6))
+            report.append(entry)
+        return report
+
+
+@lru_cache(maxsize=None)
+def get_usage_ledger() -> UsageLedger:
+    ledger = UsageLedger()
+    atexit.register(ledger.flush)
+    return ledger
+
+
+def _record_scheduled_call(model: str, response: Any, seconds: float):
+    get_usage_ledger().record(model, response, seconds)
+
+
+# Every scheduled LLM and vision call is accounted once this module is imported.
+if USAGE_ACCOUNTING_ENABLED:
+    scheduler.add_listener(_record_scheduled_call)
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report LLM usage and manage per-user daily budgets.")
+    parser.add_argument("--report", default="user_id",
+                        help="Comma-separated columns to group by: user_id, thread_id, node, tool, model, hour")
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--user-id", help="Only this user's usage")
+    parser.add_argument("--set-budget", nargs=2, metavar=("USER_ID", "USD"),
+                        help="Set a user's daily budget in USD ('none' removes it)")
+    args = parser.parse_args(argv)
+
+    ledger = get_usage_ledger()
+    if args.set_budget:
+        user_id, usd = args.set_budget
+        ledger.set_budget(user_id, None if usd.lower() == "none" else float(usd))
+        print(f"Budget for {user_id}: {ledger.budget(user_id)} USD/day (spent today: {ledger.spend_today(user_id):.4f})")
+        return
+    group_by = tuple(c.strip() for c in args.report.split(",") if c.strip())
+    for row in ledger.report(group_by, args.days, args.user_id):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,12 @@
 import streamlit as st
 from langchain_core.messages import HumanMessage
 import os
-CONFIG = {'configurable': {'thread_id': 'thread-1'}}
+import uuid
+
+# One conversation per browser session; the graph's memory outlives reruns.
+if 'thread_id' not in st.session_state:
+    st.session_state['thread_id'] = str(uuid.uuid4())
+CONFIG = {'configurable': {'thread_id': st.session_state['thread_id']}}
 
 if 'message_history' not in st.session_state:
     st.session_state['message_history'] = []
@@ -56,7 +61,8 @@ with st.sidebar:
 if not os.getenv('GEMINI_API_KEY'):
     st.warning("Please set your GEMINI API key in the sidebar.")
 else:
-    from graph import react_graph 
+    from graph import memory_graph
+    react_graph = memory_graph(os.getenv('GEMINI_API_KEY'))
     user_input = st.chat_input('Type here')
     if user_input:
 
@@ -69,7 +75,7 @@ else:
         with st.chat_message('assistant'):
             ai_message = st.write_stream(
                 message_chunk[0].content for message_chunk in react_graph.stream(
-                    {"messages": [HumanMessage(content=f"user_input: {user_input}, image_path: {st.session_state['image_path']}")], "config": CONFIG},
+                    {"messages": [HumanMessage(content=f"user_input: {user_input}")], "image_path": st.session_state['image_path'] or "No image uploaded"},
                     config=CONFIG,
                     stream_mode='messages'
                 ) if message_chunk[1].get('langgraph_node') == 'assistant'